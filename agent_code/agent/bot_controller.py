@@ -3,51 +3,82 @@ Bot Controller - 負責與 Minecraft 遊戲互動的控制器
 通過 Node.js bridge 調用 Mineflayer API
 """
 
-import json
-import subprocess
 import os
+import hashlib
 import logging
-import uuid
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Any
 
+from agent.bridge_transport import BridgeTransport
+from agent.world_model import WorldModel
+
 logger = logging.getLogger(__name__)
 
 
+def code_handle(code: str) -> str:
+    """代碼的內容雜湊句柄（與 bot.js 的 codeHandle() 一致）"""
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()[:16]
+
+
 class BotController:
     """Minecraft 機器人控制器"""
     
-    def __init__(self, host: str, port: int, username: str):
+    # 傳輸層以請求 ID 分派回應，允許多個請求同時在途
+    supports_concurrent_requests = True
+    
+    def __init__(self, host: str, port: int, username: str, bridge_script: str = None,
+                 viewer_port: int = None):
         self.host = host
         self.port = port
         self.username = username
-        self.bot_process = None
+        self.viewer_port = viewer_port  # None 使用 bot.js 默認值，0 關閉查看器
+        self.bridge_script = bridge_script or os.getenv(
+            'BOT_BRIDGE_SCRIPT',
+            os.path.join(os.path.dirname(__file__), '../bot.js')
+        )
+        self.state_timeout = float(os.getenv('BOT_STATE_TIMEOUT', '10'))
+        self.execute_timeout = float(os.getenv('BOT_EXECUTE_TIMEOUT', '60'))
+        self.transport = None
         self.is_connected = False
         
+        # 當前 bridge 進程已編譯的代碼句柄；bridge 重啟後清空
+        self._handles = set()
+        self._handles_lock = threading.Lock()
+        self.code_stats = {'uploads': 0, 'invocations': 0, 'reuploads': 0}
+        
+        # get_state 差量編碼：保留最近幾個完整狀態（seq -> state），流水線中亂序到達的差量也能還原
+        self.state_delta = os.getenv('BOT_STATE_DELTA', 'true').lower() in ('1', 'true', 'yes')
+        self._states: OrderedDict = OrderedDict()
+        self._states_lock = threading.Lock()
+        self.state_stats = {'full': 0, 'delta': 0, 'resync': 0}
+        
+        # 增量觀察：bridge 只推送變更的方塊 / 實體 / 背包格，本地世界模型就地套用
+        self.incremental_state = os.getenv('BOT_INCREMENTAL_STATE', 'true').lower() in ('1', 'true', 'yes')
+        self.world = WorldModel()
+        
     def connect(self):
         """連接到 Minecraft 伺服器"""
         try:
             # 啟動 Node.js bot 進程
-            bot_script = os.path.join(os.path.dirname(__file__), '../bot.js')
-            
             env = os.environ.copy()
             env['MC_HOST'] = self.host
             env['MC_PORT'] = str(self.port)
             env['BOT_USERNAME'] = self.username
+            if self.viewer_port is not None:
+                env['VIEWER_PORT'] = str(self.viewer_port)
             
-            self.bot_process = subprocess.Popen(
-                ['node', bot_script],
-                env=env,
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=None,  # 讓 stderr 直接輸出到 Docker logs
-                text=True,
-                bufsize=1
-            )
+            self.transport = BridgeTransport(['node', self.bridge_script], env=env)
+            with self._handles_lock:
+                self._handles.clear()
+            with self._states_lock:
+                self._states.clear()
+            self.world.clear()
             
             # 等待 bot.js 發送 ready 信號
             logger.info("⏳ Waiting for bot.js to be ready...")
-            ready_signal = self.bot_process.stdout.readline()
-            logger.info(f"📨 Received: {ready_signal.strip()}")
+            ready_signal = self.transport.start()
+            logger.info(f"📨 Received: {ready_signal}")
             
             self.is_connected = True
             logger.info(f"✅ Bot connected as {self.username}")
@@ -56,108 +87,234 @@ class BotController:
             logger.error(f"Failed to connect bot: {e}")
             raise
     
-    def get_observation(self) -> Dict[str, Any]:
+    def get_observation(self, timeout: float = None) -> Dict[str, Any]:
         """
         獲取當前遊戲狀態觀察
         
+        Args:
+            timeout: 等待回應的秒數（默認 BOT_STATE_TIMEOUT）
+            
         Returns:
-            包含位置、生命值、背包、周圍實體等信息的字典
+            包含位置、生命值、背包、周圍實體等信息的字典（超時等暫時錯誤時為默認觀察）
+            
+        Raises:
+            ConnectionError: bridge 進程已結束
         """
+        timeout = timeout or self.state_timeout
         try:
-            # 向 bot.js 發送獲取狀態的命令
-            request_id = str(uuid.uuid4())
-            command = json.dumps({'action': 'get_state', 'id': request_id}) + '\n'
-            self.bot_process.stdin.write(command)
-            self.bot_process.stdin.flush()
-            
-            # 讀取響應並驗證 ID
-            response = self.bot_process.stdout.readline()
-            state = json.loads(response)
+            state = self._resolve_state(self.transport.call(self._state_payload(), timeout))
+            if state is None:
+                state = self._resolve_state(self.transport.call(self._state_payload(resync=True), timeout))
+            return self._state_to_observation(state)
             
-            # 驗證響應 ID
-            if state.get('id') != request_id:
-                logger.warning(f"Response ID mismatch: expected {request_id}, got {state.get('id')}")
-                return self._default_observation()
-            
-            return {
-                'position': state.get('position', {}),
-                'health': state.get('health', 20),
-                'food': state.get('food', 20),
-                'inventory': state.get('inventory', []),
-                'nearby_entities': state.get('nearby_entities', []),
-                'nearby_blocks': state.get('nearby_blocks', []),
-                'time_of_day': state.get('time_of_day', 'day'),
-                'weather': state.get('weather', 'clear'),
-                'biome': state.get('biome', 'unknown')
-            }
+        except ConnectionError:
+            # bridge 進程已結束：交給上層重新連線，不以默認觀察掩蓋
+            self.is_connected = False
+            raise
+        except Exception as e:
+            logger.error(f"Failed to get observation: {e!r}")
+            return self._default_observation()
+    
+    async def aget_observation(self, timeout: float = None) -> Dict[str, Any]:
+        """get_observation 的非同步版本（可被取消）"""
+        timeout = timeout or self.state_timeout
+        try:
+            state = self._resolve_state(await self.transport.acall(self._state_payload(), timeout))
+            if state is None:
+                state = self._resolve_state(await self.transport.acall(self._state_payload(resync=True), timeout))
+            return self._state_to_observation(state)
             
+        except ConnectionError:
+            # bridge 進程已結束：交給上層重新連線，不以默認觀察掩蓋
+            self.is_connected = False
+            raise
         except Exception as e:
-            logger.error(f"Failed to get observation: {e}")
+            logger.error(f"Failed to get observation: {e!r}")
             return self._default_observation()
     
-    def execute_code(self, code: str) -> Dict[str, Any]:
+    def register_code(self, code: str, timeout: float = None) -> str:
+        """
+        上傳並編譯代碼（不執行），之後 execute_code() 只需發送句柄
+        
+        Args:
+            code: JavaScript 代碼字符串
+            timeout: 等待回應的秒數（默認 BOT_STATE_TIMEOUT）
+            
+        Returns:
+            代碼句柄
+        """
+        result = self.transport.call({'action': 'register_code', 'code': code}, timeout or self.state_timeout)
+        if not result.get('success'):
+            raise RuntimeError(result.get('error', 'register_code failed'))
+        self._remember_handle(result)
+        return result['handle']
+    
+    def execute_code(self, code: str, timeout: float = None, params: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         執行動態生成的 JavaScript 代碼
         
+        同一段代碼第一次執行時上傳源碼（bot.js 編譯並按內容雜湊快取），
+        之後只發送句柄與參數；bridge 回報未知句柄時重新上傳一次。
+        
         Args:
             code: JavaScript 代碼字符串
+            timeout: 等待回應的秒數（默認 BOT_EXECUTE_TIMEOUT）
+            params: 傳給代碼的 params 變量
             
         Returns:
             執行結果字典
         """
+        timeout = timeout or self.execute_timeout
         try:
-            request_id = str(uuid.uuid4())
-            command = json.dumps({
-                'action': 'execute_code',
-                'code': code,
-                'id': request_id
-            }) + '\n'
-            
-            logger.info(f"📤 Sending execute_code (ID: {request_id[:8]}...)")
-            
-            self.bot_process.stdin.write(command)
-            self.bot_process.stdin.flush()
-            
-            # 讀取執行結果並驗證 ID（60秒超時）
-            logger.info(f"📥 Waiting for response (60s timeout)...")
-            
-            import select
-            ready, _, _ = select.select([self.bot_process.stdout], [], [], 60)
-            if not ready:
-                logger.error("Timeout waiting for bot.js response!")
-                return {'success': False, 'error': 'Response timeout (60s)'}
-            
-            response = self.bot_process.stdout.readline()
-            
-            result = json.loads(response)
-            
-            # 驗證響應 ID
-            if result.get('id') != request_id:
-                logger.error(f"Response ID mismatch! Expected {request_id[:8]}, got {result.get('id', 'None')[:8]}")
-                # 嘗試再讀一行
-                response = self.bot_process.stdout.readline()
-                result = json.loads(response)
-                if result.get('id') != request_id:
-                    return {'success': False, 'error': 'Response ID mismatch'}
-            
-            logger.info(f"✅ Response verified (ID: {result.get('id', '')[:8]}...)")
+            payload = self._execute_payload(code, params)
+            logger.info("📤 Sending %s (%gs timeout)...", payload['action'], timeout)
+            result = self.transport.call(payload, timeout)
+            if result.get('unknown_handle'):
+                result = self.transport.call(self._reupload_payload(code, params), timeout)
+            self._remember_handle(result)
+            logger.info("✅ Response received (ID: %.8s...)", result.get('id', ''))
+            return result
             
+        except TimeoutError:
+            logger.error("Timeout waiting for bot.js response!")
+            return {'success': False, 'error': f'Response timeout ({timeout:g}s)'}
+        except Exception as e:
+            logger.error(f"Failed to execute code: {e!r}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    async def aexecute_code(self, code: str, timeout: float = None, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """execute_code 的非同步版本（可被取消）"""
+        timeout = timeout or self.execute_timeout
+        try:
+            result = await self.transport.acall(self._execute_payload(code, params), timeout)
+            if result.get('unknown_handle'):
+                result = await self.transport.acall(self._reupload_payload(code, params), timeout)
+            self._remember_handle(result)
             return result
             
+        except TimeoutError:
+            logger.error("Timeout waiting for bot.js response!")
+            return {'success': False, 'error': f'Response timeout ({timeout:g}s)'}
         except Exception as e:
-            logger.error(f"Failed to execute code: {e}")
+            logger.error(f"Failed to execute code: {e!r}")
             return {
                 'success': False,
                 'error': str(e)
             }
     
+    def _execute_payload(self, code: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """已註冊的代碼只發送句柄，否則發送源碼"""
+        handle = code_handle(code)
+        with self._handles_lock:
+            registered = handle in self._handles
+            self.code_stats['invocations' if registered else 'uploads'] += 1
+        if registered:
+            return {'action': 'invoke', 'handle': handle, 'params': params or {}}
+        return {'action': 'execute_code', 'code': code, 'params': params or {}}
+    
+    def _reupload_payload(self, code: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
+        """bridge 不認得句柄（重啟過或已從快取淘汰）：忘記句柄並重新上傳源碼"""
+        handle = code_handle(code)
+        with self._handles_lock:
+            self._handles.discard(handle)
+            self.code_stats['reuploads'] += 1
+        logger.info(f"♻️ Bridge lost code handle {handle}, re-uploading source")
+        return {'action': 'execute_code', 'code': code, 'params': params or {}}
+    
+    def _remember_handle(self, result: Dict[str, Any]):
+        # 舊版 bot.js 的回應不帶句柄，此時每次都發送源碼
+        handle = result.get('handle')
+        if handle:
+            with self._handles_lock:
+                self._handles.add(handle)
+    
     def disconnect(self):
         """斷開連接"""
-        if self.bot_process:
-            self.bot_process.terminate()
-            self.bot_process.wait(timeout=5)
+        if self.transport:
+            self.transport.close()
             self.is_connected = False
-            logger.info("Bot disconnected")
+            logger.info(f"Bot disconnected (code cache: {self.code_stats}, states: {self.state_stats}, "
+                        f"world model: {self.world.stats})")
+    
+    def _state_payload(self, resync: bool = False) -> Dict[str, Any]:
+        """
+        get_state 請求：bridge 支持時優先使用增量觀察，其次是頂層欄位差量
+        
+        Args:
+            resync: 本地基準已失效，要求完整狀態（增量模式下為 reset）
+        """
+        payload = {'action': 'get_state'}
+        ready = self.transport.ready_message
+        if self.incremental_state and ready.get('incremental_state'):
+            payload['incremental'] = True
+            if resync or self.world.seq == 0:
+                payload['reset'] = True
+        elif self.state_delta and not resync and self._states and ready.get('state_delta'):
+            payload['delta'] = True
+        return payload
+    
+    def _resolve_state(self, reply: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        將 get_state 回應還原為完整狀態
+        
+        Returns:
+            完整狀態；差量的基準已不在本地時返回 None（調用方改要完整狀態）
+        """
+        if reply.get('incremental'):
+            if not self.world.apply(reply):
+                self.state_stats['resync'] += 1
+                return None
+            self.state_stats['delta' if not reply.get('reset') else 'full'] += 1
+            state = self.world.state()
+            state['id'] = reply.get('id')
+            return state
+        
+        if not reply.get('delta'):
+            if 'seq' in reply:
+                self._remember_state(reply['seq'], reply)
+                self.state_stats['full'] += 1
+            return reply
+        
+        with self._states_lock:
+            base = self._states.get(reply.get('base'))
+        if base is None:
+            self.state_stats['resync'] += 1
+            return None
+        
+        state = dict(base)
+        state.update(reply.get('changed') or {})
+        for key in reply.get('removed') or []:
+            state.pop(key, None)
+        state['id'] = reply.get('id')
+        self._remember_state(reply['seq'], state)
+        self.state_stats['delta'] += 1
+        return state
+    
+    def _remember_state(self, seq: int, state: Dict[str, Any]):
+        with self._states_lock:
+            self._states[seq] = state
+            while len(self._states) > 8:
+                self._states.popitem(last=False)
+    
+    def _state_to_observation(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """將 bot.js 的狀態回應轉換為觀察字典"""
+        if state.get('success') is False:
+            raise RuntimeError(state.get('error', 'get_state failed'))
+        
+        return {
+            'position': state.get('position', {}),
+            'health': state.get('health', 20),
+            'food': state.get('food', 20),
+            'inventory': state.get('inventory', []),
+            'nearby_entities': state.get('nearby_entities', []),
+            'nearby_blocks': state.get('nearby_blocks', []),
+            'time_of_day': state.get('time_of_day', 'day'),
+            'weather': state.get('weather', 'clear'),
+            'biome': state.get('biome', 'unknown')
+        }
     
     def _default_observation(self) -> Dict[str, Any]:
         """返回默認觀察值（出錯時使用）"""
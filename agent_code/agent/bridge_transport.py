@@ -0,0 +1,262 @@
+"""
+Bridge Transport - Python ↔ Node.js bridge 的多工傳輸層
+背景讀取線程依請求 ID 將 bot.js 的回應分派到各自的 Future。
+線路格式默認為換行分隔的 JSON，雙方都支持時在 ready 之後切換到長度前綴的 msgpack 幀。
+"""
+
+import os
+import json
+import uuid
+import struct
+import asyncio
+import logging
+import threading
+import subprocess
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, List
+
+try:
+    import msgpack
+except ImportError:  # 可選依賴，未安裝時只使用 JSON
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+_FRAME_HEADER = struct.Struct('>I')  # 4 字節大端長度
+
+
+class BridgeTransport:
+    """
+    以請求 ID 為鍵的多工傳輸
+
+    - 多個請求可同時在途，每個請求有獨立的超時與取消
+    - 回應由背景線程讀取並依 'id' 分派，遲到或未知 ID 的回應直接丟棄
+    - 進程結束時所有等待中的請求立即以 ConnectionError 失敗
+    - wire_format 為 auto 時，ready 信號列出 msgpack 且本地已安裝 msgpack 就切換到二進位幀
+    """
+
+    def __init__(self, command: List[str], env: Optional[Dict[str, str]] = None,
+                 wire_format: Optional[str] = None):
+        self.command = command
+        self.env = env
+        self.preferred_format = (wire_format or os.getenv('BRIDGE_WIRE_FORMAT', 'auto')).lower()
+        self.wire_format = 'json'   # 寫入使用的格式
+        self._read_format = 'json'  # 讀取線程使用的格式（收到切換確認後改變）
+
+        self.process = None
+        self.ready_message: Dict[str, Any] = {}
+
+        self._pending: Dict[str, Future] = {}
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._ready = threading.Event()
+        self._reader = None
+        self._closed = False
+
+    @property
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def in_flight(self) -> int:
+        """目前在途的請求數"""
+        return len(self._pending)
+
+    def start(self, ready_timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        啟動 bridge 進程並等待 ready 信號
+
+        Args:
+            ready_timeout: 等待 ready 的秒數（None 表示無限等待）
+
+        Returns:
+            ready 訊息
+        """
+        self._closed = False
+        self._ready.clear()
+        self.wire_format = self._read_format = 'json'
+        self.process = subprocess.Popen(
+            self.command,
+            env=self.env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=None  # 讓 stderr 直接輸出到 Docker logs
+        )
+
+        self._reader = threading.Thread(target=self._read_loop, name='bridge-reader', daemon=True)
+        self._reader.start()
+
+        if not self._ready.wait(ready_timeout):
+            raise TimeoutError(f'bridge did not become ready within {ready_timeout}s')
+        if not self.ready_message:
+            raise ConnectionError('bridge exited before sending ready signal')
+
+        self._negotiate_format(ready_timeout)
+        return self.ready_message
+
+    def request(self, payload: Dict[str, Any]) -> Future:
+        """
+        發送請求並返回對應的 Future（不阻塞等待回應）
+
+        Args:
+            payload: 請求內容（會自動附上 'id'）
+        """
+        request_id = str(uuid.uuid4())
+        future = Future()
+        future.request_id = request_id
+
+        with self._pending_lock:
+            if self._closed or not self.is_alive:
+                raise ConnectionError('bridge is not running')
+            self._pending[request_id] = future
+
+        message = dict(payload, id=request_id)
+        try:
+            with self._write_lock:
+                self.process.stdin.write(self._encode(message))
+                self.process.stdin.flush()
+        except Exception:
+            self._discard(request_id)
+            raise
+
+        return future
+
+    def call(self, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """同步請求：阻塞直到回應或超時（超時會取消該請求）"""
+        future = self.request(payload)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            self.cancel(future)
+            raise
+
+    async def acall(self, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """非同步請求：可被 asyncio 取消，超時或取消時釋放該請求"""
+        future = self.request(payload)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self.cancel(future)
+            raise
+
+    def cancel(self, future: Future):
+        """取消在途請求；之後到達的回應會被當作過期回應丟棄"""
+        self._discard(getattr(future, 'request_id', None))
+        future.cancel()
+
+    def close(self, timeout: float = 5):
+        """關閉 bridge 進程並讓所有在途請求失敗"""
+        self._closed = True
+        if self.process:
+            try:
+                self.process.terminate()
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self._fail_pending(ConnectionError('bridge closed'))
+
+    def _discard(self, request_id: Optional[str]):
+        with self._pending_lock:
+            self._pending.pop(request_id, None)
+
+    def _negotiate_format(self, timeout: Optional[float]):
+        """依 ready 信號列出的格式切換線路格式（舊版 bridge 不列出時保持 JSON）"""
+        formats = self.ready_message.get('formats') or ['json']
+        if self.preferred_format == 'json':
+            return
+        if msgpack is None or 'msgpack' not in formats:
+            if self.preferred_format == 'msgpack':
+                logger.warning(f"msgpack framing unavailable (bridge formats: {formats}, "
+                               f"python msgpack installed: {msgpack is not None}), using JSON")
+            return
+
+        ack = self.call({'action': 'set_format', 'format': 'msgpack'}, timeout or 10)
+        if ack.get('success'):
+            self.wire_format = 'msgpack'
+            logger.info("📦 Bridge switched to msgpack framing")
+        else:
+            logger.warning(f"Bridge refused msgpack framing: {ack.get('error')}")
+
+    def _encode(self, message: Dict[str, Any]) -> bytes:
+        if self.wire_format == 'msgpack':
+            body = msgpack.packb(message, use_bin_type=True)
+            return _FRAME_HEADER.pack(len(body)) + body
+        return (json.dumps(message) + '\n').encode('utf-8')
+
+    def _read_message(self, stdout) -> Optional[Dict[str, Any]]:
+        """
+        讀取下一條訊息
+
+        Returns:
+            訊息字典；空行或無法解析的輸出返回 {}；進程結束返回 None
+        """
+        if self._read_format == 'msgpack':
+            header = stdout.read(_FRAME_HEADER.size)
+            if len(header) < _FRAME_HEADER.size:
+                return None
+            size, = _FRAME_HEADER.unpack(header)
+            body = stdout.read(size)
+            if len(body) < size:
+                return None
+            return msgpack.unpackb(body, raw=False)
+
+        line = stdout.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            return {}
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning(f"Ignoring non-JSON bridge output: {line[:80]!r}")
+            return {}
+
+    def _read_loop(self):
+        """背景讀取 bot.js 的輸出並分派"""
+        stdout = self.process.stdout
+        try:
+            while True:
+                message = self._read_message(stdout)
+                if message is None:
+                    break
+                if not message:
+                    continue
+                if message.get('wire_format'):
+                    # 切換確認是舊格式的最後一條訊息
+                    self._read_format = message['wire_format']
+                self._dispatch(message)
+        except Exception as e:
+            logger.error(f"Bridge reader stopped: {e}")
+        finally:
+            self._ready.set()
+            self._fail_pending(ConnectionError('bridge process exited'))
+
+    def _dispatch(self, message: Dict[str, Any]):
+        request_id = message.get('id')
+
+        if request_id is None:
+            if message.get('ready'):
+                self.ready_message = message
+                self._ready.set()
+            else:
+                logger.warning(f"Bridge message without request ID: {str(message)[:120]}")
+            return
+
+        with self._pending_lock:
+            future = self._pending.pop(request_id, None)
+
+        if future is None:
+            logger.warning(f"Dropping stale bridge response (ID: {str(request_id)[:8]}...)")
+            return
+
+        if not future.done():
+            future.set_result(message)
+
+    def _fail_pending(self, error: Exception):
+        with self._pending_lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for future in pending:
+            if not future.done():
+                future.set_exception(error)
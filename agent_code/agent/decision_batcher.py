@@ -0,0 +1,164 @@
+"""
+Decision Batcher - 決策微批次服務
+在短時間窗口內收集多個 bot 的待決策觀察，合併成一次 LLM 調用
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DecisionBatcher:
+    """
+    決策微批次服務
+
+    - 第一個請求到達後最多等待 window_ms 收集更多請求，或收滿 max_batch 立即送出
+    - 同時在途的批次數受 max_inflight 限制，LLM 忙碌時新請求自然累積成更大的批次
+    - 記錄批次大小、排隊延遲與單項延遲
+    """
+
+    def __init__(self, llm_brain, window_ms: float = None, max_batch: int = None,
+                 max_inflight: int = None, history: int = 1000):
+        self.llm_brain = llm_brain
+        self.window = (window_ms if window_ms is not None else float(os.getenv('DECISION_BATCH_WINDOW_MS', '50'))) / 1000.0
+        self.max_batch = max_batch or int(os.getenv('DECISION_BATCH_MAX', '16'))
+        self.max_inflight = max_inflight or int(os.getenv('DECISION_BATCH_INFLIGHT', '2'))
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Semaphore] = None
+        self._batches = set()
+
+        # 指標（保留最近 history 筆）
+        self.batch_sizes = deque(maxlen=history)
+        self.queue_delays = deque(maxlen=history)
+        self.item_latencies = deque(maxlen=history)
+        self.total_items = 0
+        self.total_batches = 0
+
+    async def decide(self, observation: Dict[str, Any]) -> Dict[str, Any]:
+        """提交一個觀察並等待它的決策"""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((observation, future, time.monotonic()))
+        return await future
+
+    async def close(self):
+        """
+        停止收集並等待在途批次完成
+
+        收集到一半的批次照常送出；仍在隊列中的請求以 RuntimeError 結束，等待者不會永久掛起
+        """
+        if self._worker:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future, _ = self._queue.get_nowait()
+                if not future.done():
+                    future.set_exception(RuntimeError("Decision batcher is closed"))
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+
+    def get_statistics(self) -> Dict[str, float]:
+        """批次大小、排隊延遲與單項延遲（毫秒）統計"""
+        return {
+            'total_items': self.total_items,
+            'total_batches': self.total_batches,
+            'avg_batch_size': _mean(self.batch_sizes),
+            'max_batch_size': max(self.batch_sizes, default=0),
+            'avg_queue_delay_ms': _mean(self.queue_delays) * 1000,
+            'p95_queue_delay_ms': _percentile(self.queue_delays, 0.95) * 1000,
+            'avg_item_latency_ms': _mean(self.item_latencies) * 1000,
+            'p95_item_latency_ms': _percentile(self.item_latencies, 0.95) * 1000
+        }
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = self._queue or asyncio.Queue()
+            self._inflight = self._inflight or asyncio.Semaphore(self.max_inflight)
+            self._worker = asyncio.create_task(self._collect_loop(), name='decision-batcher')
+
+    async def _collect_loop(self):
+        """收集請求並組成批次"""
+        loop = asyncio.get_running_loop()
+        while True:
+            # 先拿到槽位再開始收集，LLM 忙碌期間請求會留在隊列中累積
+            await self._inflight.acquire()
+            batch = []
+            try:
+                batch.append(await self._queue.get())
+                deadline = loop.time() + self.window
+
+                while len(batch) < self.max_batch:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # close()：已收集的部分批次照常送出，沒有請求時歸還槽位
+                if batch:
+                    self._dispatch(batch)
+                else:
+                    self._inflight.release()
+                raise
+
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future, float]]):
+        task = asyncio.create_task(self._run_batch(batch))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future, float]]):
+        """在線程池中執行一次批次 LLM 調用並分派結果"""
+        try:
+            dispatched = time.monotonic()
+            for _, _, enqueued in batch:
+                self.queue_delays.append(dispatched - enqueued)
+
+            observations = [observation for observation, _, _ in batch]
+            try:
+                decisions = await asyncio.to_thread(self.llm_brain.make_decisions_batch, observations)
+            except Exception as e:
+                logger.error(f"Batched decision failed: {e}")
+                decisions = [self.llm_brain._default_decision() for _ in batch]
+
+            finished = time.monotonic()
+            for (_, future, enqueued), decision in zip(batch, decisions):
+                self.item_latencies.append(finished - enqueued)
+                if not future.done():
+                    future.set_result(decision)
+
+            self.batch_sizes.append(len(batch))
+            self.total_items += len(batch)
+            self.total_batches += 1
+
+            if self.total_batches % 100 == 0:
+                stats = self.get_statistics()
+                logger.info(f"📦 Decision batches: {self.total_batches}, "
+                            f"avg size {stats['avg_batch_size']:.1f}, "
+                            f"queue {stats['avg_queue_delay_ms']:.0f}ms, "
+                            f"latency {stats['avg_item_latency_ms']:.0f}ms")
+        finally:
+            self._inflight.release()
+
+
+def _mean(values) -> float:
+    return sum(values) / len(values) if values else 0.0
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
@@ -0,0 +1,162 @@
+"""
+Decision Cache - 決策快取
+以量化後的觀察狀態為鍵，重複出現的情況直接跳過 LLM 調用
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _count_bucket(count: int) -> int:
+    """數量分桶：0, 1, 2, 3-4, 5-8, 9-16, 17-32, ..."""
+    return 0 if count <= 0 else int(count - 1).bit_length() + 1
+
+
+def quantize_observation(observation: Dict[str, Any]) -> Tuple:
+    """
+    將決策提示詞實際用到的欄位量化成可比較的鍵
+
+    生命值與飢餓值以 2 為步長分桶（10 正好落在桶邊界，保留「< 10」的判斷；滿值併入 18-19），
+    實體與方塊數量按 2 的冪分桶，時間保持原值。
+    """
+    health = max(0, min(19, int(observation.get('health', 20) or 0)))
+    food = max(0, min(19, int(observation.get('food', 20) or 0)))
+    return (
+        health // 2,
+        food // 2,
+        _count_bucket(len(observation.get('nearby_entities', []))),
+        _count_bucket(len(observation.get('nearby_blocks', []))),
+        observation.get('time_of_day', 'day')
+    )
+
+
+class DecisionCache:
+    """
+    決策快取（LRU + TTL，可選磁碟持久層）
+
+    只存動作詞，決策字典由固定的 ACTION_MAP 重建。
+    多個 bot 共享同一個 LLMBrain 時從多個線程訪問，因此加鎖。
+    """
+
+    def __init__(self, max_entries: int = None, ttl: float = None, persist_path: str = None,
+                 persist_every: int = 100):
+        self.max_entries = max_entries or int(os.getenv('DECISION_CACHE_SIZE', '4096'))
+        self.ttl = ttl if ttl is not None else float(os.getenv('DECISION_CACHE_TTL', '600'))
+        persist_path = persist_path if persist_path is not None else os.getenv('DECISION_CACHE_PATH', '')
+        self.persist_path = Path(persist_path) if persist_path else None
+        self.persist_every = persist_every
+
+        self._entries: OrderedDict = OrderedDict()  # key -> (action, expires_at)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._unsaved = 0
+
+        # 指標
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if self.persist_path:
+            self.load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def get(self, key: Tuple) -> Optional[str]:
+        """查詢快取，命中時返回動作詞"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            action, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return action
+
+    def put(self, key: Tuple, action: str):
+        """寫入快取，超出容量時淘汰最久未用的項目"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = (action, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._unsaved += 1
+            should_save = self.persist_path is not None and self._unsaved >= self.persist_every
+
+        if should_save:
+            self.save()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """命中率等指標"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+    def load(self):
+        """從磁碟載入未過期的項目"""
+        if not self.persist_path or not self.persist_path.exists():
+            return
+
+        try:
+            now = time.time()
+            with open(self.persist_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    key, action, expires_at = json.loads(line)
+                    if expires_at > now:
+                        self._entries[tuple(key)] = (action, expires_at)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            logger.info(f"⚡ Loaded {len(self._entries)} cached decisions from {self.persist_path}")
+        except Exception as e:
+            logger.error(f"Failed to load decision cache: {e}")
+
+    def save(self):
+        """將快取原子地寫入磁碟（先寫臨時文件再替換）"""
+        if not self.persist_path:
+            return
+
+        try:
+            with self._save_lock:
+                with self._lock:
+                    entries = list(self._entries.items())
+                    self._unsaved = 0
+
+                self.persist_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.persist_path.with_suffix(self.persist_path.suffix + '.tmp')
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for key, (action, expires_at) in entries:
+                        f.write(json.dumps([list(key), action, expires_at], ensure_ascii=False) + '\n')
+                os.replace(tmp_path, self.persist_path)
+        except Exception as e:
+            logger.error(f"Failed to save decision cache: {e}")
@@ -0,0 +1,98 @@
+"""
+Decision Policy - 規則快速路徑
+將提示詞中「生存原則」這類確定性規則編譯成判斷函數，命中時不需要調用 LLM
+"""
+
+import os
+import re
+import operator
+import logging
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# 規則可用的觀察特徵
+FEATURES: Dict[str, Callable[[Dict[str, Any]], float]] = {
+    'health': lambda obs: obs.get('health', 20),
+    'food': lambda obs: obs.get('food', 20),
+    'entities': lambda obs: len(obs.get('nearby_entities', [])),
+    'hostiles': lambda obs: sum(1 for e in obs.get('nearby_entities', []) if e.get('type') == 'hostile'),
+    'blocks': lambda obs: len(obs.get('nearby_blocks', [])),
+    'inventory': lambda obs: len(obs.get('inventory', [])),
+}
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# 與 _build_decision_prompt 的「生存原則」一致，按優先順序排列
+DEFAULT_RULES = 'low_health: health < 10 -> retreat; hungry: food < 10 -> hunt'
+
+RULE_PATTERN = re.compile(r'^\s*(?:(\w+)\s*:)?\s*(\w+)\s*(<=|>=|==|!=|<|>)\s*(-?\d+(?:\.\d+)?)\s*->\s*(\w+)\s*$')
+
+
+class DecisionRule:
+    """一條編譯後的規則：feature op threshold -> action"""
+
+    def __init__(self, name: str, feature: str, op: str, threshold: float, action: str):
+        if feature not in FEATURES:
+            raise ValueError(f"Unknown rule feature: {feature}")
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown rule operator: {op}")
+
+        self.name = name
+        self.action = action
+        self.description = f"{feature} {op} {threshold:g} -> {action}"
+
+        extract = FEATURES[feature]
+        compare = OPERATORS[op]
+        self.matches: Callable[[Dict[str, Any]], bool] = lambda obs: compare(extract(obs), threshold)
+
+    @classmethod
+    def parse(cls, spec: str) -> 'DecisionRule':
+        """解析 'name: feature op threshold -> action' 格式的規則"""
+        match = RULE_PATTERN.match(spec)
+        if not match:
+            raise ValueError(f"Invalid rule: {spec!r}")
+        name, feature, op, threshold, action = match.groups()
+        return cls(name or f"{feature}{op}{threshold}", feature, op, float(threshold), action)
+
+
+class RulePolicy:
+    """
+    規則策略層
+
+    按順序評估規則，第一條命中的規則決定動作；沒有規則命中時返回 None，
+    由 LLM 處理。規則可用 DECISION_RULES 環境變量覆蓋（分號分隔，空字串關閉）。
+    """
+
+    def __init__(self, rules: List[DecisionRule] = None, valid_actions: List[str] = None):
+        if rules is None:
+            rules = self.from_spec(os.getenv('DECISION_RULES', DEFAULT_RULES))
+        if valid_actions is not None:
+            for rule in rules:
+                if rule.action not in valid_actions:
+                    raise ValueError(f"Rule {rule.name} uses unknown action: {rule.action}")
+        self.rules = rules
+        self.hits: Dict[str, int] = {rule.name: 0 for rule in rules}
+
+    @staticmethod
+    def from_spec(spec: str) -> List[DecisionRule]:
+        return [DecisionRule.parse(part) for part in spec.split(';') if part.strip()]
+
+    def decide(self, observation: Dict[str, Any]) -> Optional[Tuple[DecisionRule, str]]:
+        """返回 (命中的規則, 動作)，沒有命中則返回 None"""
+        for rule in self.rules:
+            try:
+                if rule.matches(observation):
+                    self.hits[rule.name] += 1
+                    return rule, rule.action
+            except Exception as e:
+                logger.warning(f"Rule {rule.name} failed: {e}")
+        return None
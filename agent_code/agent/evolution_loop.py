@@ -0,0 +1,226 @@
+"""
+Evolution Loop - 非同步流水線進化循環
+以 asyncio 重疊 Observe / Think / Act 各階段，並用自適應節拍取代固定延遲
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class TickScheduler:
+    """
+    自適應節拍調度器
+
+    取代原本固定的 time.sleep(5)：
+    - 行動本身已耗時（尋路、挖掘）時不再額外等待
+    - 連續選擇等待 (wait) 時逐步拉長間隔，避免空轉
+    - 發生錯誤時指數退避
+    """
+
+    def __init__(self, min_interval: float = None, max_interval: float = None,
+                 idle_backoff: float = 1.5, error_backoff: float = 2.0,
+                 max_error_delay: float = 30.0):
+        self.min_interval = min_interval if min_interval is not None else float(os.getenv('AGENT_TICK_MIN', '0.5'))
+        self.max_interval = max_interval if max_interval is not None else float(os.getenv('AGENT_TICK_MAX', '5'))
+        self.idle_backoff = idle_backoff
+        self.error_backoff = error_backoff
+        self.max_error_delay = max_error_delay
+
+        self._idle_delay = self.min_interval
+        self._error_delay = 0.0
+
+    def next_delay(self, iteration_elapsed: float, decision: Dict[str, Any],
+                   result: Dict[str, Any]) -> float:
+        """
+        計算下一輪開始前的等待秒數
+
+        Args:
+            iteration_elapsed: 本輪實際耗時（秒）
+            decision: 本輪決策
+            result: 本輪執行結果
+
+        Returns:
+            等待秒數
+        """
+        self._error_delay = 0.0
+
+        if decision.get('action_type') == 'wait':
+            # 連續等待：逐步放慢節奏
+            self._idle_delay = min(self.max_interval, max(self.min_interval, self._idle_delay * self.idle_backoff))
+            return self._idle_delay
+
+        self._idle_delay = self.min_interval
+
+        # 行動已經花掉的時間算進節拍內
+        return max(0.0, self.min_interval - iteration_elapsed)
+
+    def error_delay(self) -> float:
+        """主循環出錯後的等待秒數（指數退避）"""
+        if self._error_delay <= 0:
+            self._error_delay = max(self.min_interval, 1.0)
+        else:
+            self._error_delay = min(self.max_error_delay, self._error_delay * self.error_backoff)
+        return self._error_delay
+
+
+class EvolutionLoop:
+    """
+    非同步流水線版的進化循環
+
+    - 行動執行期間預取下一輪的觀察（需 BotController 支援並行請求）
+    - 反思交給背景反思隊列，技能保存在背景執行，不阻塞下一輪
+    - 以 TickScheduler 控制節拍
+    """
+
+    def __init__(self, agent, scheduler: Optional[TickScheduler] = None,
+                 max_background: int = None, label: str = '', decision_service=None):
+        self.agent = agent
+        self.decision_service = decision_service  # 例如共享的 DecisionBatcher
+        self.label = f"[{label}] " if label else ''  # 艦隊模式下區分各 bot 的日誌
+        self.scheduler = scheduler or TickScheduler()
+        self.max_background = max_background or int(os.getenv('AGENT_MAX_BACKGROUND', '4'))
+
+        self._background: Set[asyncio.Task] = set()
+        self._background_slots: Optional[asyncio.Semaphore] = None
+
+        # 吞吐量統計
+        self.started_at = None
+        self.decision_count = 0
+
+    @property
+    def decisions_per_minute(self) -> float:
+        """每分鐘決策數"""
+        if not self.started_at:
+            return 0.0
+        elapsed = time.monotonic() - self.started_at
+        return self.decision_count * 60.0 / elapsed if elapsed > 0 else 0.0
+
+    async def run(self):
+        """
+        運行循環直到 agent.is_running 變為 False
+
+        Raises:
+            ConnectionError: bridge 進程已結束（其他錯誤只記錄並退避後繼續）
+        """
+        agent = self.agent
+        self._background_slots = asyncio.Semaphore(self.max_background)
+        self.started_at = time.monotonic()
+
+        next_observation = asyncio.create_task(self._observe())
+
+        try:
+            while agent.is_running:
+                try:
+                    iteration_start = time.monotonic()
+                    agent.iteration_count += 1
+                    iteration = agent.iteration_count
+                    logger.info("\n%s\n🔄 %sIteration #%d\n%s\n", '=' * 60, self.label, iteration, '=' * 60)
+
+                    # === 1. OBSERVE (觀察) ===
+                    logger.info("👁️  [OBSERVE] Gathering environment data...")
+                    observation = await next_observation
+                    next_observation = None
+                    agent.log_observation(observation)
+
+                    # === 2. THINK (思考) ===
+                    logger.info("🧠 [THINK] Consulting LLM for decision...")
+                    decision = await self._think(observation)
+                    self.decision_count += 1
+                    agent.log_decision(decision)
+
+                    # === 3. ACT (行動) ===
+                    logger.info("⚡ [ACT] Executing action...")
+                    action = asyncio.create_task(asyncio.to_thread(agent.execute_action, decision))
+
+                    # 行動期間預取下一輪觀察
+                    if self._can_prefetch():
+                        next_observation = asyncio.create_task(self._observe())
+
+                    result = await action
+                    agent.log_result(result, decision)
+
+                    if next_observation is None:
+                        next_observation = asyncio.create_task(self._observe())
+
+                    # === 4. REFLECT (反思) ===
+                    if not result['success']:
+                        logger.warning("❌ [REFLECT] Action failed, queued for background analysis...")
+                        agent.reflect_on_failure(decision, result, iteration)
+                    else:
+                        logger.info("✅ [REFLECT] Action succeeded!")
+                        # 成功經驗寫入經驗集合與狀態向量索引（背景執行，不阻塞主循環）
+                        await self._spawn(agent.memory_manager.store_experience, observation, decision, result)
+
+                    # === 5. LEARN (學習) ===
+                    if result['success'] and decision.get('is_new_skill'):
+                        logger.info("💾 [LEARN] Saving new skill to memory...")
+                        await self._spawn(agent.skill_manager.save_skill, decision, result)
+
+                    elapsed = time.monotonic() - iteration_start
+                    delay = self.scheduler.next_delay(elapsed, decision, result)
+                    logger.debug("⏱️ Iteration took %.2fs, next tick in %.2fs (%.1f decisions/min)",
+                                 elapsed, delay, self.decisions_per_minute)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+
+                except ConnectionError:
+                    # bridge 已斷開，繼續循環只會得到默認觀察；結束循環讓上層（FleetSupervisor）重新連線
+                    logger.error("🔌 %sBridge connection lost, leaving the evolution loop", self.label)
+                    raise
+                except Exception as e:
+                    logger.error(f"❌ Error in main loop: {e}", exc_info=True)
+                    # 已成功預取的觀察繼續使用；失敗的預取取回異常後重新觀察
+                    if next_observation is not None and next_observation.done():
+                        if next_observation.cancelled() or next_observation.exception() is not None:
+                            next_observation = None
+                    if next_observation is None:
+                        next_observation = asyncio.create_task(self._observe())
+                    await asyncio.sleep(self.scheduler.error_delay())
+        finally:
+            if next_observation is not None:
+                next_observation.cancel()
+            await self.drain()
+
+    async def drain(self):
+        """等待背景任務（技能保存、經驗寫入）完成"""
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    def _can_prefetch(self) -> bool:
+        """BotController 是否允許多個請求同時在途"""
+        return getattr(self.agent.bot_controller, 'supports_concurrent_requests', False)
+
+    async def _observe(self) -> Dict[str, Any]:
+        controller = self.agent.bot_controller
+        if hasattr(controller, 'aget_observation'):
+            return await controller.aget_observation()
+        return await asyncio.to_thread(controller.get_observation)
+
+    async def _think(self, observation: Dict[str, Any]) -> Dict[str, Any]:
+        if self.decision_service is not None:
+            decision = await self.decision_service.decide(observation)
+        else:
+            decision = await asyncio.to_thread(self.agent.llm_brain.make_decision, observation)
+        # 有經過驗證的相似技能時改為執行該技能（索引查詢在亞毫秒級，直接在循環中進行）
+        return self.agent.skill_manager.reuse_skill(decision)
+
+    async def _spawn(self, func, *args):
+        """在背景執行阻塞工作；背景槽位用滿時才等待"""
+        await self._background_slots.acquire()
+
+        async def runner():
+            try:
+                await asyncio.to_thread(func, *args)
+            except Exception as e:
+                logger.error(f"Background task {getattr(func, '__name__', func)} failed: {e}")
+            finally:
+                self._background_slots.release()
+
+        task = asyncio.create_task(runner())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
@@ -0,0 +1,122 @@
+"""
+Failure Cache - 失敗分析結果快取
+以 (目標, 行動類型, 錯誤類別) 為鍵保存改進建議，相同類型的失敗不再重複請 LLM 分析
+"""
+
+import os
+import re
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+_HEX_ID = re.compile(r'\b[0-9a-f]{8,}(?:-[0-9a-f]{4,})*\b')
+_SPACES = re.compile(r'\s+')
+
+
+def normalize_error(error: Optional[str]) -> str:
+    """去掉錯誤信息中的數字、座標與 ID，讓同一類錯誤得到相同的文本"""
+    text = str(error or 'unknown error').lower()
+    text = _HEX_ID.sub('<id>', text)
+    text = _NUMBER.sub('#', text)
+    return _SPACES.sub(' ', text).strip()[:200]
+
+
+# bot.js 常見錯誤 → 錯誤類別（按順序匹配）
+ERROR_CLASSES = [
+    ('timeout', re.compile(r'timeout|timed out', re.I)),
+    ('no_path', re.compile(r'no path|nopath|path was stopped|goal (?:was )?changed|decide path', re.I)),
+    ('not_found', re.compile(r'not found|cannot find|no .* nearby', re.I)),
+    ('dig', re.compile(r'dig(?:ging)?|block .* not diggable', re.I)),
+    ('code', re.compile(r'syntaxerror|referenceerror|typeerror|is not defined|is not a function|unexpected token', re.I)),
+    ('bridge', re.compile(r'bridge|broken pipe|connection|response id mismatch', re.I)),
+]
+
+
+def classify_error(error: Optional[str]) -> str:
+    """將錯誤信息歸類；無法歸類時使用正規化後的錯誤文本"""
+    text = str(error or '')
+    for name, pattern in ERROR_CLASSES:
+        if pattern.search(text):
+            return name
+    return f"other:{normalize_error(text)[:80]}"
+
+
+def failure_key(goal: Optional[str], action_type: Optional[str], error: Optional[str]) -> Tuple[str, str, str]:
+    """失敗分析快取的鍵"""
+    return (goal or '', action_type or '', classify_error(error))
+
+
+class FailureAnalysisCache:
+    """
+    改進建議快取（LRU）
+
+    可在啟動時從 ai_failures 集合預熱，多個反思線程共享，因此加鎖。
+    """
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or int(os.getenv('FAILURE_CACHE_SIZE', '512'))
+
+        self._entries: OrderedDict = OrderedDict()  # key -> improvement
+        self._lock = threading.Lock()
+
+        # 指標
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.warm_loaded = 0
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[str]:
+        with self._lock:
+            improvement = self._entries.get(key)
+            if improvement is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return improvement
+
+    def put(self, key: Tuple[str, str, str], improvement: str):
+        with self._lock:
+            self._entries[key] = improvement
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def warm_load(self, lessons: Iterable[Dict[str, Any]]) -> int:
+        """
+        從過去的失敗記憶預熱
+
+        Args:
+            lessons: 含 goal / action_type / error / improvement 的字典（由舊到新）
+
+        Returns:
+            載入的項目數
+        """
+        loaded = 0
+        for lesson in lessons:
+            improvement = lesson.get('improvement')
+            if not improvement:
+                continue
+            self.put(failure_key(lesson.get('goal'), lesson.get('action_type'), lesson.get('error')), improvement)
+            loaded += 1
+
+        self.warm_loaded += loaded
+        logger.info(f"💡 Warm-loaded {loaded} failure lessons ({len(self._entries)} distinct)")
+        return loaded
+
+    def get_statistics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'warm_loaded': self.warm_loaded
+        }
@@ -0,0 +1,105 @@
+"""
+Fleet Supervisor - 多 bot 艦隊管理
+在同一個進程與事件循環中運行多個 AI 代理人，共享 LLM、記憶與技能模組
+"""
+
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from agent.evolution_loop import EvolutionLoop
+
+logger = logging.getLogger(__name__)
+
+
+class FleetSupervisor:
+    """
+    艦隊監督者
+
+    - 每個 bot 擁有自己的 BotController bridge 與迭代計數
+    - LLMBrain / MemoryManager / SkillManager 由 agent_factory 注入共享實例
+    - 所有 EvolutionLoop 在同一個事件循環中並行運行，崩潰或 bridge 斷開的 bot 會在退避後重新連線
+    - 提供 decision_service（如 DecisionBatcher）時，所有 bot 的決策請求經由它合併
+    """
+
+    def __init__(self, usernames: List[str], agent_factory: Callable[[int, str], object],
+                 connect_stagger: float = None, restart_delay: float = None,
+                 decision_service=None):
+        self.usernames = usernames
+        self.agent_factory = agent_factory
+        self.decision_service = decision_service
+        self.connect_stagger = connect_stagger if connect_stagger is not None else float(os.getenv('FLEET_CONNECT_STAGGER', '1'))
+        self.restart_delay = restart_delay if restart_delay is not None else float(os.getenv('FLEET_RESTART_DELAY', '30'))
+
+        self.agents: Dict[str, object] = {}
+        self.loops: Dict[str, EvolutionLoop] = {}
+        self.is_running = False
+
+    async def run(self):
+        """連接所有 bot 並運行它們的進化循環，直到 stop() 被調用"""
+        self.is_running = True
+
+        # 阻塞工作（LLM、bridge、記憶）都在線程池執行，按 bot 數量放大
+        workers = int(os.getenv('FLEET_THREADS', str(len(self.usernames) * 4 + 4)))
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fleet')
+        )
+
+        tasks = [
+            asyncio.create_task(self._supervise(index, username), name=f"bot-{username}")
+            for index, username in enumerate(self.usernames)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            if self.decision_service is not None:
+                await self.decision_service.close()
+
+    def stop(self):
+        """停止所有 bot"""
+        self.is_running = False
+        for agent in self.agents.values():
+            try:
+                agent.stop()
+            except Exception as e:
+                logger.error(f"Failed to stop {agent.bot_username}: {e}")
+
+    def get_statistics(self) -> Dict[str, Dict[str, float]]:
+        """每個 bot 的迭代數與決策吞吐量"""
+        return {
+            username: {
+                'iterations': self.agents[username].iteration_count,
+                'decisions_per_minute': loop.decisions_per_minute
+            }
+            for username, loop in self.loops.items()
+        }
+
+    async def _supervise(self, index: int, username: str):
+        """管理單個 bot 的生命週期：錯開連線、運行循環、失敗後重啟"""
+        await asyncio.sleep(index * self.connect_stagger)
+
+        while self.is_running:
+            agent = self.agent_factory(index, username)
+            self.agents[username] = agent
+            try:
+                await asyncio.to_thread(agent.connect)
+                agent.is_running = self.is_running
+
+                loop = EvolutionLoop(agent, label=username, decision_service=self.decision_service)
+                self.loops[username] = loop
+                await loop.run()
+
+            except asyncio.CancelledError:
+                raise
+            except ConnectionError as e:
+                logger.error(f"🔌 Bot {username} lost its bridge: {e}")
+            except Exception as e:
+                logger.error(f"❌ Bot {username} crashed: {e}", exc_info=True)
+            finally:
+                agent.stop()
+
+            if self.is_running:
+                logger.warning(f"🔁 Restarting {username} in {self.restart_delay:.0f}s...")
+                await asyncio.sleep(self.restart_delay)
@@ -4,17 +4,92 @@ LLM Brain - AI 的思考核心
 """
 
 import os
+import re
 import json
+import time
 import logging
-from typing import Dict, Any, List
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional
 from openai import OpenAI
 
+from agent.decision_cache import DecisionCache, quantize_observation
+from agent.decision_policy import RulePolicy
+from agent.memory_context import MemoryContext
+
 logger = logging.getLogger(__name__)
 
 
 class LLMBrain:
     """LLM 思考引擎"""
     
+    # 失敗分析無法完成時的佔位文字
+    ANALYSIS_FAILED = "無法分析失敗原因"
+    
+    # LLM 只需要從中選擇一個動作詞
+    VALID_ACTIONS = ['explore', 'mine_wood', 'mine_stone', 'hunt', 'retreat', 'rest']
+    
+    # 可用行動與生存原則（單個與批次提示詞共用）
+    ACTIONS_GUIDE = """**基礎行動:**
+- explore - 向前探索世界
+- mine_wood - 尋找並砍樹獲取木頭
+- mine_stone - 挖掘石頭
+- hunt - 尋找動物作為食物
+- retreat - 遇到危險時後退
+- rest - 原地等待觀察
+
+**生存原則:**
+- 生命值 < 10: 選擇 retreat
+- 飢餓值 < 10: 選擇 hunt
+- 沒有資源: 選擇 mine_wood 或 mine_stone
+- 其他情況: 選擇 explore"""
+    
+    # 串流解析時的單詞分隔（與 _extract_action 去除的標點一致）
+    WORD_BOUNDARY = re.compile(r'[\s.,!?:;"\']+')
+    
+    # 批次回答的一行，例如 "2: hunt" 或 "情況 2 - hunt"
+    BATCH_LINE_PATTERN = re.compile(r'^\D*?(\d+)\s*[:：.)\-]\s*(.+)$')
+    
+    # 動作映射到代碼
+    ACTION_MAP = {
+        'explore': {
+            'goal': '探索世界',
+            'reasoning': '向前移動探索未知區域',
+            'action_type': 'generate_code',
+            'code': 'const forward = bot.entity.position.offset(10, 0, 0); await bot.pathfinder.goto(new goals.GoalNear(forward.x, forward.y, forward.z, 1));'
+        },
+        'mine_wood': {
+            'goal': '收集木頭',
+            'reasoning': '尋找並砍伐樹木',
+            'action_type': 'generate_code',
+            'code': 'const log = bot.findBlock({matching: block => block.name.includes("log"), maxDistance: 32}); if(log) {await bot.pathfinder.goto(new goals.GoalLookAtBlock(log.position, bot.world)); await bot.dig(log);} else {const tree = bot.findBlock({matching: block => block.name.includes("leaves"), maxDistance: 32}); if(tree) await bot.pathfinder.goto(new goals.GoalNear(tree.position.x, tree.position.y, tree.position.z, 5));}'
+        },
+        'mine_stone': {
+            'goal': '挖掘石頭',
+            'reasoning': '收集石頭資源',
+            'action_type': 'generate_code',
+            'code': 'const stone = bot.findBlock({matching: block => block.name === "stone", maxDistance: 32}); if(stone) {await bot.pathfinder.goto(new goals.GoalLookAtBlock(stone.position, bot.world)); await bot.dig(stone);}'
+        },
+        'hunt': {
+            'goal': '狩獵動物',
+            'reasoning': '尋找食物來源',
+            'action_type': 'generate_code',
+            'code': 'const animals = Object.values(bot.entities).filter(e => ["pig","cow","chicken","sheep","rabbit"].includes(e.name) && e.position.distanceTo(bot.entity.position) < 32); if(animals.length > 0) {const target = animals[0]; await bot.pathfinder.goto(new goals.GoalNear(target.position.x, target.position.y, target.position.z, 2));}'
+        },
+        'retreat': {
+            'goal': '撤退到安全位置',
+            'reasoning': '生命值低，需要遠離危險',
+            'action_type': 'generate_code',
+            'code': 'const back = bot.entity.position.offset(-15, 0, 0); await bot.pathfinder.goto(new goals.GoalNear(back.x, back.y, back.z, 1));'
+        },
+        'rest': {
+            'goal': '休息觀察',
+            'reasoning': '等待並觀察環境',
+            'action_type': 'wait',
+            'code': ''
+        }
+    }
+    
     def __init__(self, memory_manager):
         self.memory_manager = memory_manager
         
@@ -28,6 +103,20 @@ class LLMBrain:
         # 系統提示詞
         self.system_prompt = self._load_system_prompt()
         
+        # 決策分層：規則 → 快取 → LLM
+        self.policy = RulePolicy(valid_actions=self.VALID_ACTIONS)
+        self.decision_cache = DecisionCache()
+        self.memory_context = MemoryContext(memory_manager)
+        self.tier_counts = {'rule': 0, 'cache': 0, 'llm': 0, 'fallback': 0}
+        self._tier_lock = threading.Lock()
+        
+        # 串流決策：邊接收邊解析，一出現有效動作就取消剩餘輸出
+        self.stream_decisions = os.getenv('LLM_STREAM_DECISIONS', 'false').lower() == 'true'
+        self.ttft_ms = deque(maxlen=1000)
+        self.decision_ms = deque(maxlen=1000)
+        self.retrieval_ms = deque(maxlen=1000)
+        self.memory_tokens = deque(maxlen=1000)
+        
         logger.info(f"🧠 LLM Brain initialized with model: {self.model}")
     
     def make_decision(self, observation: Dict[str, Any]) -> Dict[str, Any]:
@@ -40,39 +129,126 @@ class LLMBrain:
         Returns:
             決策字典，包含目標、行動類型、代碼等
         """
+        # 0. 規則與快取快速路徑
+        cache_key = quantize_observation(observation)
+        fast = self._fast_decision(observation, cache_key)
+        if fast is not None:
+            return fast
+        return self._llm_decision(observation, cache_key)
+    
+    def _llm_decision(self, observation: Dict[str, Any], cache_key) -> Dict[str, Any]:
+        """單個觀察的 LLM 決策（調用方已確認規則與快取都沒有命中）"""
         try:
-            # 1. 檢索相關記憶
-            relevant_memories = self.memory_manager.query_similar_situations(
-                observation, 
-                top_k=3
-            )
+            # 1. 檢索相關記憶（只在需要調用 LLM 時，裁剪到 token 預算）
+            relevant_memories, memory_stats = self.memory_context.build(observation, cache_key)
             
             # 2. 構建提示詞
             prompt = self._build_decision_prompt(observation, relevant_memories)
             
             # 3. 調用 LLM
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a Minecraft survival AI. Reply with ONLY ONE WORD from: explore, mine_wood, mine_stone, hunt, retreat, rest. No explanations."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=10
-            )
+            messages = [
+                {"role": "system", "content": "You are a Minecraft survival AI. Reply with ONLY ONE WORD from: explore, mine_wood, mine_stone, hunt, retreat, rest. No explanations."},
+                {"role": "user", "content": prompt}
+            ]
+            if self.stream_decisions:
+                decision_text, timing = self._stream_decision_text(messages)
+            else:
+                started = time.monotonic()
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=10
+                )
+                decision_text = response.choices[0].message.content
+                timing = {'ttft_ms': None, 'decision_ms': (time.monotonic() - started) * 1000, 'cancelled': False}
+            timing.update(memory_stats)
+            self._record_timing(timing)
             
             # 4. 解析響應
-            decision_text = response.choices[0].message.content
-            logger.info(f"🔍 LLM Raw Output: '{decision_text}' (len={len(decision_text)})")
+            logger.info("🔍 LLM Raw Output: '%s' (len=%d)", decision_text, len(decision_text))
             decision = self._parse_decision(decision_text)
+            decision['timing'] = timing
+            # 只快取模型確實給出的動作；無法解析時的默認探索不應在之後被當成 LLM 回答
+            if self._extract_action(decision_text):
+                self.decision_cache.put(cache_key, decision['action'])
+                self._count_tier('llm', decision)
+            else:
+                self._count_tier('fallback', decision)
             
-            logger.info(f"💭 LLM Decision: {decision.get('goal', 'Unknown')}")
+            logger.info("💭 LLM Decision: %s", decision.get('goal', 'Unknown'))
             
             return decision
             
         except Exception as e:
             logger.error(f"LLM decision failed: {e}")
-            return self._default_decision()
+            decision = self._default_decision()
+            self._count_tier('fallback', decision)
+            return decision
+    
+    def make_decisions_batch(self, observations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        一次 LLM 調用為多個觀察做出決策
+        
+        每個情況只需要一個動作詞，單獨請求時幾乎全部成本都是請求開銷，
+        因此把多個情況編號後放進同一個提示詞，並要求逐行回答。
+        
+        Args:
+            observations: 多個 bot / 迭代的觀察
+            
+        Returns:
+            與 observations 順序一致的決策列表
+        """
+        decisions: List[Optional[Dict[str, Any]]] = [None] * len(observations)
+        
+        # 先用規則與快取回答，只把未命中的情況送給 LLM
+        keys = [quantize_observation(observation) for observation in observations]
+        pending = []
+        for index, key in enumerate(keys):
+            decisions[index] = self._fast_decision(observations[index], key)
+            if decisions[index] is None:
+                pending.append(index)
+        
+        if len(pending) == 1:
+            decisions[pending[0]] = self._llm_decision(observations[pending[0]], keys[pending[0]])
+            pending = []
+        
+        actions: Dict[int, str] = {}
+        if pending:
+            memories = {}
+            for index in pending:
+                lines, memory_stats = self.memory_context.build(observations[index], keys[index])
+                self._record_memory(memory_stats)
+                memories[index] = lines
+            
+            # 回答缺項時只為缺少的情況補問一次（重用已檢索的記憶）；調用失敗時不再重試，
+            # LLM 出錯或過載時不會把一次失敗放大成逐個請求
+            missing = pending
+            for _ in range(2):
+                try:
+                    answered = self._request_batch_actions([observations[index] for index in missing],
+                                                           [memories[index] for index in missing])
+                except Exception as e:
+                    logger.error(f"LLM batch decision failed: {e}")
+                    break
+                for position, index in enumerate(missing, 1):
+                    if position in answered:
+                        actions[index] = answered[position]
+                missing = [index for index in missing if index not in actions]
+                if not missing:
+                    break
+        
+        for index in pending:
+            action = actions.get(index)
+            if action is None:
+                decisions[index] = self._default_decision()
+                self._count_tier('fallback', decisions[index])
+            else:
+                self.decision_cache.put(keys[index], action)
+                decisions[index] = self._action_to_decision(action)
+                self._count_tier('llm', decisions[index])
+        
+        return decisions
     
     def analyze_failure(self, error_context: Dict[str, Any]) -> str:
         """
@@ -115,7 +291,7 @@ class LLMBrain:
             
         except Exception as e:
             logger.error(f"Failure analysis failed: {e}")
-            return "無法分析失敗原因"
+            return self.ANALYSIS_FAILED
     
     def _build_decision_prompt(self, observation: Dict[str, Any], memories: List[str]) -> str:
         """構建決策提示詞"""
@@ -123,98 +299,104 @@ class LLMBrain:
         prompt = f"""你是 Minecraft 生存 AI。根據當前狀態選擇最佳行動。
 
 ## 當前狀態
-- 生命值: {observation['health']}/20 {'⚠️ 危險！' if observation['health'] < 10 else ''}
-- 飢餓值: {observation['food']}/20 {'🍖 需要食物' if observation['food'] < 10 else ''}
-- 附近實體: {len(observation.get('nearby_entities', []))} 個
-- 附近方塊: {len(observation.get('nearby_blocks', []))} 個
-- 時間: {observation['time_of_day']}
-
+{self._describe_state(observation)}
+{self._describe_memories(memories)}
 ## 可用行動
 只需回答一個單詞（不要有任何解釋）：
 
-**基礎行動:**
-- explore - 向前探索世界
-- mine_wood - 尋找並砍樹獲取木頭
-- mine_stone - 挖掘石頭
-- hunt - 尋找動物作為食物
-- retreat - 遇到危險時後退
-- rest - 原地等待觀察
-
-**生存原則:**
-- 生命值 < 10: 選擇 retreat
-- 飢餓值 < 10: 選擇 hunt
-- 沒有資源: 選擇 mine_wood 或 mine_stone
-- 其他情況: 選擇 explore
+{self.ACTIONS_GUIDE}
 
 你的選擇（只回答一個單詞）:"""
         return prompt
     
+    def _build_batch_prompt(self, observations: List[Dict[str, Any]], memories: List[List[str]] = None) -> str:
+        """構建批次決策提示詞（每個情況編號，附各自的相關經驗）"""
+        memories = memories or [[] for _ in observations]
+        situations = "\n\n".join(
+            f"## 情況 {index}\n{self._describe_state(observation)}"
+            + (f"\n相關經驗:\n{self._format_memories(lines)}" if lines else "")
+            for index, (observation, lines) in enumerate(zip(observations, memories), 1)
+        )
+        
+        prompt = f"""你是 Minecraft 生存 AI。以下有 {len(observations)} 個互相獨立的情況，請為每個情況各選擇一個最佳行動。
+
+{situations}
+
+## 可用行動
+每個情況只需回答一個單詞（不要有任何解釋）：
+
+{self.ACTIONS_GUIDE}
+
+請逐行回答，格式為「編號: 動作」，例如：
+1: explore
+2: hunt
+
+你的選擇:"""
+        return prompt
+    
+    def _describe_state(self, observation: Dict[str, Any]) -> str:
+        """狀態描述（單個與批次提示詞共用）"""
+        return f"""- 生命值: {observation['health']}/20 {'⚠️ 危險！' if observation['health'] < 10 else ''}
+- 飢餓值: {observation['food']}/20 {'🍖 需要食物' if observation['food'] < 10 else ''}
+- 附近實體: {len(observation.get('nearby_entities', []))} 個
+- 附近方塊: {len(observation.get('nearby_blocks', []))} 個
+- 時間: {observation['time_of_day']}"""
+    
+    def _describe_memories(self, memories: List[str]) -> str:
+        """相關經驗段落（沒有記憶時為空，提示詞與原來相同）"""
+        if not memories:
+            return ""
+        return f"""
+## 相關經驗
+{self._format_memories(memories)}
+"""
+    
+    @staticmethod
+    def _format_memories(memories: List[str]) -> str:
+        return "\n".join(f"- {line}" for line in memories)
+    
+    def _request_batch_actions(self, observations: List[Dict[str, Any]],
+                               memories: List[List[str]]) -> Dict[int, str]:
+        """一次 LLM 調用回答多個情況，返回 {編號: 動作}（缺項不在字典中）"""
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": "You are a Minecraft survival AI. For each numbered situation reply with one line '<number>: <action>' using ONLY: explore, mine_wood, mine_stone, hunt, retreat, rest. No explanations."},
+                {"role": "user", "content": self._build_batch_prompt(observations, memories)}
+            ],
+            temperature=0.3,
+            max_tokens=8 * len(observations) + 10
+        )
+        
+        decision_text = response.choices[0].message.content or ''
+        logger.info("🔍 LLM Batch Output (%d items): '%.200s'", len(observations), decision_text.strip())
+        return self._parse_batch_actions(decision_text, len(observations))
+    
+    def _parse_batch_actions(self, text: str, count: int) -> Dict[int, str]:
+        """解析「編號: 動作」格式的批次回答"""
+        actions = {}
+        for line in text.splitlines():
+            match = self.BATCH_LINE_PATTERN.match(line.strip())
+            if not match:
+                continue
+            index = int(match.group(1))
+            action = self._extract_action(match.group(2))
+            if 1 <= index <= count and action and index not in actions:
+                actions[index] = action
+        return actions
+    
     def _parse_decision(self, decision_text: str) -> Dict[str, Any]:
         """解析 LLM 返回的決策（簡化版：只需要一個動作詞）"""
         try:
-            # 清理回應文本
-            text = decision_text.strip().lower()
-            
-            # 提取第一個單詞作為動作
-            words = text.split()
-            if not words:
-                return self._default_decision()
-            
-            # 找到第一個有效的動作詞
-            valid_actions = ['explore', 'mine_wood', 'mine_stone', 'hunt', 'retreat', 'rest']
-            action = 'explore'  # 默認探索
-            
-            for word in words:
-                clean_word = word.strip('.,!?:;"\'')
-                if clean_word in valid_actions:
-                    action = clean_word
-                    break
-            
-            # 動作映射到代碼
-            action_map = {
-                'explore': {
-                    'goal': '探索世界',
-                    'reasoning': '向前移動探索未知區域',
-                    'action_type': 'generate_code',
-                    'code': 'const forward = bot.entity.position.offset(10, 0, 0); await bot.pathfinder.goto(new goals.GoalNear(forward.x, forward.y, forward.z, 1));'
-                },
-                'mine_wood': {
-                    'goal': '收集木頭',
-                    'reasoning': '尋找並砍伐樹木',
-                    'action_type': 'generate_code',
-                    'code': 'const log = bot.findBlock({matching: block => block.name.includes("log"), maxDistance: 32}); if(log) {await bot.pathfinder.goto(new goals.GoalLookAtBlock(log.position, bot.world)); await bot.dig(log);} else {const tree = bot.findBlock({matching: block => block.name.includes("leaves"), maxDistance: 32}); if(tree) await bot.pathfinder.goto(new goals.GoalNear(tree.position.x, tree.position.y, tree.position.z, 5));}'
-                },
-                'mine_stone': {
-                    'goal': '挖掘石頭',
-                    'reasoning': '收集石頭資源',
-                    'action_type': 'generate_code',
-                    'code': 'const stone = bot.findBlock({matching: block => block.name === "stone", maxDistance: 32}); if(stone) {await bot.pathfinder.goto(new goals.GoalLookAtBlock(stone.position, bot.world)); await bot.dig(stone);}'
-                },
-                'hunt': {
-                    'goal': '狩獵動物',
-                    'reasoning': '尋找食物來源',
-                    'action_type': 'generate_code',
-                    'code': 'const animals = Object.values(bot.entities).filter(e => ["pig","cow","chicken","sheep","rabbit"].includes(e.name) && e.position.distanceTo(bot.entity.position) < 32); if(animals.length > 0) {const target = animals[0]; await bot.pathfinder.goto(new goals.GoalNear(target.position.x, target.position.y, target.position.z, 2));}'
-                },
-                'retreat': {
-                    'goal': '撤退到安全位置',
-                    'reasoning': '生命值低，需要遠離危險',
-                    'action_type': 'generate_code',
-                    'code': 'const back = bot.entity.position.offset(-15, 0, 0); await bot.pathfinder.goto(new goals.GoalNear(back.x, back.y, back.z, 1));'
-                },
-                'rest': {
-                    'goal': '休息觀察',
-                    'reasoning': '等待並觀察環境',
-                    'action_type': 'wait',
-                    'code': ''
-                }
-            }
+            action = self._extract_action(decision_text)
+            if action is None:
+                if not decision_text.strip():
+                    return self._default_decision()
+                action = 'explore'  # 默認探索
             
-            # 獲取對應的行動
-            decision = action_map[action].copy()
-            decision['is_new_skill'] = False
+            decision = self._action_to_decision(action)
             
-            logger.info(f"💭 LLM Decision: {decision['goal']} (action: {action})")
+            logger.info("💭 LLM Decision: %s (action: %s)", decision['goal'], action)
             
             return decision
                 
@@ -222,6 +404,134 @@ class LLMBrain:
             logger.warning(f"Failed to parse decision: {e}")
             return self._default_decision()
     
+    def _extract_action(self, text: str) -> Optional[str]:
+        """找到文本中第一個有效的動作詞，沒有則返回 None"""
+        for word in text.strip().lower().split():
+            clean_word = word.strip('.,!?:;"\'')
+            if clean_word in self.VALID_ACTIONS:
+                return clean_word
+        return None
+    
+    def _action_to_decision(self, action: str) -> Dict[str, Any]:
+        """將動作詞映射為決策字典"""
+        decision = self.ACTION_MAP[action].copy()
+        decision['action'] = action
+        decision['is_new_skill'] = False
+        return decision
+    
+    def _stream_decision_text(self, messages: List[Dict[str, str]]):
+        """
+        以串流方式取得決策文本
+        
+        每收到一段 token 就檢查已完整的單詞，第一個有效動作詞出現後立即關閉串流，
+        不再等待模型把話說完。
+        
+        Returns:
+            (已接收的文本, 計時字典)
+        """
+        started = time.monotonic()
+        ttft = None
+        text = ''
+        cancelled = False
+        
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=10,
+            stream=True
+        )
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ''
+                if not delta:
+                    continue
+                if ttft is None:
+                    ttft = time.monotonic() - started
+                text += delta
+                
+                # 只看已經結束的單詞，避免把半個詞當成動作
+                complete = self.WORD_BOUNDARY.split(text)[:-1]
+                if self._extract_action(' '.join(complete)):
+                    cancelled = True
+                    break
+        finally:
+            stream.close()
+        
+        timing = {
+            'ttft_ms': ttft * 1000 if ttft is not None else None,
+            'decision_ms': (time.monotonic() - started) * 1000,
+            'cancelled': cancelled
+        }
+        logger.debug("⏱️ TTFT %.0fms, decision %.0fms%s", timing['ttft_ms'] or 0, timing['decision_ms'],
+                     ' (stream cancelled early)' if cancelled else '')
+        return text, timing
+    
+    def _record_timing(self, timing: Dict[str, Any]):
+        if timing.get('ttft_ms') is not None:
+            self.ttft_ms.append(timing['ttft_ms'])
+        self.decision_ms.append(timing['decision_ms'])
+        self._record_memory(timing)
+    
+    def _record_memory(self, memory_stats: Dict[str, Any]):
+        if 'retrieval_ms' in memory_stats:
+            self.retrieval_ms.append(memory_stats['retrieval_ms'])
+            self.memory_tokens.append(memory_stats['memory_tokens'])
+    
+    def _fast_decision(self, observation: Dict[str, Any], cache_key) -> Optional[Dict[str, Any]]:
+        """規則或快取能回答時直接返回決策，跳過 LLM"""
+        matched = self.policy.decide(observation)
+        if matched is not None:
+            rule, action = matched
+            decision = self._action_to_decision(action)
+            decision['reasoning'] = f"{decision['reasoning']}（規則 {rule.name}: {rule.description}）"
+            self._count_tier('rule', decision)
+            logger.info("💭 LLM Decision: %s (rule: %s)", decision['goal'], rule.name)
+            return decision
+        
+        action = self.decision_cache.get(cache_key)
+        if action is not None:
+            decision = self._action_to_decision(action)
+            self._count_tier('cache', decision)
+            logger.info("💭 LLM Decision: %s (cached: %s)", decision['goal'], action)
+            return decision
+        
+        return None
+    
+    def _count_tier(self, tier: str, decision: Dict[str, Any] = None):
+        """累計決策層計數，並在決策上標記來源層（寫入事件流）"""
+        if decision is not None:
+            decision['tier'] = tier
+        with self._tier_lock:
+            self.tier_counts[tier] += 1
+    
+    def get_decision_stats(self) -> Dict[str, Any]:
+        """各決策層處理的決策數，以及規則與快取省下的 LLM 調用比例"""
+        with self._tier_lock:
+            counts = dict(self.tier_counts)
+        total = sum(counts.values())
+        saved = counts['rule'] + counts['cache']
+        return {
+            'tiers': counts,
+            'total': total,
+            'llm_calls_saved': saved,
+            'saved_ratio': saved / total if total else 0.0,
+            'rule_hits': dict(self.policy.hits),
+            'cache': self.decision_cache.get_statistics(),
+            'avg_ttft_ms': sum(self.ttft_ms) / len(self.ttft_ms) if self.ttft_ms else None,
+            'avg_decision_ms': sum(self.decision_ms) / len(self.decision_ms) if self.decision_ms else None,
+            'avg_retrieval_ms': sum(self.retrieval_ms) / len(self.retrieval_ms) if self.retrieval_ms else None,
+            'avg_memory_tokens': sum(self.memory_tokens) / len(self.memory_tokens) if self.memory_tokens else None,
+            'memory_context': self.memory_context.get_statistics()
+        }
+    
+    def close(self):
+        """保存快取等持久狀態"""
+        logger.info(f"📊 Decision tiers: {self.get_decision_stats()}")
+        self.decision_cache.save()
+    
     def _load_system_prompt(self) -> str:
         """加載系統提示詞"""
         return """你是一個在 Minecraft 世界中生存的 AI 代理人。
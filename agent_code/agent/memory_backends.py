@@ -0,0 +1,412 @@
+"""
+Memory Backends - 記憶存儲後端
+MemoryManager 透過統一的集合接口（Chroma 集合的子集）存取記憶：
+- http:     chromadb.HttpClient，連到 ai-memory 容器（默認）
+- embedded: chromadb.PersistentClient，在進程內運行的持久化 Chroma
+- local:    NumPy 平面索引 + 記憶體映射向量文件，不需要任何伺服器
+"""
+
+import os
+import json
+import zlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """記憶後端接口：提供 Chroma 風格的集合（add / query / get / count / delete / update）"""
+
+    name = 'base'
+
+    def get_or_create_collection(self, name: str, metadata: Dict[str, Any] = None):
+        raise NotImplementedError
+
+
+class ChromaHttpBackend(MemoryBackend):
+    """遠端 ChromaDB（原有行為）"""
+
+    name = 'http'
+
+    def __init__(self, host: str = None, port: int = None):
+        import chromadb
+
+        self.client = chromadb.HttpClient(
+            host=host or os.getenv('CHROMA_HOST', 'chromadb'),
+            port=int(port or os.getenv('CHROMA_PORT', '8000'))
+        )
+
+    def get_or_create_collection(self, name: str, metadata: Dict[str, Any] = None):
+        return self.client.get_or_create_collection(name=name, metadata=metadata)
+
+
+class ChromaEmbeddedBackend(MemoryBackend):
+    """進程內的持久化 ChromaDB，省去 HTTP 往返"""
+
+    name = 'embedded'
+
+    def __init__(self, path: str = None):
+        import chromadb
+
+        self.path = Path(path or os.getenv('MEMORY_PATH', '/app/memory')) / 'chroma'
+        self.client = chromadb.PersistentClient(path=str(self.path))
+
+    def get_or_create_collection(self, name: str, metadata: Dict[str, Any] = None):
+        return self.client.get_or_create_collection(name=name, metadata=metadata)
+
+
+class HashingEmbedder:
+    """
+    特徵雜湊文本嵌入
+
+    將字元 1~3-gram（適用於中英混合文本）以 crc32 雜湊到固定維度並做 L2 正規化。
+    不需要模型推理，每次嵌入只需微秒級時間。
+    """
+
+    def __init__(self, dim: int = 256, ngrams=(1, 2, 3)):
+        self.dim = dim
+        self.ngrams = ngrams
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            text = ' '.join(str(text).lower().split())
+            for n in self.ngrams:
+                for i in range(len(text) - n + 1):
+                    h = zlib.crc32(text[i:i + n].encode('utf-8'))
+                    vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize(vectors)
+
+
+class NumpyFlatCollection:
+    """
+    NumPy 平面索引集合
+
+    - 向量存於記憶體映射的 float32 文件（容量不足時倍增）
+    - 文檔、元數據與刪除記錄以追加日誌保存，啟動時重放
+    - 查詢為精確的最近鄰搜索：默認餘弦距離；metadata 中 'hnsw:space' 為 'l2' 時
+      使用平方歐氏距離，且不對外部提供的向量做正規化（適合數值特徵向量）
+    """
+
+    def __init__(self, path: Path, name: str, metadata: Dict[str, Any] = None,
+                 embedder: HashingEmbedder = None, dim: int = None):
+        self.name = name
+        self.metadata = metadata or {}
+        self.embedder = embedder or HashingEmbedder()
+        self.dim = dim or self.embedder.dim
+        self.space = self.metadata.get('hnsw:space', 'cosine')
+
+        self.path = Path(path) / name
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._vector_file = self.path / 'vectors.f32'
+        self._log_file = self.path / 'records.jsonl'
+
+        self._lock = threading.RLock()
+        self._ids: List[Optional[str]] = []       # row -> id（已刪除為 None）
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict[str, Any]]] = []
+        self._rows: Dict[str, int] = {}           # id -> row
+        self._vectors = None
+        self._capacity = 0
+
+        self._open()
+
+    # ---- Chroma 兼容接口 ----
+
+    def count(self) -> int:
+        return len(self._rows)
+
+    def add(self, ids: List[str], documents: List[str] = None, metadatas: List[Dict[str, Any]] = None,
+            embeddings: List[List[float]] = None):
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        vectors = self._embed(documents, embeddings)
+
+        with self._lock:
+            # 先檢查全部 ID 再寫入：已存在（或批次內重複）的 ID 跳過並警告，與 Chroma 一致，
+            # 不會留下只寫了一半的批次
+            fresh = []
+            seen = set()
+            for i, doc_id in enumerate(ids):
+                if doc_id in self._rows or doc_id in seen:
+                    logger.warning(f"Skipping duplicate memory ID in {self.name}: {doc_id}")
+                    continue
+                seen.add(doc_id)
+                fresh.append(i)
+            if not fresh:
+                return
+
+            self._ensure_capacity(len(self._ids) + len(fresh))
+            records = []
+            for i in fresh:
+                doc_id = ids[i]
+                row = len(self._ids)
+                self._vectors[row] = vectors[i]
+                self._append_row(doc_id, documents[i], metadatas[i], row)
+                records.append({'op': 'add', 'id': doc_id, 'row': row,
+                                'document': documents[i], 'metadata': metadatas[i]})
+            self._vectors.flush()
+            self._write_log(records)
+
+    def query(self, query_texts: List[str] = None, query_embeddings: List[List[float]] = None,
+              n_results: int = 10, include: List[str] = None) -> Dict[str, List[List[Any]]]:
+        queries = self._embed(query_texts or [], query_embeddings)
+        results = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+
+        with self._lock:
+            used = len(self._ids)
+            alive = np.fromiter((doc_id is not None for doc_id in self._ids), dtype=bool, count=used)
+            for query in queries:
+                if not alive.any():
+                    for key in results:
+                        results[key].append([])
+                    continue
+
+                vectors = self._vectors[:used]
+                if self.space == 'l2':
+                    # 平方歐氏距離（與 Chroma 的 l2 空間一致）
+                    distances = np.einsum('ij,ij->i', vectors, vectors) - 2.0 * (vectors @ query) + query @ query
+                    distances = np.maximum(distances, 0.0)
+                else:
+                    distances = 1.0 - vectors @ query
+                distances[~alive] = np.inf
+                k = min(n_results, int(alive.sum()))
+                top = np.argpartition(distances, k - 1)[:k]
+                top = top[np.argsort(distances[top])]
+
+                results['ids'].append([self._ids[row] for row in top])
+                results['documents'].append([self._documents[row] for row in top])
+                results['metadatas'].append([self._metadatas[row] for row in top])
+                results['distances'].append([float(distances[row]) for row in top])
+
+        return results
+
+    def get(self, ids: List[str] = None, limit: int = None, offset: int = 0,
+            include: List[str] = None) -> Dict[str, List[Any]]:
+        with self._lock:
+            if ids is None:
+                rows = [row for row, doc_id in enumerate(self._ids) if doc_id is not None]
+            else:
+                rows = [self._rows[doc_id] for doc_id in ids if doc_id in self._rows]
+            rows = rows[offset:offset + limit if limit else None]
+
+            return {
+                'ids': [self._ids[row] for row in rows],
+                'documents': [self._documents[row] for row in rows],
+                'metadatas': [self._metadatas[row] for row in rows],
+                'embeddings': [np.array(self._vectors[row]) for row in rows]
+                              if include and 'embeddings' in include else None
+            }
+
+    def update(self, ids: List[str], documents: List[str] = None, metadatas: List[Dict[str, Any]] = None,
+               embeddings: List[List[float]] = None):
+        """
+        更新文檔、元數據或向量
+
+        只更新文檔時不改動向量（集合可能是數值狀態索引，文本嵌入的維度與含義都不同）；
+        要替換向量時明確傳入 embeddings
+        """
+        vectors = self._check_embeddings(embeddings, len(ids)) if embeddings is not None else None
+        with self._lock:
+            records = []
+            for i, doc_id in enumerate(ids):
+                row = self._rows.get(doc_id)
+                if row is None:
+                    continue
+                record = {'op': 'update', 'id': doc_id}
+                if documents is not None:
+                    self._documents[row] = documents[i]
+                    record['document'] = documents[i]
+                if metadatas is not None:
+                    self._metadatas[row] = metadatas[i]
+                    record['metadata'] = metadatas[i]
+                if vectors is not None:
+                    self._vectors[row] = vectors[i]
+                records.append(record)
+            if vectors is not None:
+                self._vectors.flush()
+            self._write_log(records)
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            deleted = []
+            for doc_id in ids:
+                row = self._rows.pop(doc_id, None)
+                if row is None:
+                    continue
+                self._ids[row] = None
+                self._documents[row] = None
+                self._metadatas[row] = None
+                deleted.append(doc_id)
+            if deleted:
+                self._write_log([{'op': 'delete', 'ids': deleted}])
+
+    def compact(self) -> int:
+        """
+        重寫向量文件與日誌，只保留存活的記錄（回收刪除留下的空行）
+
+        Returns:
+            回收的行數
+        """
+        with self._lock:
+            live = [row for row, doc_id in enumerate(self._ids) if doc_id is not None]
+            reclaimed = len(self._ids) - len(live)
+            if reclaimed == 0:
+                return 0
+
+            vectors = np.array(self._vectors[live]) if live else np.zeros((0, self.dim), dtype=np.float32)
+            ids = [self._ids[row] for row in live]
+            documents = [self._documents[row] for row in live]
+            metadatas = [self._metadatas[row] for row in live]
+
+            capacity = 1024
+            while capacity < len(live):
+                capacity *= 2
+            tmp_vectors = self._vector_file.with_suffix('.f32.tmp')
+            with open(tmp_vectors, 'wb') as f:
+                f.truncate(capacity * self.dim * 4)
+            new_vectors = np.memmap(tmp_vectors, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+            new_vectors[:len(live)] = vectors
+            new_vectors.flush()
+            del new_vectors
+
+            tmp_log = self._log_file.with_suffix('.jsonl.tmp')
+            with open(tmp_log, 'w', encoding='utf-8') as f:
+                for row, doc_id in enumerate(ids):
+                    f.write(json.dumps({'op': 'add', 'id': doc_id, 'row': row, 'document': documents[row],
+                                        'metadata': metadatas[row]}, ensure_ascii=False) + '\n')
+
+            self._vectors.flush()
+            del self._vectors
+            os.replace(tmp_vectors, self._vector_file)
+            os.replace(tmp_log, self._log_file)
+
+            self._ids, self._documents, self._metadatas, self._rows = [], [], [], {}
+            for row, doc_id in enumerate(ids):
+                self._append_row(doc_id, documents[row], metadatas[row], row)
+            self._vectors = np.memmap(self._vector_file, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+            self._capacity = capacity
+            return reclaimed
+
+    # ---- 內部實現 ----
+
+    def _embed(self, documents: List[Optional[str]], embeddings) -> np.ndarray:
+        if embeddings is not None:
+            return self._check_embeddings(embeddings, len(embeddings))
+        return self.embedder([doc or '' for doc in documents])
+
+    def _check_embeddings(self, embeddings, count: int) -> np.ndarray:
+        """外部提供的向量：檢查條數與維度（l2 空間保持原值，餘弦空間正規化）"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape != (count, self.dim):
+            raise ValueError(f"Expected {count} embeddings of dimension {self.dim} for {self.name}, "
+                             f"got shape {vectors.shape}")
+        return vectors if self.space == 'l2' else _normalize(vectors)
+
+    def _append_row(self, doc_id, document, metadata, row):
+        while len(self._ids) <= row:
+            self._ids.append(None)
+            self._documents.append(None)
+            self._metadatas.append(None)
+        self._ids[row] = doc_id
+        self._documents[row] = document
+        self._metadatas[row] = metadata
+        self._rows[doc_id] = row
+
+    def _ensure_capacity(self, rows: int):
+        if rows <= self._capacity and self._vectors is not None:
+            return
+
+        capacity = max(1024, self._capacity)
+        while capacity < rows:
+            capacity *= 2
+
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+        with open(self._vector_file, 'ab') as f:
+            f.truncate(capacity * self.dim * 4)
+        self._vectors = np.memmap(self._vector_file, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def _write_log(self, records: List[Dict[str, Any]]):
+        if not records:
+            return
+        with open(self._log_file, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def _open(self):
+        """重放追加日誌以重建內存索引"""
+        if self._log_file.exists():
+            with open(self._log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"Skipping corrupt memory record in {self._log_file}")
+                        continue
+                    op = record.get('op')
+                    if op == 'add':
+                        self._append_row(record['id'], record.get('document'), record.get('metadata'), record['row'])
+                    elif op == 'update' and record['id'] in self._rows:
+                        row = self._rows[record['id']]
+                        if 'document' in record:
+                            self._documents[row] = record['document']
+                        if 'metadata' in record:
+                            self._metadatas[row] = record['metadata']
+                    elif op == 'delete':
+                        for doc_id in record['ids']:
+                            row = self._rows.pop(doc_id, None)
+                            if row is not None:
+                                self._ids[row] = None
+                                self._documents[row] = None
+                                self._metadatas[row] = None
+
+        existing_rows = self._vector_file.stat().st_size // (self.dim * 4) if self._vector_file.exists() else 0
+        self._capacity = existing_rows
+        self._ensure_capacity(max(len(self._ids), 1))
+
+
+class NumpyFlatBackend(MemoryBackend):
+    """本地 NumPy 記憶後端"""
+
+    name = 'local'
+
+    def __init__(self, path: str = None, embedder: HashingEmbedder = None):
+        self.path = Path(path or os.getenv('MEMORY_PATH', '/app/memory')) / 'vectors'
+        self.embedder = embedder or HashingEmbedder(dim=int(os.getenv('MEMORY_EMBED_DIM', '256')))
+        self._collections: Dict[str, NumpyFlatCollection] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create_collection(self, name: str, metadata: Dict[str, Any] = None, dim: int = None):
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = NumpyFlatCollection(self.path, name, metadata, self.embedder, dim)
+            return self._collections[name]
+
+
+BACKENDS = {
+    'http': ChromaHttpBackend,
+    'embedded': ChromaEmbeddedBackend,
+    'local': NumpyFlatBackend,
+}
+
+
+def create_backend(kind: str = None) -> MemoryBackend:
+    """依 MEMORY_BACKEND 環境變量（http / embedded / local）建立記憶後端"""
+    kind = (kind or os.getenv('MEMORY_BACKEND', 'http')).lower()
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown memory backend: {kind} (expected one of {', '.join(BACKENDS)})")
+    return BACKENDS[kind]()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
@@ -0,0 +1,206 @@
+"""
+Memory Context - 決策提示詞的記憶上下文
+只在真正要調用 LLM 時才檢索記憶，排序並裁剪到 token 預算內，按量化狀態快取檢索結果
+"""
+
+import os
+import re
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+_CJK = re.compile(r'[\u3000-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估計 token 數：中日韓字元約 1 token，其餘約 4 字元 1 token"""
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def _field(document: str, label: str) -> str:
+    if label not in document:
+        return ''
+    return document.split(label, 1)[1].split('\n', 1)[0].strip()
+
+
+class MemoryContext:
+    """
+    記憶上下文階段
+
+    - build() 由 LLM 路徑調用，規則與快取命中時完全不檢索
+    - 取 candidates 條相似經驗與 failure_candidates 條失敗教訓，壓縮成一行一條並去重
+    - 兩個來源的距離不可比較（狀態向量 vs 文本嵌入），各自按距離與出現次數排序：
+      失敗教訓最多使用 failure_share 比例的 token_budget，經驗使用其餘預算
+    - 同一量化狀態在 ttl 秒內重用上次的結果；失敗檢索結果保留到失敗集合有新寫入為止
+    """
+
+    def __init__(self, memory_manager, token_budget: int = None, candidates: int = None,
+                 failure_candidates: int = None, failure_share: float = None, max_entries: int = 1024,
+                 ttl: float = None):
+        self.memory_manager = memory_manager
+        self.token_budget = token_budget if token_budget is not None else int(os.getenv('MEMORY_CONTEXT_TOKENS', '120'))
+        self.candidates = candidates or int(os.getenv('MEMORY_CONTEXT_CANDIDATES', '6'))
+        self.failure_candidates = (failure_candidates if failure_candidates is not None
+                                   else int(os.getenv('MEMORY_CONTEXT_FAILURES', '3')))
+        self.failure_share = (failure_share if failure_share is not None
+                              else float(os.getenv('MEMORY_CONTEXT_FAILURE_SHARE', '0.3')))
+        self.max_entries = max_entries
+        self.ttl = ttl if ttl is not None else float(os.getenv('MEMORY_CONTEXT_TTL', '60'))
+
+        self._entries: OrderedDict = OrderedDict()  # key -> (lines, tokens, expires_at)
+        self._failures: OrderedDict = OrderedDict()  # key -> (failure_version, records)
+        self._lock = threading.Lock()
+
+        # 指標
+        self.hits = 0
+        self.misses = 0
+        self.failure_hits = 0
+
+    def build(self, observation: Dict[str, Any], key: Tuple) -> Tuple[List[str], Dict[str, Any]]:
+        """
+        為一次 LLM 決策準備記憶
+
+        Args:
+            observation: 當前觀察
+            key: 量化後的觀察（quantize_observation）
+
+        Returns:
+            (提示詞中的記憶行, {'retrieval_ms', 'memory_tokens', 'memory_count', 'memory_cached'})
+        """
+        if self.token_budget <= 0:
+            return [], {'retrieval_ms': 0.0, 'memory_tokens': 0, 'memory_count': 0, 'memory_cached': False}
+
+        started = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] >= time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                lines, tokens, _ = entry
+                return lines, {'retrieval_ms': (time.monotonic() - started) * 1000, 'memory_tokens': tokens,
+                               'memory_count': len(lines), 'memory_cached': True}
+            self.misses += 1
+
+        experiences = self.memory_manager.query_similar_records(observation, top_k=self.candidates)
+        failures = self._failure_records(observation, key)
+        lines, tokens = self._select(experiences, failures)
+
+        with self._lock:
+            self._entries[key] = (lines, tokens, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return lines, {'retrieval_ms': (time.monotonic() - started) * 1000, 'memory_tokens': tokens,
+                       'memory_count': len(lines), 'memory_cached': False}
+
+    def get_statistics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'failure_hits': self.failure_hits,
+            'token_budget': self.token_budget
+        }
+
+    def _failure_records(self, observation: Dict[str, Any], key: Tuple) -> List[Dict[str, Any]]:
+        """失敗教訓檢索（失敗集合沒有新寫入時重用同一量化狀態的上次結果）"""
+        if self.failure_candidates <= 0:
+            return []
+        version = self.memory_manager.failure_version
+        with self._lock:
+            entry = self._failures.get(key)
+            if entry is not None and entry[0] == version:
+                self._failures.move_to_end(key)
+                self.failure_hits += 1
+                return entry[1]
+
+        records = self.memory_manager.query_failure_records(observation, top_k=self.failure_candidates)
+        with self._lock:
+            self._failures[key] = (version, records)
+            self._failures.move_to_end(key)
+            while len(self._failures) > self.max_entries:
+                self._failures.popitem(last=False)
+        return records
+
+    def _select(self, experiences: List[Dict[str, Any]],
+                failures: List[Dict[str, Any]]) -> Tuple[List[str], int]:
+        """兩個來源各自排序、去重，按各自的預算份額裁剪；經驗行在前"""
+        seen = set()
+        failure_budget = int(self.token_budget * self.failure_share) if experiences else self.token_budget
+        failure_lines, failure_tokens = self._fit(failures, failure_budget, seen)
+        # 失敗教訓用不完的份額留給經驗
+        experience_lines, experience_tokens = self._fit(experiences, self.token_budget - failure_tokens, seen)
+        return experience_lines + failure_lines, experience_tokens + failure_tokens
+
+    def _fit(self, records: List[Dict[str, Any]], budget: int, seen: set) -> Tuple[List[str], int]:
+        """單一來源：排序後累加到 budget 為止"""
+        lines = []
+        tokens = 0
+        for record in sorted(records, key=self._score):
+            line = self._summarize(record)
+            if not line or line in seen:
+                continue
+            cost = estimate_tokens(line) + 1
+            if tokens + cost > budget:
+                break
+            seen.add(line)
+            lines.append(line)
+            tokens += cost
+        return lines, tokens
+
+    @staticmethod
+    def _score(record: Dict[str, Any]) -> float:
+        """同一來源內越小越優先：距離越近、被合併的次數越多越靠前"""
+        distance = record.get('distance')
+        distance = 1.0 if distance is None else float(distance)
+        occurrences = int((record.get('metadata') or {}).get('occurrences', 1) or 1)
+        return distance / (1.0 + math.log(occurrences))
+
+    @staticmethod
+    def _summarize(record: Dict[str, Any]) -> str:
+        """將經驗文檔壓縮成一行：目標（行動）→ 結果；失敗教訓為 目標（行動）✗ 錯誤 → 改進建議"""
+        document = record.get('document') or ''
+        if '失敗案例' in document:
+            return MemoryContext._summarize_failure(record)
+        goal = _field(document, '決策:') or (record.get('metadata') or {}).get('goal', '')
+        if not goal:
+            return ''
+        action = (record.get('metadata') or {}).get('action') or _field(document, '行動:')
+        outcome = _field(document, '結果:') or '成功'
+        if outcome.endswith('N/A'):
+            outcome = outcome[:-3].rstrip(' -')
+        occurrences = int((record.get('metadata') or {}).get('occurrences', 1) or 1)
+
+        line = f"{goal}（{action}）→ {outcome[:40]}" if action else f"{goal} → {outcome[:40]}"
+        if occurrences > 1:
+            line += f"（{occurrences} 次）"
+        return line
+
+    @staticmethod
+    def _summarize_failure(record: Dict[str, Any]) -> str:
+        document = record.get('document') or ''
+        metadata = record.get('metadata') or {}
+        goal = metadata.get('goal') or _field(document, '目標:')
+        if not goal:
+            return ''
+        action = metadata.get('action_type') or _field(document, '行動:')
+        error = metadata.get('error') or _field(document, '錯誤:')
+        improvement = document.split('改進建議:', 1)[1].strip() if '改進建議:' in document else ''
+        occurrences = int(metadata.get('occurrences', 1) or 1)
+
+        line = f"{goal}（{action}）✗ {error[:30]}" if action else f"{goal} ✗ {error[:30]}"
+        if improvement:
+            line += f" → {improvement.splitlines()[0][:40]}"
+        if occurrences > 1:
+            line += f"（{occurrences} 次）"
+        return line
@@ -6,10 +6,14 @@ Memory Manager - 記憶管理器
 import os
 import json
 import logging
-from typing import Dict, Any, List
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
-import chromadb
-from chromadb.config import Settings
+
+from agent.memory_backends import MemoryBackend, NumpyFlatCollection, create_backend
+from agent.memory_writer import WriteBehindBuffer, new_memory_id
+from agent.memory_retention import MemoryRetention
+from agent.state_encoder import ObservationEncoder
 
 logger = logging.getLogger(__name__)
 
@@ -17,28 +21,49 @@ logger = logging.getLogger(__name__)
 class MemoryManager:
     """記憶管理器 - AI 的海馬迴"""
     
-    def __init__(self):
-        # 連接到 ChromaDB
-        chroma_host = os.getenv('CHROMA_HOST', 'chromadb')
-        chroma_port = os.getenv('CHROMA_PORT', '8000')
-        
-        self.client = chromadb.HttpClient(
-            host=chroma_host,
-            port=int(chroma_port)
-        )
+    def __init__(self, backend: MemoryBackend = None):
+        # 選擇記憶後端（MEMORY_BACKEND=http / embedded / local）
+        self.backend = backend or create_backend()
         
         # 創建或獲取集合
-        self.experience_collection = self.client.get_or_create_collection(
+        self.experience_collection = self.backend.get_or_create_collection(
             name="ai_experiences",
             metadata={"description": "AI agent's learning experiences"}
         )
         
-        self.failure_collection = self.client.get_or_create_collection(
+        self.failure_collection = self.backend.get_or_create_collection(
             name="ai_failures",
             metadata={"description": "Failed attempts and lessons learned"}
         )
         
-        logger.info("💾 Memory Manager connected to ChromaDB")
+        # 啟動時失敗教訓集合是否已有內容（之後以寫入計數判斷，查詢前不再逐次 count()）
+        try:
+            self._failures_at_start = self.failure_collection.count() > 0
+        except Exception:
+            self._failures_at_start = True
+        
+        # 相似情況檢索方式：state = 數值狀態向量（默認），text = 文本嵌入
+        self.similarity = os.getenv('MEMORY_SIMILARITY', 'state').lower()
+        
+        # 狀態向量索引（與經驗共用 ID，本地精確最近鄰，不需要嵌入推理）
+        self.state_encoder = ObservationEncoder()
+        self.state_index = NumpyFlatCollection(
+            Path(os.getenv('MEMORY_PATH', '/app/memory')) / 'states',
+            'ai_experience_states',
+            metadata={'hnsw:space': 'l2'},
+            dim=self.state_encoder.dim
+        )
+        
+        # 寫入先進本地日誌與緩衝，再由背景線程批次寫入集合
+        self.experience_writer = WriteBehindBuffer(self.experience_collection, 'ai_experiences')
+        self.failure_writer = WriteBehindBuffer(self.failure_collection, 'ai_failures')
+        self.state_writer = WriteBehindBuffer(self.state_index, 'ai_experience_states')
+        
+        # 定期合併、淘汰與歸檔，讓集合大小（查詢延遲與磁碟佔用）保持穩定
+        self.retention = MemoryRetention(self)
+        self.retention.start()
+        
+        logger.info(f"💾 Memory Manager connected ({self.backend.name} backend, {self.similarity} similarity)")
     
     def query_similar_situations(self, observation: Dict[str, Any], top_k: int = 3) -> List[str]:
         """
@@ -51,7 +76,21 @@ class MemoryManager:
         Returns:
             相關記憶的文本列表
         """
+        return [record['document'] for record in self.query_similar_records(observation, top_k)]
+    
+    def query_similar_records(self, observation: Dict[str, Any], top_k: int = 3) -> List[Dict[str, Any]]:
+        """
+        查詢相似的過去經驗（含元數據與距離，供排序使用）
+        
+        Returns:
+            按距離由近到遠排列的 {'id', 'document', 'metadata', 'distance'} 列表
+        """
         try:
+            if self.similarity == 'state':
+                records = self._query_states(observation, top_k)
+                if records:
+                    return records
+            
             # 構建查詢文本
             query_text = self._observation_to_text(observation)
             
@@ -60,16 +99,34 @@ class MemoryManager:
                 query_texts=[query_text],
                 n_results=top_k
             )
-            
-            if results['documents'] and len(results['documents'][0]) > 0:
-                return results['documents'][0]
-            else:
-                return []
+            return self._query_results_to_records(results)
                 
         except Exception as e:
             logger.error(f"Failed to query memories: {e}")
             return []
     
+    def query_failure_records(self, observation: Dict[str, Any], top_k: int = 3) -> List[Dict[str, Any]]:
+        """
+        查詢與當前情況相關的失敗教訓（記錄格式同 query_similar_records）
+        """
+        if not self._failures_at_start and not self.failure_writer.stats['flushed']:
+            return []
+        try:
+            results = self.failure_collection.query(
+                query_texts=[self._observation_to_text(observation)],
+                n_results=top_k
+            )
+            return self._query_results_to_records(results)
+        except Exception as e:
+            logger.error(f"Failed to query failure lessons: {e}")
+            return []
+    
+    @property
+    def failure_version(self) -> Tuple[int, Optional[str]]:
+        """失敗教訓集合的版本：寫入批次落地或壓縮後改變（記憶上下文據此重用失敗檢索結果）"""
+        report = self.retention.last_report
+        return self.failure_writer.stats['flushed'], report['timestamp'] if report else None
+    
     def store_experience(self, observation: Dict[str, Any], decision: Dict[str, Any], 
                         result: Dict[str, Any]):
         """
@@ -89,18 +146,17 @@ class MemoryManager:
 結果: 成功 - {result.get('message', 'N/A')}
 """
             
-            # 存儲到向量數據庫
-            doc_id = f"exp_{datetime.now().timestamp()}"
+            # 存儲到向量數據庫（批次寫入）
+            doc_id = new_memory_id('exp')
             
-            self.experience_collection.add(
-                documents=[doc_text],
-                ids=[doc_id],
-                metadatas=[{
-                    'timestamp': datetime.now().isoformat(),
-                    'goal': decision.get('goal', ''),
-                    'success': True
-                }]
-            )
+            metadata = {
+                'timestamp': datetime.now().isoformat(),
+                'goal': decision.get('goal', ''),
+                'action': decision.get('action', ''),
+                'success': True
+            }
+            self.experience_writer.add(doc_id, doc_text, metadata)
+            self.state_writer.add(doc_id, doc_text, metadata, self.state_encoder.encode(observation))
             
             logger.info(f"💾 Stored successful experience: {doc_id}")
             
@@ -127,32 +183,117 @@ class MemoryManager:
 改進建議: {improvement}
 """
             
-            doc_id = f"fail_{datetime.now().timestamp()}"
+            doc_id = new_memory_id('fail')
             
-            self.failure_collection.add(
-                documents=[doc_text],
-                ids=[doc_id],
-                metadatas=[{
-                    'timestamp': error_context['timestamp'],
-                    'goal': decision.get('goal', ''),
-                    'error': result.get('error', '')[:200]  # 限制長度
-                }]
-            )
+            self.failure_writer.add(doc_id, doc_text, {
+                'timestamp': error_context['timestamp'],
+                'goal': decision.get('goal', ''),
+                'action_type': decision.get('action_type', ''),
+                'error': result.get('error', '')[:200],  # 限制長度
+                'occurrences': error_context.get('occurrences', 1)
+            })
             
             logger.info(f"💾 Stored failure lesson: {doc_id}")
             
         except Exception as e:
             logger.error(f"Failed to store failure: {e}")
     
+    def iter_failure_lessons(self, limit: int = None) -> List[Dict[str, Any]]:
+        """
+        讀取過去的失敗教訓（用於預熱失敗分析快取）
+        
+        Args:
+            limit: 最多讀取的條數（默認 FAILURE_CACHE_WARM_LIMIT）
+            
+        Returns:
+            含 goal / action_type / error / improvement 的字典列表，按時間由舊到新
+        """
+        limit = limit or int(os.getenv('FAILURE_CACHE_WARM_LIMIT', '2000'))
+        try:
+            results = self.failure_collection.get(
+                limit=limit,
+                include=['documents', 'metadatas']
+            )
+        except Exception as e:
+            logger.error(f"Failed to read failure lessons: {e}")
+            return []
+        
+        lessons = []
+        for doc, metadata in zip(results.get('documents') or [], results.get('metadatas') or []):
+            metadata = metadata or {}
+            doc = doc or ''
+            action_type = metadata.get('action_type')
+            if not action_type and '行動:' in doc:
+                action_type = doc.split('行動:', 1)[1].split('\n', 1)[0].strip()
+            improvement = doc.split('改進建議:', 1)[1].strip() if '改進建議:' in doc else ''
+            lessons.append({
+                'timestamp': metadata.get('timestamp', ''),
+                'goal': metadata.get('goal', ''),
+                'action_type': action_type or '',
+                'error': metadata.get('error', ''),
+                'improvement': improvement
+            })
+        
+        lessons.sort(key=lambda lesson: lesson['timestamp'])
+        return lessons
+    
+    def flush(self):
+        """立即寫入所有緩衝中的記憶"""
+        self.experience_writer.flush()
+        self.failure_writer.flush()
+        self.state_writer.flush()
+    
+    def compact(self) -> Dict[str, Any]:
+        """立即執行一次記憶壓縮，返回報告"""
+        return self.retention.compact()
+    
+    def close(self):
+        """停止定期壓縮並關閉寫入緩衝（寫入剩餘記錄）"""
+        self.retention.stop()
+        self.experience_writer.close()
+        self.failure_writer.close()
+        self.state_writer.close()
+    
     def get_statistics(self) -> Dict[str, int]:
         """獲取記憶統計信息"""
         try:
             return {
                 'total_experiences': self.experience_collection.count(),
-                'total_failures': self.failure_collection.count()
+                'total_failures': self.failure_collection.count(),
+                'indexed_states': self.state_index.count()
             }
         except:
-            return {'total_experiences': 0, 'total_failures': 0}
+            return {'total_experiences': 0, 'total_failures': 0, 'indexed_states': 0}
+    
+    def _query_states(self, observation: Dict[str, Any], top_k: int) -> List[Dict[str, Any]]:
+        """以狀態向量查詢最相近的經驗（索引為空時返回空列表，由文本檢索接手）"""
+        if self.state_index.count() == 0:
+            return []
+        
+        results = self.state_index.query(
+            query_embeddings=[self.state_encoder.encode(observation)],
+            n_results=top_k
+        )
+        return self._query_results_to_records(results)
+    
+    @staticmethod
+    def _query_results_to_records(results: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """將 Chroma 風格的查詢結果（單個查詢）轉為記錄列表"""
+        if not results.get('documents') or not results['documents'][0]:
+            return []
+        
+        count = len(results['documents'][0])
+        metadatas = (results.get('metadatas') or [None])[0] or [None] * count
+        distances = (results.get('distances') or [None])[0] or [None] * count
+        return [
+            {
+                'id': results['ids'][0][i],
+                'document': results['documents'][0][i] or '',
+                'metadata': metadatas[i] or {},
+                'distance': distances[i]
+            }
+            for i in range(count)
+        ]
     
     def _observation_to_text(self, observation: Dict[str, Any]) -> str:
         """將觀察轉換為文本描述"""
@@ -0,0 +1,257 @@
+"""
+Memory Retention - 記憶保留與壓縮
+定期合併近似重複的記憶、淘汰過舊或超量的記憶，並將淘汰項歸檔為壓縮文件
+"""
+
+import os
+import gzip
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from agent.failure_cache import failure_key
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryRetention:
+    """
+    記憶保留策略
+
+    每次 compact() 對 ai_experiences 與 ai_failures 依序執行：
+    1. 合併近似重複：失敗按 (目標, 行動類型, 錯誤類別) 合併；經驗按 (目標, 行動) 分組，
+       狀態向量距離小於 merge_distance 的合併。保留最新一條，occurrences 累加
+    2. 年齡淘汰：最後出現時間早於 max_age_days 天的記憶
+    3. 數量淘汰：超過 max_entries 時淘汰最舊的記憶
+    淘汰的記憶先寫入 archive_dir 下的 gzip JSONL 冷存檔再刪除。
+    """
+
+    def __init__(self, memory_manager, max_age_days: float = None, max_entries: int = None,
+                 merge_distance: float = None, archive_dir: str = None, interval: float = None):
+        self.memory_manager = memory_manager
+        self.max_age_days = max_age_days if max_age_days is not None else float(os.getenv('MEMORY_MAX_AGE_DAYS', '14'))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('MEMORY_MAX_ENTRIES', '5000'))
+        self.merge_distance = (merge_distance if merge_distance is not None
+                               else float(os.getenv('MEMORY_MERGE_DISTANCE', '0.05')))
+        self.archive_dir = Path(archive_dir or os.getenv('MEMORY_ARCHIVE_DIR', '/app/memory/archive'))
+        self.interval = interval if interval is not None else float(os.getenv('MEMORY_COMPACT_INTERVAL', '3600'))
+
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """啟動定期壓縮的背景線程（interval <= 0 時不啟動）"""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='memory-retention', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+
+    def compact(self) -> Dict[str, Any]:
+        """
+        執行一次壓縮
+
+        Returns:
+            報告字典：每個集合的處理前後數量、合併數、淘汰數與歸檔文件
+        """
+        with self._lock:
+            started = time.monotonic()
+            self.memory_manager.flush()
+
+            report = {
+                'timestamp': datetime.now().isoformat(),
+                'experiences': self._compact_collection(
+                    self.memory_manager.experience_collection, 'ai_experiences', self._experience_groups),
+                'failures': self._compact_collection(
+                    self.memory_manager.failure_collection, 'ai_failures', self._failure_groups),
+            }
+
+            # 本地集合需要重寫文件才能回收刪除的空間（Chroma 自行管理）
+            report['rows_reclaimed'] = sum(
+                collection.compact()
+                for collection in (self.memory_manager.experience_collection,
+                                   self.memory_manager.failure_collection,
+                                   self.memory_manager.state_index)
+                if hasattr(collection, 'compact')
+            )
+            report['duration_ms'] = round((time.monotonic() - started) * 1000, 1)
+
+            self.last_report = report
+            logger.info(f"🧹 Memory compaction: {json.dumps(report, ensure_ascii=False)}")
+            return report
+
+    # ---- 單個集合 ----
+
+    def _compact_collection(self, collection, name: str, grouper) -> Dict[str, Any]:
+        records = self._load(collection)
+        stats = {'before': len(records), 'merged': 0, 'expired': 0, 'over_limit': 0,
+                 'after': len(records), 'archive': None}
+        if not records:
+            return stats
+
+        # 1. 合併近似重複
+        merged_updates, merged_ids = self._merge(records, grouper)
+        if merged_ids:
+            updated_ids = [record['id'] for record in merged_updates]
+            updated_metadatas = [record['metadata'] for record in merged_updates]
+            collection.update(ids=updated_ids, metadatas=updated_metadatas)
+            if name == 'ai_experiences':
+                self.memory_manager.state_index.update(ids=updated_ids, metadatas=updated_metadatas)
+            self._delete(collection, name, merged_ids)
+            stats['merged'] = len(merged_ids)
+            merged = set(merged_ids)
+            records = [record for record in records if record['id'] not in merged]
+
+        # 2. 年齡淘汰 3. 數量淘汰（由舊到新排序）
+        records.sort(key=lambda record: record['last_seen'])
+        cutoff = datetime.now() - timedelta(days=self.max_age_days) if self.max_age_days > 0 else None
+        expired = [record for record in records if cutoff and record['last_seen'] < cutoff]
+        remaining = records[len(expired):]
+        over_limit = remaining[:max(0, len(remaining) - self.max_entries)] if self.max_entries > 0 else []
+
+        evicted = expired + over_limit
+        if evicted:
+            stats['archive'] = str(self._archive(name, evicted))
+            self._delete(collection, name, [record['id'] for record in evicted])
+            stats['expired'] = len(expired)
+            stats['over_limit'] = len(over_limit)
+
+        stats['after'] = stats['before'] - stats['merged'] - len(evicted)
+        return stats
+
+    def _merge(self, records: List[Dict[str, Any]], grouper) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """
+        合併近似重複
+
+        Returns:
+            (需要更新元數據的保留記錄, 被合併掉的 ID)
+        """
+        survivors: Dict[str, Dict[str, Any]] = {}
+        merged_ids = []
+
+        for cluster in grouper(records):
+            if len(cluster) < 2:
+                continue
+            cluster.sort(key=lambda record: record['last_seen'], reverse=True)
+            keeper = cluster[0]
+            occurrences = sum(int(record['metadata'].get('occurrences', 1) or 1) for record in cluster)
+            first_seen = min(record['metadata'].get('first_seen') or record['metadata'].get('timestamp', '')
+                             for record in cluster)
+
+            keeper['metadata'] = dict(keeper['metadata'], occurrences=occurrences, first_seen=first_seen)
+            survivors[keeper['id']] = keeper
+            merged_ids.extend(record['id'] for record in cluster[1:])
+
+        return list(survivors.values()), merged_ids
+
+    def _failure_groups(self, records: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """失敗：同一 (目標, 行動類型, 錯誤類別) 為一組"""
+        groups: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        for record in records:
+            metadata = record['metadata']
+            key = failure_key(metadata.get('goal'), metadata.get('action_type') or _field(record['document'], '行動:'),
+                              metadata.get('error'))
+            groups.setdefault(key, []).append(record)
+        return list(groups.values())
+
+    def _experience_groups(self, records: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """經驗：同一 (目標, 行動) 內，狀態向量相近的為一組；沒有狀態向量的按文本完全相同分組"""
+        state_index = self.memory_manager.state_index
+        found = state_index.get(ids=[record['id'] for record in records], include=['embeddings'])
+        vectors = dict(zip(found['ids'], found.get('embeddings') or []))
+
+        groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for record in records:
+            key = (record['metadata'].get('goal', ''), _field(record['document'], '行動:'))
+            groups.setdefault(key, []).append(record)
+
+        clusters = []
+        for members in groups.values():
+            # 貪心聚類：每條記錄併入第一個距離足夠近的代表
+            representatives: List[Tuple[np.ndarray, List[Dict[str, Any]]]] = []
+            by_text: Dict[str, List[Dict[str, Any]]] = {}
+            for record in members:
+                vector = vectors.get(record['id'])
+                if vector is None:
+                    by_text.setdefault(' '.join(record['document'].split()), []).append(record)
+                    continue
+                for center, cluster in representatives:
+                    if float(np.sum((center - vector) ** 2)) <= self.merge_distance:
+                        cluster.append(record)
+                        break
+                else:
+                    representatives.append((vector, [record]))
+            clusters.extend(cluster for _, cluster in representatives)
+            clusters.extend(by_text.values())
+        return clusters
+
+    # ---- 存取 ----
+
+    def _load(self, collection, page_size: int = 1000) -> List[Dict[str, Any]]:
+        """分頁讀取集合中的全部記錄"""
+        records = []
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=['documents', 'metadatas'])
+            ids = page.get('ids') or []
+            for doc_id, document, metadata in zip(ids, page.get('documents') or [], page.get('metadatas') or []):
+                metadata = metadata or {}
+                records.append({
+                    'id': doc_id,
+                    'document': document or '',
+                    'metadata': metadata,
+                    'last_seen': _parse_time(metadata.get('timestamp'))
+                })
+            if len(ids) < page_size:
+                return records
+            offset += page_size
+
+    def _delete(self, collection, name: str, ids: List[str]):
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            collection.delete(ids=batch)
+            if name == 'ai_experiences':
+                self.memory_manager.state_index.delete(ids=batch)
+
+    def _archive(self, name: str, records: List[Dict[str, Any]]) -> Path:
+        """寫入冷存檔（gzip JSONL，每次壓縮一個文件）"""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        path = self.archive_dir / f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz"
+        with gzip.open(path, 'at', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps({'id': record['id'], 'document': record['document'],
+                                    'metadata': record['metadata']}, ensure_ascii=False) + '\n')
+        return path
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Memory compaction failed: {e}")
+
+
+def _parse_time(value: Any) -> datetime:
+    try:
+        return datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return datetime.min
+
+
+def _field(document: str, label: str) -> str:
+    """從記憶文檔中取出「標籤: 值」的值"""
+    if label not in document:
+        return ''
+    return document.split(label, 1)[1].split('\n', 1)[0].strip()
@@ -0,0 +1,203 @@
+"""
+Memory Writer - 記憶寫入緩衝
+經驗與失敗記錄先寫入本地日誌並暫存，按數量或時間批次寫入集合（write-behind）
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+
+def new_memory_id(prefix: str) -> str:
+    """不會碰撞的記憶 ID（納秒時間戳保持排序，隨機後綴避免同一時刻的衝突）"""
+    return f"{prefix}_{time.time_ns()}_{uuid.uuid4().hex[:8]}"
+
+
+class WriteBehindBuffer:
+    """
+    批次寫入緩衝
+
+    - add() 只追加一行本地日誌並放入緩衝，不發出網絡請求
+    - 緩衝達到 max_batch 條或最舊一條超過 max_age 秒時，背景線程一次寫入集合
+    - 寫入成功後才清除日誌；崩潰重啟時從日誌重放尚未寫入的記錄
+    """
+
+    def __init__(self, collection, name: str, journal_dir: str = None,
+                 max_batch: int = None, max_age: float = None):
+        self.collection = collection
+        self.name = name
+        self.max_batch = max_batch or int(os.getenv('MEMORY_WRITE_BATCH', '32'))
+        self.max_age = max_age if max_age is not None else float(os.getenv('MEMORY_WRITE_MAX_AGE', '2'))
+
+        journal_dir = Path(journal_dir or os.getenv('MEMORY_JOURNAL_DIR', '/app/memory/journal'))
+        journal_dir.mkdir(parents=True, exist_ok=True)
+        self.journal_path = journal_dir / f"{name}.jsonl"
+        self.rejected_path = journal_dir / f"{name}.rejected.jsonl"
+
+        self._pending: List[Dict[str, Any]] = []
+        self._oldest = None
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+
+        # 指標
+        self.stats = {'buffered': 0, 'flushed': 0, 'batches': 0, 'failures': 0, 'rejected': 0, 'replayed': 0}
+
+        self._replay_journal()
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+        self._thread = threading.Thread(target=self._flush_loop, name=f'memory-writer-{name}', daemon=True)
+        self._thread.start()
+
+    def add(self, doc_id: str, document: str, metadata: Dict[str, Any], embedding: List[float] = None):
+        """暫存一條記錄（先寫本地日誌）；embedding 為已計算好的向量（可選）"""
+        record = {'id': doc_id, 'document': document, 'metadata': metadata}
+        if embedding is not None:
+            record['embedding'] = [float(value) for value in embedding]
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError(f"Memory writer {self.name} is closed")
+            self._journal.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._journal.flush()
+
+            self._pending.append(record)
+            self.stats['buffered'] += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            if len(self._pending) >= self.max_batch:
+                self._condition.notify()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        """
+        將緩衝中的記錄一次寫入集合
+
+        Returns:
+            寫入的記錄數（失敗時為 0）
+
+        暫時性錯誤（網絡、磁碟）時記錄保留等待下次重試；數據本身被拒絕（ValueError / TypeError）時
+        重試也不會成功，整批移到 <name>.rejected.jsonl 並從日誌中清除，避免無限重試與日誌無限增長
+        """
+        with self._flush_lock:
+            with self._condition:
+                batch = self._pending
+                self._pending = []
+                self._oldest = None
+            if not batch:
+                return 0
+
+            try:
+                kwargs = {}
+                if all('embedding' in record for record in batch):
+                    kwargs['embeddings'] = [record['embedding'] for record in batch]
+                self.collection.add(
+                    ids=[record['id'] for record in batch],
+                    documents=[record['document'] for record in batch],
+                    metadatas=[record['metadata'] for record in batch],
+                    **kwargs
+                )
+            except (ValueError, TypeError) as e:
+                with self._condition:
+                    self.stats['rejected'] += len(batch)
+                    self._reject(batch)
+                    self._rewrite_journal()
+                logger.error(f"Rejected {len(batch)} {self.name} records (moved to {self.rejected_path.name}): {e}")
+                return 0
+            except Exception as e:
+                with self._condition:
+                    self._pending = batch + self._pending
+                    self._oldest = self._oldest or time.monotonic()
+                    self.stats['failures'] += 1
+                logger.error(f"Failed to flush {len(batch)} {self.name} records: {e}")
+                return 0
+
+            with self._condition:
+                self.stats['flushed'] += len(batch)
+                self.stats['batches'] += 1
+                self._rewrite_journal()
+
+            logger.debug(f"💾 Flushed {len(batch)} {self.name} records")
+            return len(batch)
+
+    def close(self):
+        """停止背景線程並寫入剩餘記錄"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout=10)
+        self.flush()
+        self._journal.close()
+        logger.info(f"💾 Memory writer {self.name} closed: {self.stats}")
+
+    def _flush_loop(self):
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if len(self._pending) >= self.max_batch:
+                        break
+                    if self._oldest is not None:
+                        remaining = self._oldest + self.max_age - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                if self._closed:
+                    return
+            if self.flush() == 0 and self._pending:
+                # 寫入失敗：稍後重試，避免忙等
+                time.sleep(min(self.max_age, 5) or 1)
+
+    def _rewrite_journal(self):
+        """日誌只保留尚未寫入的記錄（調用時需持有 _condition）"""
+        self._journal.close()
+        tmp_path = self.journal_path.with_suffix('.jsonl.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for record in self._pending:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.journal_path)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def _reject(self, batch: List[Dict[str, Any]]):
+        """保存被集合拒絕的記錄以便人工檢查"""
+        with open(self.rejected_path, 'a', encoding='utf-8') as f:
+            for record in batch:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def _replay_journal(self):
+        """載入上次崩潰前尚未寫入的記錄（已存在於集合中的會被跳過）"""
+        if not self.journal_path.exists():
+            return
+
+        records = []
+        with open(self.journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping truncated journal line in {self.journal_path}")
+        if not records:
+            return
+
+        try:
+            existing = set(self.collection.get(ids=[record['id'] for record in records])['ids'])
+        except Exception as e:
+            logger.warning(f"Could not check replayed {self.name} records: {e}")
+            existing = set()
+
+        self._pending = [record for record in records if record['id'] not in existing]
+        if self._pending:
+            self._oldest = time.monotonic()
+        self.stats['replayed'] = len(self._pending)
+        logger.info(f"💾 Replayed {len(self._pending)} unflushed {self.name} records from journal")
@@ -0,0 +1,182 @@
+"""
+Reflection Worker - 背景失敗反思隊列
+失敗分析（LLM）與失敗記憶寫入移出主循環，由有界隊列與背景線程處理
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from agent.failure_cache import FailureAnalysisCache, failure_key, normalize_error
+from utils.events import emit_event
+
+logger = logging.getLogger(__name__)
+
+
+def error_signature(decision: Dict[str, Any], result: Dict[str, Any]) -> Tuple[str, str, str]:
+    """失敗的去重鍵：(目標, 行動類型, 正規化錯誤)"""
+    return (
+        decision.get('goal') or '',
+        decision.get('action_type') or '',
+        normalize_error(result.get('error'))
+    )
+
+
+class ReflectionQueue:
+    """
+    有界的背景反思隊列
+
+    - submit() 永不阻塞：相同簽名的待處理失敗會合併（計入 occurrences），
+      隊列已滿時丟棄新的失敗並計數
+    - 改進建議存在 FailureAnalysisCache，以 (目標, 行動類型, 錯誤類別) 為鍵，
+      同一類失敗只請 LLM 分析一次；啟動時可從 ai_failures 集合預熱
+    - 多個 bot 可共享同一個隊列
+    """
+
+    def __init__(self, llm_brain, memory_manager, max_pending: int = None,
+                 workers: int = None, lessons: FailureAnalysisCache = None,
+                 warm_load: bool = None):
+        self.llm_brain = llm_brain
+        self.memory_manager = memory_manager
+        self.max_pending = max_pending or int(os.getenv('REFLECTION_QUEUE_SIZE', '32'))
+        self.lessons = lessons or FailureAnalysisCache()
+
+        self._pending: OrderedDict = OrderedDict()  # signature -> job
+        self._condition = threading.Condition()
+        self._active = 0
+        self._closed = False
+
+        # 指標
+        self.stats = {'submitted': 0, 'coalesced': 0, 'dropped': 0, 'analyzed': 0, 'reused': 0, 'stored': 0}
+
+        # 預熱在背景進行，不拖慢啟動
+        if warm_load is None:
+            warm_load = os.getenv('FAILURE_CACHE_WARM', 'true').lower() == 'true'
+        if warm_load:
+            threading.Thread(target=self._warm_load, name='reflection-warm', daemon=True).start()
+
+        worker_count = workers or int(os.getenv('REFLECTION_WORKERS', '1'))
+        self._workers = [
+            threading.Thread(target=self._work_loop, name=f'reflection-{i}', daemon=True)
+            for i in range(worker_count)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, decision: Dict[str, Any], result: Dict[str, Any], iteration: int = 0,
+               agent: Optional[str] = None) -> bool:
+        """
+        提交一次失敗（不阻塞）
+
+        Args:
+            agent: 失敗的 bot 名稱（艦隊模式下寫入 reflection 事件）
+
+        Returns:
+            False 表示因隊列已滿而被丟棄
+        """
+        signature = error_signature(decision, result)
+
+        with self._condition:
+            self.stats['submitted'] += 1
+
+            job = self._pending.get(signature)
+            if job is not None:
+                job['occurrences'] += 1
+                job['iteration'] = iteration
+                job['agent'] = agent
+                self.stats['coalesced'] += 1
+                return True
+
+            if self._closed or len(self._pending) >= self.max_pending:
+                self.stats['dropped'] += 1
+                logger.warning(f"⚠️ Reflection queue full, dropping failure: {signature[2][:60]}")
+                return False
+
+            self._pending[signature] = {
+                'decision': decision,
+                'result': result,
+                'iteration': iteration,
+                'agent': agent,
+                'timestamp': datetime.now().isoformat(),
+                'occurrences': 1
+            }
+            self._condition.notify()
+            return True
+
+    def close(self, timeout: float = 30):
+        """停止接收新工作，並在 timeout 內處理完剩餘的失敗"""
+        with self._condition:
+            self._closed = True
+            self._condition.wait_for(lambda: not self._pending and not self._active, timeout)
+            self._condition.notify_all()
+        logger.info(f"💡 Reflection queue stats: {self.stats}, lessons: {self.lessons.get_statistics()}")
+
+    def _warm_load(self):
+        try:
+            self.lessons.warm_load(self.memory_manager.iter_failure_lessons())
+        except Exception as e:
+            logger.error(f"Failed to warm-load failure lessons: {e}")
+
+    def _work_loop(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                signature, job = self._pending.popitem(last=False)
+                self._active += 1
+
+            try:
+                self._reflect(signature, job)
+            except Exception as e:
+                logger.error(f"Reflection failed: {e}")
+            finally:
+                with self._condition:
+                    self._active -= 1
+                    self._condition.notify_all()
+
+    def _reflect(self, signature: Tuple[str, str, str], job: Dict[str, Any]):
+        """分析（或重用已有的分析）並寫入失敗記憶"""
+        error_context = {
+            'decision': job['decision'],
+            'result': job['result'],
+            'iteration': job['iteration'],
+            'timestamp': job['timestamp'],
+            'occurrences': job['occurrences']
+        }
+
+        key = failure_key(signature[0], signature[1], job['result'].get('error'))
+        improvement = self.lessons.get(key)
+        reused = improvement is not None
+
+        if improvement is None:
+            # 讓 LLM 分析失敗原因並提出改進方案
+            improvement = self.llm_brain.analyze_failure(error_context)
+            logger.info(f"💡 [IMPROVEMENT] {improvement}")
+            with self._condition:
+                self.stats['analyzed'] += 1
+            # 分析失敗的佔位文字不當作教訓保存，下次再試
+            if improvement != self.llm_brain.ANALYSIS_FAILED:
+                self.lessons.put(key, improvement)
+        else:
+            with self._condition:
+                self.stats['reused'] += 1
+            logger.debug(f"💡 [IMPROVEMENT] Reusing lesson for {key}")
+
+        emit_event(
+            'reflection', agent=job['agent'], iteration=job['iteration'],
+            goal=job['decision'].get('goal') or '',
+            action_type=job['decision'].get('action_type'),
+            error=str(job['result'].get('error', '')),
+            improvement=improvement,
+            reused=reused,
+            occurrences=job['occurrences']
+        )
+
+        # 將失敗案例存入記憶，避免重蹈覆轍
+        self.memory_manager.store_failure(error_context, improvement)
+        with self._condition:
+            self.stats['stored'] += 1
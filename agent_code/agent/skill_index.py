@@ -0,0 +1,163 @@
+"""
+Skill Index - 技能檢索索引
+以技能的目標、描述與參數名建立雜湊文本向量，按相似度 × 成功率排序，
+讓決策可以重用已經驗證過的技能，而不是每次都執行新生成的代碼
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, List
+
+import numpy as np
+
+from agent.memory_backends import HashingEmbedder
+
+logger = logging.getLogger(__name__)
+
+
+def skill_document(skill: Dict[str, Any]) -> str:
+    """技能的檢索文本：目標 + 描述 + 參數名"""
+    parameters = skill.get('parameters') or {}
+    return ' '.join(filter(None, [
+        skill.get('goal') or '',
+        skill.get('description') or '',
+        ' '.join(sorted(parameters)) if isinstance(parameters, dict) else ''
+    ]))
+
+
+class SkillIndex:
+    """
+    技能向量索引（內存中的 NumPy 矩陣）
+
+    - 分數 = 餘弦相似度 × 平滑成功率 (s + 1) / (s + f + 2)
+    - 只返回相似度 >= min_similarity 且成功次數 >= min_successes 的技能
+    - 查詢向量按文本快取（決策目標大多來自固定的動作表）
+    """
+
+    def __init__(self, embedder: HashingEmbedder = None, min_similarity: float = None,
+                 min_successes: int = None, query_cache_size: int = 256):
+        self.embedder = embedder or HashingEmbedder(dim=int(os.getenv('SKILL_INDEX_DIM', '256')))
+        self.min_similarity = (min_similarity if min_similarity is not None
+                               else float(os.getenv('SKILL_MATCH_MIN_SIMILARITY', '0.6')))
+        self.min_successes = (min_successes if min_successes is not None
+                              else int(os.getenv('SKILL_MATCH_MIN_SUCCESSES', '2')))
+        self.query_cache_size = query_cache_size
+
+        dim = self.embedder.dim
+        self._names: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._success = np.zeros(0, dtype=np.float32)
+        self._failure = np.zeros(0, dtype=np.float32)
+        self._count = 0
+
+        self._lock = threading.RLock()
+        self._query_cache: OrderedDict = OrderedDict()
+        self.ready = threading.Event()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._rows
+
+    def build(self, skills: Iterable[Dict[str, Any]]):
+        """以整個技能目錄重建索引"""
+        skills = list(skills)
+        vectors = self.embedder([skill_document(skill) for skill in skills]) if skills \
+            else np.zeros((0, self.embedder.dim), dtype=np.float32)
+
+        with self._lock:
+            self._names = [skill['name'] for skill in skills]
+            self._rows = {name: row for row, name in enumerate(self._names)}
+            self._vectors = vectors.astype(np.float32)
+            self._success = np.array([skill.get('success_count', 0) or 0 for skill in skills], dtype=np.float32)
+            self._failure = np.array([skill.get('failure_count', 0) or 0 for skill in skills], dtype=np.float32)
+            self._count = len(skills)
+        self.ready.set()
+        logger.info(f"🎯 Skill index built with {self._count} skills")
+
+    def add(self, skill: Dict[str, Any]):
+        """新增或覆蓋一個技能"""
+        vector = self.embedder([skill_document(skill)])[0]
+        with self._lock:
+            row = self._rows.get(skill['name'])
+            if row is None:
+                row = self._count
+                self._ensure_capacity(row + 1)
+                self._names.append(skill['name'])
+                self._rows[skill['name']] = row
+                self._count += 1
+            self._vectors[row] = vector
+            self._success[row] = skill.get('success_count', 0) or 0
+            self._failure[row] = skill.get('failure_count', 0) or 0
+
+    def update_stats(self, name: str, success_count: int, failure_count: int):
+        with self._lock:
+            row = self._rows.get(name)
+            if row is not None:
+                self._success[row] = success_count
+                self._failure[row] = failure_count
+
+    def search(self, text: str, top_k: int = 3) -> List[Dict[str, Any]]:
+        """
+        查詢最適合的技能
+
+        Returns:
+            按分數由高到低的 {'name', 'score', 'similarity', 'success_rate'} 列表
+        """
+        if not self._count or not text:
+            return []
+        query = self._embed_query(text)
+
+        with self._lock:
+            count = self._count
+            similarity = self._vectors[:count] @ query
+            success = self._success[:count]
+            failure = self._failure[:count]
+            rate = (success + 1) / (success + failure + 2)
+            eligible = (similarity >= self.min_similarity) & (success >= self.min_successes)
+            if not eligible.any():
+                return []
+
+            scores = np.where(eligible, similarity * rate, -np.inf)
+            k = min(top_k, int(eligible.sum()))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                {
+                    'name': self._names[row],
+                    'score': float(scores[row]),
+                    'similarity': float(similarity[row]),
+                    'success_rate': float(success[row] / max(success[row] + failure[row], 1))
+                }
+                for row in top
+            ]
+
+    def _embed_query(self, text: str) -> np.ndarray:
+        with self._lock:
+            vector = self._query_cache.get(text)
+            if vector is not None:
+                self._query_cache.move_to_end(text)
+                return vector
+        vector = self.embedder([text])[0]
+        with self._lock:
+            self._query_cache[text] = vector
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return vector
+
+    def _ensure_capacity(self, rows: int):
+        capacity = len(self._vectors)
+        if rows <= capacity:
+            return
+        capacity = max(64, capacity * 2, rows)
+        vectors = np.zeros((capacity, self.embedder.dim), dtype=np.float32)
+        vectors[:self._count] = self._vectors[:self._count]
+        success = np.zeros(capacity, dtype=np.float32)
+        success[:self._count] = self._success[:self._count]
+        failure = np.zeros(capacity, dtype=np.float32)
+        failure[:self._count] = self._failure[:self._count]
+        self._vectors, self._success, self._failure = vectors, success, failure
@@ -4,11 +4,15 @@ Skill Manager - 技能管理器
 """
 
 import os
-import json
 import logging
+import threading
 from typing import Dict, Any
 from pathlib import Path
 
+from agent.skill_index import SkillIndex
+from agent.skill_store import SkillStore
+from utils.events import emit_event
+
 logger = logging.getLogger(__name__)
 
 
@@ -20,9 +24,20 @@ class SkillManager:
         self.skills_dir = Path('/app/skills')
         self.skills_dir.mkdir(exist_ok=True)
         
-        # 加載已有技能
+        # 艦隊模式下多個 bot 共享同一個 SkillManager
+        self._lock = threading.RLock()
+        
+        # 技能存於 SQLite（首次啟動時導入舊版 JSON 文件）
+        self.store = SkillStore(skills_dir=self.skills_dir)
+        
+        # 加載技能目錄（代碼在第一次執行時才讀取）
         self.skills = self._load_all_skills()
         
+        # 技能檢索索引在背景建立，建好之前不重用技能
+        self.index = SkillIndex()
+        self.reuse_enabled = os.getenv('SKILL_REUSE', 'true').lower() == 'true'
+        threading.Thread(target=self._build_index, name='skill-index', daemon=True).start()
+        
         logger.info(f"🎯 Skill Manager initialized with {len(self.skills)} skills")
     
     def save_skill(self, decision: Dict[str, Any], result: Dict[str, Any]):
@@ -48,15 +63,17 @@ class SkillManager:
                 'last_used': result.get('timestamp')
             }
             
-            # 保存到文件
-            skill_file = self.skills_dir / f"{skill_name}.json"
-            with open(skill_file, 'w', encoding='utf-8') as f:
-                json.dump(skill_data, f, indent=2, ensure_ascii=False)
-            
-            # 加載到內存
-            self.skills[skill_name] = skill_data
+            with self._lock:
+                # 原子地寫入技能庫
+                self.store.upsert(skill_data)
+                
+                # 加載到內存
+                self.skills[skill_name] = skill_data
+                self.index.add(skill_data)
             
             logger.info(f"✅ Saved new skill: {skill_name}")
+            emit_event('skill_saved', name=skill_name, goal=skill_data['goal'],
+                       description=skill_data['description'])
             
         except Exception as e:
             logger.error(f"Failed to save skill: {e}")
@@ -82,18 +99,20 @@ class SkillManager:
                 }
             
             skill = self.skills[skill_name]
-            code = skill['code']
+            code = self._load_code(skill_name, skill)
             
-            # 執行代碼
-            result = bot_controller.execute_code(code)
+            # 執行代碼（bot.js 以 params 變量提供參數）
+            result = bot_controller.execute_code(code, params=parameters)
             
-            # 更新技能統計
-            if result.get('success'):
-                skill['success_count'] += 1
-                skill['last_used'] = result.get('timestamp')
-                self._save_skill_to_file(skill_name, skill)
-            else:
-                skill['failure_count'] += 1
+            # 更新技能統計（內存中立即生效，技能庫稍後批次寫入）
+            with self._lock:
+                if result.get('success'):
+                    skill['success_count'] += 1
+                    skill['last_used'] = result.get('timestamp')
+                else:
+                    skill['failure_count'] += 1
+                self.index.update_stats(skill_name, skill['success_count'], skill['failure_count'])
+            self.store.record_use(skill_name, bool(result.get('success')), result.get('timestamp'))
             
             return result
             
@@ -104,43 +123,102 @@ class SkillManager:
                 'error': str(e)
             }
     
+    def find_skills(self, goal: str, top_k: int = 3) -> list:
+        """
+        按目標查詢最適合的已知技能（相似度 × 成功率）
+        
+        Args:
+            goal: 目標描述（可附上推理文字）
+            top_k: 返回的候選數
+            
+        Returns:
+            {'name', 'score', 'similarity', 'success_rate'} 列表
+        """
+        return self.index.search(goal, top_k)
+    
+    def reuse_skill(self, decision: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        若有經過驗證的相似技能，將 generate_code 決策改為執行該技能
+        
+        Args:
+            decision: LLM 或快速路徑產生的決策
+            
+        Returns:
+            原決策，或 action_type 為 execute_skill 的新決策
+        """
+        if (not self.reuse_enabled or decision.get('action_type') != 'generate_code'
+                or decision.get('is_new_skill')):
+            return decision
+        
+        query = f"{decision.get('goal') or ''} {decision.get('reasoning') or ''}".strip()
+        candidates = self.find_skills(query, top_k=1)
+        if not candidates:
+            return decision
+        
+        best = candidates[0]
+        skill = self.skills.get(best['name'], {})
+        reused = dict(decision)
+        reused.update({
+            'action_type': 'execute_skill',
+            'skill_name': best['name'],
+            'parameters': skill.get('parameters') or {},
+            'reasoning': f"{decision.get('reasoning', '')}（重用技能 {best['name']}，成功率 {best['success_rate']:.0%}）"
+        })
+        logger.info(f"🎯 Reusing skill {best['name']} (similarity {best['similarity']:.2f}, "
+                    f"success rate {best['success_rate']:.0%})")
+        return reused
+    
     def get_skill_list(self) -> list:
         """獲取所有技能列表"""
-        return [
-            {
-                'name': name,
-                'goal': skill['goal'],
-                'success_count': skill['success_count'],
-                'failure_count': skill['failure_count']
-            }
-            for name, skill in self.skills.items()
-        ]
+        with self._lock:
+            return [
+                {
+                    'name': name,
+                    'goal': skill['goal'],
+                    'success_count': skill['success_count'],
+                    'failure_count': skill['failure_count']
+                }
+                for name, skill in self.skills.items()
+            ]
+    
+    def close(self):
+        """寫入尚未保存的技能統計"""
+        self.store.close()
     
     def _load_all_skills(self) -> Dict[str, Dict]:
-        """從文件加載所有技能"""
+        """從技能庫加載技能目錄（不含代碼，一次查詢）"""
         skills = {}
         
         try:
-            for skill_file in self.skills_dir.glob('*.json'):
-                with open(skill_file, 'r', encoding='utf-8') as f:
-                    skill_data = json.load(f)
-                    skills[skill_data['name']] = skill_data
-            
-            logger.info(f"Loaded {len(skills)} skills from disk")
+            skills = self.store.load_catalog()
+            logger.info(f"Loaded {len(skills)} skills from {self.store.path}")
             
         except Exception as e:
             logger.error(f"Failed to load skills: {e}")
         
         return skills
     
-    def _save_skill_to_file(self, skill_name: str, skill_data: Dict):
-        """保存單個技能到文件"""
+    def _build_index(self):
+        with self._lock:
+            skills = list(self.skills.values())
         try:
-            skill_file = self.skills_dir / f"{skill_name}.json"
-            with open(skill_file, 'w', encoding='utf-8') as f:
-                json.dump(skill_data, f, indent=2, ensure_ascii=False)
+            self.index.build(skills)
+            # 建立期間新保存的技能
+            with self._lock:
+                for skill in list(self.skills.values()):
+                    if skill['name'] not in self.index:
+                        self.index.add(skill)
         except Exception as e:
-            logger.error(f"Failed to save skill to file: {e}")
+            logger.error(f"Failed to build skill index: {e}")
+    
+    def _load_code(self, skill_name: str, skill: Dict[str, Any]) -> str:
+        """按需讀取技能代碼，讀取後保留在內存中"""
+        if 'code' not in skill:
+            body = self.store.get_code(skill_name) or {}
+            with self._lock:
+                skill['code'] = body.get('code')
+                skill['parameters'] = body.get('parameters', {})
+        return skill['code']
     
     def _generate_skill_name(self, decision: Dict[str, Any]) -> str:
         """生成技能名稱"""
@@ -0,0 +1,336 @@
+"""
+Skill Store - 技能持久層
+所有技能存於單個 SQLite 文件：新技能以事務原子寫入，使用統計在內存累加後定期批次寫入。
+每次寫入遞增 revision，讀取方可以只取上次之後變更的技能；技能代碼按需讀取。
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA_VERSION = 2
+
+SCHEMA_V1 = """
+CREATE TABLE IF NOT EXISTS skills (
+    name TEXT PRIMARY KEY,
+    goal TEXT,
+    code TEXT,
+    parameters TEXT,
+    description TEXT,
+    success_count INTEGER NOT NULL DEFAULT 0,
+    failure_count INTEGER NOT NULL DEFAULT 0,
+    success_rate REAL NOT NULL DEFAULT 0,
+    created_at TEXT,
+    last_used TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_skills_goal ON skills (goal);
+CREATE INDEX IF NOT EXISTS idx_skills_success_rate ON skills (success_rate DESC);
+CREATE INDEX IF NOT EXISTS idx_skills_last_used ON skills (last_used DESC);
+"""
+
+# 版本 -> 升級語句
+MIGRATIONS = {
+    1: [statement for statement in SCHEMA_V1.split(';') if statement.strip()],
+    2: [
+        "ALTER TABLE skills ADD COLUMN revision INTEGER NOT NULL DEFAULT 0",
+        "CREATE INDEX IF NOT EXISTS idx_skills_revision ON skills (revision)",
+    ],
+}
+
+COLUMNS = ['name', 'goal', 'code', 'parameters', 'description', 'success_count', 'failure_count',
+           'success_rate', 'created_at', 'last_used']
+
+# 技能目錄（不含代碼）
+CATALOG_COLUMNS = ['name', 'goal', 'description', 'parameters', 'success_count', 'failure_count',
+                   'success_rate', 'created_at', 'last_used', 'revision']
+
+ORDERINGS = {
+    'success_rate': 'success_rate DESC, success_count DESC',
+    'last_used': 'last_used DESC',
+    'success_count': 'success_count DESC',
+}
+
+
+def _success_rate(success_count: int, failure_count: int) -> float:
+    total = success_count + failure_count
+    return success_count / total if total else 0.0
+
+
+class SkillStore:
+    """
+    SQLite 技能庫
+
+    - 使用默認的回滾日誌模式：寫入要麼完整提交要麼不生效，
+      只讀掛載的儀表板也能直接讀取（WAL 需要可寫的 -shm 文件）
+    - record_use() 只更新內存中的增量，背景線程每 flush_interval 秒在一個事務內寫入
+    - 首次打開時導入舊版的每技能 JSON 文件，原文件移到 legacy_json/
+    - 每個寫入事務把受影響的技能標記為新的 revision，load_catalog() / changes_since()
+      只讀目錄欄位，代碼由 get_code() 按需讀取
+    """
+
+    def __init__(self, path: str = None, flush_interval: float = None, skills_dir: Path = None):
+        self.skills_dir = Path(skills_dir or '/app/skills')
+        self.path = Path(path or os.getenv('SKILL_DB_PATH', str(self.skills_dir / 'skills.db')))
+        self.flush_interval = (flush_interval if flush_interval is not None
+                               else float(os.getenv('SKILL_FLUSH_INTERVAL', '5')))
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA synchronous = FULL')
+        self._lock = threading.Lock()
+
+        self._pending: Dict[str, Dict[str, Any]] = {}  # name -> {'success', 'failure', 'last_used'}
+        self._pending_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        # 指標
+        self.stats = {'flushes': 0, 'updates_flushed': 0, 'uses_recorded': 0}
+
+        self._migrate_schema()
+        self.revision = self._conn.execute('SELECT COALESCE(MAX(revision), 0) FROM skills').fetchone()[0]
+        self._import_json_skills()
+
+        self._thread = None
+        if self.flush_interval > 0:
+            self._thread = threading.Thread(target=self._flush_loop, name='skill-store-flush', daemon=True)
+            self._thread.start()
+
+    # ---- 讀取 ----
+
+    def load_all(self) -> Dict[str, Dict[str, Any]]:
+        """讀取全部技能（name -> skill）"""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(COLUMNS)} FROM skills").fetchall()
+        return {row['name']: self._row_to_skill(row) for row in rows}
+
+    def load_catalog(self) -> Dict[str, Dict[str, Any]]:
+        """讀取技能目錄（不含代碼，一次查詢）"""
+        return {skill['name']: skill for skill in self.changes_since(0)}
+
+    def changes_since(self, revision: int) -> List[Dict[str, Any]]:
+        """返回 revision 之後新增或更新的技能目錄項（走 revision 索引）"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(CATALOG_COLUMNS)} FROM skills WHERE revision > ? ORDER BY revision",
+                (revision,)
+            ).fetchall()
+        return [self._row_to_skill(row) for row in rows]
+
+    def get_code(self, name: str) -> Optional[Dict[str, Any]]:
+        """讀取單個技能的代碼與參數，不存在時返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT code, parameters FROM skills WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return self._row_to_skill(row)
+
+    def query(self, goal: str = None, order_by: str = 'success_rate', limit: int = None) -> List[Dict[str, Any]]:
+        """
+        按索引查詢技能
+
+        Args:
+            goal: 只返回此目標的技能
+            order_by: success_rate / last_used / success_count
+            limit: 最多返回條數
+        """
+        if order_by not in ORDERINGS:
+            raise ValueError(f"Unknown skill ordering: {order_by}")
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM skills"
+        params: List[Any] = []
+        if goal is not None:
+            sql += " WHERE goal = ?"
+            params.append(goal)
+        sql += f" ORDER BY {ORDERINGS[order_by]}"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row_to_skill(row) for row in rows]
+
+    # ---- 寫入 ----
+
+    def upsert(self, skill: Dict[str, Any]):
+        """原子地寫入（新增或覆蓋）一個技能"""
+        values = self._skill_to_row(skill)
+        with self._lock:
+            with self._transaction():
+                self._conn.execute(
+                    f"INSERT OR REPLACE INTO skills ({', '.join(COLUMNS)}, revision) "
+                    f"VALUES ({', '.join('?' for _ in COLUMNS)}, ?)",
+                    values + [self.revision + 1]
+                )
+            self.revision += 1
+
+    def record_use(self, name: str, success: bool, timestamp: Optional[str] = None):
+        """記錄一次技能使用（只更新內存增量，稍後批次寫入）"""
+        with self._pending_lock:
+            delta = self._pending.setdefault(name, {'success': 0, 'failure': 0, 'last_used': None})
+            if success:
+                delta['success'] += 1
+                if timestamp:
+                    delta['last_used'] = timestamp
+            else:
+                delta['failure'] += 1
+            self.stats['uses_recorded'] += 1
+
+    def flush(self) -> int:
+        """
+        將累積的使用統計在一個事務內寫入
+
+        Returns:
+            更新的技能數
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        try:
+            with self._lock:
+                with self._transaction():
+                    for name, delta in pending.items():
+                        self._conn.execute(
+                            """
+                            UPDATE skills SET
+                                success_count = success_count + ?,
+                                failure_count = failure_count + ?,
+                                success_rate = CAST(success_count + ? AS REAL)
+                                    / MAX(success_count + failure_count + ? + ?, 1),
+                                last_used = COALESCE(?, last_used),
+                                revision = ?
+                            WHERE name = ?
+                            """,
+                            (delta['success'], delta['failure'], delta['success'],
+                             delta['success'], delta['failure'], delta['last_used'], self.revision + 1, name)
+                        )
+                self.revision += 1
+        except Exception as e:
+            # 寫入失敗：增量放回，下次再試
+            with self._pending_lock:
+                for name, delta in pending.items():
+                    merged = self._pending.setdefault(name, {'success': 0, 'failure': 0, 'last_used': None})
+                    merged['success'] += delta['success']
+                    merged['failure'] += delta['failure']
+                    merged['last_used'] = merged['last_used'] or delta['last_used']
+            logger.error(f"Failed to flush skill stats: {e}")
+            return 0
+
+        self.stats['flushes'] += 1
+        self.stats['updates_flushed'] += len(pending)
+        return len(pending)
+
+    def close(self):
+        """停止背景線程、寫入剩餘統計並關閉數據庫"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+        with self._lock:
+            self._conn.close()
+        logger.info(f"🎯 Skill store closed: {self.stats}")
+
+    # ---- 內部實現 ----
+
+    def _transaction(self):
+        return _Transaction(self._conn)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def _migrate_schema(self):
+        with self._lock:
+            version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+            for target in range(version + 1, SCHEMA_VERSION + 1):
+                with self._transaction():
+                    for statement in MIGRATIONS[target]:
+                        self._conn.execute(statement)
+                    self._conn.execute(f'PRAGMA user_version = {target}')
+
+    def _import_json_skills(self):
+        """導入舊版 JSON 技能文件（已存在的同名技能不覆蓋）"""
+        json_files = sorted(self.skills_dir.glob('*.json'))
+        if not json_files:
+            return
+
+        imported = 0
+        skills = []
+        for skill_file in json_files:
+            try:
+                with open(skill_file, 'r', encoding='utf-8') as f:
+                    skills.append(json.load(f))
+            except Exception as e:
+                logger.warning(f"Skipping unreadable skill file {skill_file.name}: {e}")
+
+        with self._lock:
+            with self._transaction():
+                for skill in skills:
+                    cursor = self._conn.execute(
+                        f"INSERT OR IGNORE INTO skills ({', '.join(COLUMNS)}, revision) "
+                        f"VALUES ({', '.join('?' for _ in COLUMNS)}, ?)",
+                        self._skill_to_row(skill) + [self.revision + 1]
+                    )
+                    imported += cursor.rowcount
+            self.revision += 1
+
+        legacy_dir = self.skills_dir / 'legacy_json'
+        legacy_dir.mkdir(exist_ok=True)
+        for skill_file in json_files:
+            os.replace(skill_file, legacy_dir / skill_file.name)
+
+        logger.info(f"🎯 Imported {imported} skills from {len(json_files)} JSON files (moved to {legacy_dir})")
+
+    @staticmethod
+    def _skill_to_row(skill: Dict[str, Any]) -> List[Any]:
+        success_count = int(skill.get('success_count', 0) or 0)
+        failure_count = int(skill.get('failure_count', 0) or 0)
+        return [
+            skill['name'],
+            skill.get('goal'),
+            skill.get('code'),
+            json.dumps(skill.get('parameters') or {}, ensure_ascii=False),
+            skill.get('description'),
+            success_count,
+            failure_count,
+            _success_rate(success_count, failure_count),
+            skill.get('created_at'),
+            skill.get('last_used'),
+        ]
+
+    @staticmethod
+    def _row_to_skill(row: sqlite3.Row) -> Dict[str, Any]:
+        skill = dict(row)
+        try:
+            skill['parameters'] = json.loads(skill.get('parameters') or '{}')
+        except json.JSONDecodeError:
+            skill['parameters'] = {}
+        return skill
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT，出錯時回滾（連接為 autocommit 模式）"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
+        return False
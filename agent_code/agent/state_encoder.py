@@ -0,0 +1,177 @@
+"""
+State Encoder - 觀察狀態數值編碼
+將觀察轉換為固定長度的浮點向量，直接用於最近鄰檢索（不需要文本嵌入模型）
+"""
+
+import re
+import math
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+
+# mineflayer 實體類型 → 編碼分組（自身玩家也在列表中，不影響相對距離）
+ENTITY_GROUPS: List[Tuple[str, Tuple[str, ...]]] = [
+    ('hostile', ('hostile', 'mob')),
+    ('passive', ('passive', 'animal', 'water_creature', 'ambient')),
+    ('player', ('player',)),
+    ('other', ()),
+]
+
+# 方塊名稱 → 類別（按順序匹配，未匹配歸入 other）
+BLOCK_CATEGORIES: List[Tuple[str, re.Pattern]] = [
+    ('ore', re.compile(r'_ore$|ancient_debris')),
+    ('wood', re.compile(r'_log$|_wood$|_planks$|_stem$')),
+    ('leaves', re.compile(r'leaves')),
+    ('stone', re.compile(r'stone|deepslate|andesite|diorite|granite|tuff|calcite|basalt')),
+    ('dirt', re.compile(r'dirt|grass_block|podzol|mycelium|mud|farmland')),
+    ('sand', re.compile(r'sand|gravel|clay')),
+    ('water', re.compile(r'water|ice|kelp|seagrass')),
+    ('lava', re.compile(r'lava|magma|fire')),
+    ('plant', re.compile(r'grass|fern|flower|bush|vine|poppy|dandelion|tulip|orchid|allium|daisy|cornflower|lily')),
+    ('other', re.compile(r'')),
+]
+
+# 背包物品名稱 → 類別
+ITEM_CATEGORIES: List[Tuple[str, re.Pattern]] = [
+    ('tool', re.compile(r'_(?:pickaxe|axe|shovel|hoe|sword)$|^(?:bow|crossbow|shield|shears)$')),
+    ('food', re.compile(r'beef|porkchop|mutton|chicken|rabbit|cod|salmon|bread|apple|carrot|potato|melon_slice|berries|stew|cookie|pie')),
+    ('wood', re.compile(r'_log$|_wood$|_planks$|^stick$')),
+    ('stone', re.compile(r'cobblestone|stone|deepslate')),
+    ('ore', re.compile(r'^raw_|_ingot$|^coal$|^diamond$|^emerald$|^redstone$|lapis')),
+    ('other', re.compile(r'')),
+]
+
+TIME_PHASES = ['morning', 'day', 'evening', 'night']
+
+# 各特徵組的權重（組內數值都在 0~1 左右，權重決定該組在距離中的比重）
+GROUP_WEIGHTS = {
+    'vitals': 2.0,
+    'entities': 1.0,
+    'blocks': 1.0,
+    'inventory': 0.75,
+    'time': 0.5,
+}
+
+# 數量以 log1p(count) / log1p(saturation) 縮放到 0~1
+ENTITY_SATURATION = 16
+BLOCK_SATURATION = 405    # bot.js 掃描 9 x 5 x 9 個位置
+ITEM_SATURATION = 64
+
+
+def _scaled_count(count: float, saturation: float) -> float:
+    return min(1.0, math.log1p(max(0.0, count)) / math.log1p(saturation))
+
+
+def _categorize(name: str, categories: List[Tuple[str, re.Pattern]]) -> str:
+    for category, pattern in categories:
+        if pattern.search(name):
+            return category
+    return categories[-1][0]
+
+
+class ObservationEncoder:
+    """
+    觀察 → 固定長度向量
+
+    向量佈局（共 dim 維）：
+    - 生命值、飢餓值（/20）
+    - 各類實體數量
+    - 附近方塊總量與各類別佔比
+    - 背包物品總量、種類數與各類別數量
+    - 時間（晝夜循環的 sin / cos）
+
+    向量適合以歐氏距離比較（NumpyFlatCollection 的 'l2' 空間）。
+    """
+
+    def __init__(self, weights: Dict[str, float] = None):
+        self.weights = dict(GROUP_WEIGHTS, **(weights or {}))
+        self.layout: List[str] = (
+            ['health', 'food']
+            + [f'entity:{name}' for name, _ in ENTITY_GROUPS]
+            + ['blocks:total'] + [f'block:{name}' for name, _ in BLOCK_CATEGORIES]
+            + ['inventory:total', 'inventory:distinct'] + [f'item:{name}' for name, _ in ITEM_CATEGORIES]
+            + ['time:sin', 'time:cos']
+        )
+        self.dim = len(self.layout)
+
+        self._entity_index = {}
+        for name, types in ENTITY_GROUPS:
+            for entity_type in types:
+                self._entity_index[entity_type] = self.layout.index(f'entity:{name}')
+        self._entity_other = self.layout.index('entity:other')
+        self._block_offset = self.layout.index(f'block:{BLOCK_CATEGORIES[0][0]}')
+        self._block_slots = {name: i for i, (name, _) in enumerate(BLOCK_CATEGORIES)}
+        self._item_offset = self.layout.index(f'item:{ITEM_CATEGORIES[0][0]}')
+        self._item_slots = {name: i for i, (name, _) in enumerate(ITEM_CATEGORIES)}
+        self._category_cache: Dict[Tuple[str, str], str] = {}
+
+        self._scale = np.array([self.weights[self._group(feature)] for feature in self.layout], dtype=np.float32)
+
+    def encode(self, observation: Dict[str, Any]) -> np.ndarray:
+        """編碼單個觀察"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+
+        vector[0] = min(1.0, max(0.0, float(observation.get('health', 20) or 0) / 20))
+        vector[1] = min(1.0, max(0.0, float(observation.get('food', 20) or 0) / 20))
+
+        entity_counts = np.zeros(self.dim, dtype=np.float32)
+        for entity in observation.get('nearby_entities', []):
+            entity_counts[self._entity_index.get(entity.get('type'), self._entity_other)] += 1
+        for index, count in enumerate(entity_counts):
+            if count:
+                vector[index] = _scaled_count(count, ENTITY_SATURATION)
+
+        blocks = observation.get('nearby_blocks', [])
+        vector[self._block_offset - 1] = _scaled_count(len(blocks), BLOCK_SATURATION)
+        if blocks:
+            for block in blocks:
+                category = self._category(block.get('name', ''), 'block', BLOCK_CATEGORIES)
+                vector[self._block_offset + self._block_slots[category]] += 1.0 / len(blocks)
+
+        inventory = observation.get('inventory', [])
+        item_counts = [0.0] * len(ITEM_CATEGORIES)
+        total = 0.0
+        for item in inventory:
+            count = float(item.get('count', 1) or 0)
+            total += count
+            item_counts[self._item_slots[self._category(item.get('name', ''), 'item', ITEM_CATEGORIES)]] += count
+        vector[self._item_offset - 2] = _scaled_count(total, ITEM_SATURATION * 4)
+        vector[self._item_offset - 1] = _scaled_count(len(inventory), 36)
+        for i, count in enumerate(item_counts):
+            vector[self._item_offset + i] = _scaled_count(count, ITEM_SATURATION)
+
+        time_of_day = observation.get('time_of_day', 'day')
+        phase = TIME_PHASES.index(time_of_day) if time_of_day in TIME_PHASES else 1
+        angle = 2 * math.pi * phase / len(TIME_PHASES)
+        vector[-2] = 0.5 * (1 + math.sin(angle))
+        vector[-1] = 0.5 * (1 + math.cos(angle))
+
+        return vector * self._scale
+
+    def encode_batch(self, observations: List[Dict[str, Any]]) -> np.ndarray:
+        """編碼多個觀察（每行一個向量）"""
+        if not observations:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self.encode(observation) for observation in observations])
+
+    def _category(self, name: str, kind: str, categories: List[Tuple[str, re.Pattern]]) -> str:
+        key = (kind, name)
+        category = self._category_cache.get(key)
+        if category is None:
+            category = _categorize(name, categories)
+            if len(self._category_cache) < 4096:
+                self._category_cache[key] = category
+        return category
+
+    @staticmethod
+    def _group(feature: str) -> str:
+        if feature in ('health', 'food'):
+            return 'vitals'
+        if feature.startswith('entity:'):
+            return 'entities'
+        if feature.startswith('block'):
+            return 'blocks'
+        if feature.startswith(('item:', 'inventory:')):
+            return 'inventory'
+        return 'time'
@@ -0,0 +1,119 @@
+"""
+World Model - 增量觀察的本地世界狀態
+bot.js 只推送變更的方塊、實體與背包格，這裡就地套用並按需重建觀察用的列表
+"""
+
+import math
+import threading
+from typing import Dict, Any, List, Optional
+
+# 按鍵增量更新的區段（與 bot.js 的 getIncrementalState 一致）
+SECTIONS = ('nearby_blocks', 'nearby_entities', 'inventory')
+
+# 回應中不屬於遊戲狀態的欄位
+_PROTOCOL_FIELDS = {'id', 'incremental', 'seq', 'base', 'reset'}
+
+
+class WorldModel:
+    """
+    由增量補丁維護的世界狀態
+
+    - apply() 只接受基準等於當前 seq 的補丁（或 reset 補丁），中間缺了補丁返回 False，
+      調用方應改要 reset；比當前舊的補丁直接忽略
+    - state() 返回與 bot.js 完整狀態相同結構的字典；區段列表只在該區段變更後重建，
+      實體距離在位置或實體變更後重算
+    """
+
+    def __init__(self):
+        self.seq = 0
+        self.scalars: Dict[str, Any] = {}
+        self.sections: Dict[str, Dict[str, Dict[str, Any]]] = {name: {} for name in SECTIONS}
+        self._lists: Dict[str, List[Dict[str, Any]]] = {}
+        self._entities_at = None  # 上次計算實體距離時的位置
+        self._lock = threading.Lock()
+
+        # 指標
+        self.stats = {'patches': 0, 'resets': 0, 'stale': 0, 'gaps': 0, 'items_changed': 0}
+
+    def clear(self):
+        with self._lock:
+            self.seq = 0
+            self.scalars = {}
+            self.sections = {name: {} for name in SECTIONS}
+            self._lists = {}
+            self._entities_at = None
+
+    def apply(self, patch: Dict[str, Any]) -> bool:
+        """
+        套用一個增量補丁
+
+        Returns:
+            是否成功（False 表示缺少中間的補丁，需要 reset）
+        """
+        with self._lock:
+            seq = patch.get('seq', 0)
+            if patch.get('reset'):
+                self.sections = {name: {} for name in SECTIONS}
+                self._lists = {}
+                self.stats['resets'] += 1
+            elif seq <= self.seq:
+                self.stats['stale'] += 1
+                return True
+            elif patch.get('base') != self.seq:
+                self.stats['gaps'] += 1
+                return False
+
+            for name in SECTIONS:
+                changes = patch.get(name)
+                if not changes:
+                    continue
+                section = self.sections[name]
+                for key, item in changes.get('set') or []:
+                    section[key] = item
+                for key in changes.get('removed') or []:
+                    section.pop(key, None)
+                changed = len(changes.get('set') or []) + len(changes.get('removed') or [])
+                if changed:
+                    self._lists.pop(name, None)
+                    self.stats['items_changed'] += changed
+
+            self.scalars = {key: value for key, value in patch.items()
+                            if key not in _PROTOCOL_FIELDS and key not in SECTIONS}
+            self.seq = seq
+            self.stats['patches'] += 1
+            return True
+
+    def state(self) -> Dict[str, Any]:
+        """當前世界狀態（列表為共享的快取，調用方不應修改）"""
+        with self._lock:
+            state = dict(self.scalars)
+            state['seq'] = self.seq
+            state['nearby_blocks'] = self._section_list('nearby_blocks')
+            state['inventory'] = self._section_list('inventory', sort_key='slot')
+            state['nearby_entities'] = self._entity_list(state.get('position') or {})
+            return state
+
+    def _section_list(self, name: str, sort_key: Optional[str] = None) -> List[Dict[str, Any]]:
+        items = self._lists.get(name)
+        if items is None:
+            items = list(self.sections[name].values())
+            if sort_key:
+                items.sort(key=lambda item: item.get(sort_key, 0))
+            self._lists[name] = items
+        return items
+
+    def _entity_list(self, position: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """實體列表附上與機器人的距離（格式同 bot.js：兩位小數的字符串）"""
+        origin = (position.get('x', 0), position.get('y', 0), position.get('z', 0))
+        items = self._lists.get('nearby_entities')
+        if items is not None and self._entities_at == origin:
+            return items
+
+        items = []
+        for entity in self.sections['nearby_entities'].values():
+            where = entity.get('position') or {}
+            distance = math.dist(origin, (where.get('x', 0), where.get('y', 0), where.get('z', 0)))
+            items.append(dict(entity, distance=f"{distance:.2f}"))
+        self._lists['nearby_entities'] = items
+        self._entities_at = origin
+        return items
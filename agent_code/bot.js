@@ -7,11 +7,18 @@ const mineflayerViewer = require("prismarine-viewer").mineflayer;
 const mineflayer = require('mineflayer');
 const { pathfinder, Movements, goals } = require('mineflayer-pathfinder');
 const { Vec3 } = require('vec3');
+const crypto = require('crypto');
 
 // 從環境變量讀取配置
 const MC_HOST = process.env.MC_HOST || 'mc-server';
 const MC_PORT = parseInt(process.env.MC_PORT || '25565');
 const BOT_USERNAME = process.env.BOT_USERNAME || 'Agent_001';
+const VIEWER_PORT = parseInt(process.env.VIEWER_PORT || '3000');  // 0 = 不啟動查看器
+const CODE_CACHE_SIZE = parseInt(process.env.BOT_CODE_CACHE_SIZE || '256');  // 已編譯代碼的快取條數
+
+// 已編譯的代碼：句柄 -> AsyncFunction（Map 保持插入順序，用作 LRU）
+const AsyncFunction = Object.getPrototypeOf(async function(){}).constructor;
+const compiledCode = new Map();
 
 // 創建 Bot
 const bot = mineflayer.createBot({
@@ -28,8 +35,10 @@ bot.loadPlugin(pathfinder);
 bot.once('spawn', () => {
     
     // 🎥 啟動第一視角查看器
-    mineflayerViewer(bot, { port: 3000, firstPerson: true });
-    console.error('🎥 First-person viewer started at http://localhost:3000');
+    if (VIEWER_PORT > 0) {
+      mineflayerViewer(bot, { port: VIEWER_PORT, firstPerson: true });
+      console.error(`🎥 First-person viewer started at http://localhost:${VIEWER_PORT}`);
+    }
   console.error(`✅ Bot ${BOT_USERNAME} spawned in the world`);
   
   // 設置默認移動行為
@@ -38,7 +47,7 @@ bot.once('spawn', () => {
   bot.pathfinder.setMovements(defaultMove);
   
   // 通知 Python 已經準備就緒
-  process.stdout.write(JSON.stringify({ ready: true }) + '\n');
+  bridge.sendReady();
 });
 
 // 錯誤處理
@@ -60,37 +69,88 @@ bot.on('chat', (username, message) => {
   console.error(`💬 ${username}: ${message}`);
 });
 
-// 處理來自 Python 的命令
-process.stdin.setEncoding('utf8');
-process.stdin.on('data', async (data) => {
+// 處理來自 Python 的命令（JSON 行或 msgpack 幀，可同時有多個請求在途）
+const { Bridge, IncrementalState } = require('./bridge_protocol');
+const bridge = new Bridge(handleCommand);
+const incremental = new IncrementalState();
+
+function sendMessage(message) {
+  bridge.send(message);
+}
+
+async function handleCommand(command) {
   try {
-    const command = JSON.parse(data.trim());
     console.error(`🔧 Received command: ${command.action}`);
     
     if (command.action === 'get_state') {
-      // 獲取當前狀態
-      const state = getCurrentState();
-      state.id = command.id;  // 返回請求 ID
+      // 獲取當前狀態（增量模式只含變更的方塊 / 實體 / 背包；差量模式只含變更欄位）
+      const state = command.incremental ? getIncrementalState(command)
+                                        : bridge.stateReply(getCurrentState(), command);
       console.error(`📤 Sending state response (ID: ${command.id?.substring(0, 8)}...)`);
-      process.stdout.write(JSON.stringify(state) + '\n');
+      sendMessage(state);
       
     } else if (command.action === 'execute_code') {
-      // 執行動態代碼
+      // 執行動態代碼（同時編譯並快取，回應中帶句柄）
       console.error(`⚙️ Executing code (ID: ${command.id?.substring(0, 8)}...): ${command.code.substring(0, 50)}...`);
-      const result = await executeCode(command.code);
+      const result = await executeCode(command.code, command.params);
       result.id = command.id;  // 返回請求 ID
       console.error(`📤 Sending execute result (ID: ${command.id?.substring(0, 8)}...): success=${result.success}`);
-      process.stdout.write(JSON.stringify(result) + '\n');
+      sendMessage(result);
+      
+    } else if (command.action === 'register_code') {
+      // 只編譯不執行，返回句柄
+      const { handle } = compileCode(command.code);
+      console.error(`📦 Registered code ${handle} (${compiledCode.size} cached)`);
+      sendMessage({ id: command.id, success: true, handle: handle });
+      
+    } else if (command.action === 'invoke') {
+      // 以句柄執行已編譯的代碼
+      const fn = compiledCode.get(command.handle);
+      if (!fn) {
+        // 未知句柄（bridge 重啟或已被淘汰），Python 端會重新上傳代碼
+        sendMessage({ id: command.id, success: false, error: `Unknown code handle: ${command.handle}`,
+                      unknown_handle: true });
+        return;
+      }
+      compiledCode.delete(command.handle);
+      compiledCode.set(command.handle, fn);
+      console.error(`⚙️ Invoking ${command.handle} (ID: ${command.id?.substring(0, 8)}...)`);
+      const result = await runCompiled(fn, command.params);
+      result.id = command.id;
+      result.handle = command.handle;
+      console.error(`📤 Sending invoke result (ID: ${command.id?.substring(0, 8)}...): success=${result.success}`);
+      sendMessage(result);
+      
+    } else {
+      sendMessage({ id: command.id, success: false, error: `Unknown action: ${command.action}` });
     }
     
   } catch (err) {
     console.error('❌ Error processing command:', err);
-    process.stdout.write(JSON.stringify({
+    sendMessage({
+      id: command?.id,
       success: false,
       error: err.message
-    }) + '\n');
+    });
   }
-});
+}
+
+/**
+ * 附近方塊的取樣格點：以機器人所在的方塊為中心，每 4 格取樣一次
+ * （完整觀察與增量觀察共用，同一位置兩條路徑返回相同的 nearby_blocks）
+ */
+function blockSamplePositions(position) {
+  const origin = position.floored();
+  const positions = [];
+  for (let x = -16; x <= 16; x += 4) {
+    for (let y = -8; y <= 8; y += 4) {
+      for (let z = -16; z <= 16; z += 4) {
+        positions.push(origin.offset(x, y, z));
+      }
+    }
+  }
+  return positions;
+}
 
 /**
  * 獲取當前遊戲狀態
@@ -110,18 +170,13 @@ function getCurrentState() {
   
   // 獲取附近方塊
   const nearbyBlocks = [];
-  for (let x = -16; x <= 16; x += 4) {
-    for (let y = -8; y <= 8; y += 4) {
-      for (let z = -16; z <= 16; z += 4) {
-        const pos = position.offset(x, y, z);
-        const block = bot.blockAt(pos);
-        if (block && block.name !== 'air') {
-          nearbyBlocks.push({
-            name: block.name,
-            position: { x: pos.x, y: pos.y, z: pos.z }
-          });
-        }
-      }
+  for (const pos of blockSamplePositions(position)) {
+    const block = bot.blockAt(pos);
+    if (block && block.name !== 'air') {
+      nearbyBlocks.push({
+        name: block.name,
+        position: { x: pos.x, y: pos.y, z: pos.z }
+      });
     }
   }
   
@@ -153,76 +208,195 @@ function getCurrentState() {
 }
 
 /**
- * 執行動態生成的代碼
+ * 增量觀察的方塊快取：格點與 getCurrentState 相同（機器人停留在同一方塊時格點不變），
+ * 只取樣新進入範圍的格點與收到 blockUpdate / 區塊載入的格點
  */
-async function executeCode(code) {
-  try {
-    // 創建超時 Promise (30 秒)
-    const timeoutPromise = new Promise((_, reject) => {
-      setTimeout(() => reject(new Error('Execution timeout (30s)')), 30000);
-    });
+const sampledBlocks = new Map();  // "x,y,z" -> 方塊名（air / 未載入為 null）
+const dirtyBlocks = new Set();
+
+bot.on('blockUpdate', (oldBlock, newBlock) => {
+  const pos = (newBlock || oldBlock)?.position;
+  if (!pos) return;
+  const key = `${pos.x},${pos.y},${pos.z}`;
+  if (sampledBlocks.has(key)) dirtyBlocks.add(key);
+});
+
+bot.on('chunkColumnLoad', (corner) => {
+  for (const key of sampledBlocks.keys()) {
+    const [x, , z] = key.split(',').map(Number);
+    if (x >= corner.x && x < corner.x + 16 && z >= corner.z && z < corner.z + 16) dirtyBlocks.add(key);
+  }
+});
+
+/**
+ * 獲取增量遊戲狀態（只返回與上一次回應不同的方塊、實體與背包格）
+ */
+function getIncrementalState(command) {
+  const position = bot.entity.position;
+  if (command.reset) {
+    sampledBlocks.clear();
+    dirtyBlocks.clear();
+  }
+  
+  // 方塊：只對未取樣或已變更的格點調用 blockAt
+  const lattice = new Set();
+  const blocks = [];
+  for (const pos of blockSamplePositions(position)) {
+    const key = `${pos.x},${pos.y},${pos.z}`;
+    lattice.add(key);
+    if (!sampledBlocks.has(key) || dirtyBlocks.has(key)) {
+      const block = bot.blockAt(pos);
+      sampledBlocks.set(key, block && block.name !== 'air' ? block.name : null);
+      dirtyBlocks.delete(key);
+    }
+    const name = sampledBlocks.get(key);
+    if (name) blocks.push([key, { name: name, position: { x: pos.x, y: pos.y, z: pos.z } }]);
+  }
+  for (const key of sampledBlocks.keys()) {
+    if (!lattice.has(key)) {
+      sampledBlocks.delete(key);
+      dirtyBlocks.delete(key);
+    }
+  }
+  
+  // 實體：距離由 Python 端按位置計算
+  const entities = Object.values(bot.entities)
+    .filter(entity => entity.position.distanceTo(position) < 32)
+    .map(entity => [String(entity.id), {
+      type: entity.type,
+      name: entity.name || entity.displayName,
+      position: { x: entity.position.x, y: entity.position.y, z: entity.position.z }
+    }]);
+  
+  const inventory = bot.inventory.items().map(item => [String(item.slot), {
+    name: item.name,
+    count: item.count,
+    slot: item.slot
+  }]);
+  
+  const timeOfDay = bot.time.timeOfDay < 6000 ? 'morning' :
+                    bot.time.timeOfDay < 12000 ? 'day' :
+                    bot.time.timeOfDay < 18000 ? 'evening' : 'night';
+  
+  return incremental.reply(command, {
+    position: { x: position.x, y: position.y, z: position.z },
+    health: bot.health,
+    food: bot.food,
+    time_of_day: timeOfDay,
+    weather: bot.isRaining ? 'rain' : 'clear',
+    biome: bot.blockAt(position)?.biome?.name || 'unknown'
+  }, {
+    nearby_blocks: blocks,
+    nearby_entities: entities,
+    inventory: inventory
+  });
+}
+
+/**
+ * 代碼的內容雜湊句柄（與 Python 端 code_handle() 一致）
+ */
+function codeHandle(code) {
+  return crypto.createHash('sha256').update(code, 'utf8').digest('hex').substring(0, 16);
+}
+
+/**
+ * 建立執行環境（每個 bot 只建立一次，所有已編譯的代碼共用）
+ */
+let executionContext = null;
+
+function getContext() {
+  if (executionContext) return executionContext;
+  
+  executionContext = {
+    bot: bot,
+    Vec3: Vec3,
+    goals: goals,
+    mcData: require('minecraft-data')(bot.version),
     
-    // 創建執行環境
-    const context = {
-      bot: bot,
-      Vec3: Vec3,
-      goals: goals,
-      mcData: require('minecraft-data')(bot.version),
-      
-      // 常用輔助函數
-      async moveToPosition(x, y, z) {
-        const goal = new goals.GoalBlock(x, y, z);
-        await bot.pathfinder.goto(goal);
-      },
-      
-      async mineBlock(blockName) {
-        const block = bot.findBlock({
-          matching: (block) => block.name === blockName,
-          maxDistance: 32
-        });
-        
-        if (block) {
-          await bot.dig(block);
-          return { success: true, message: `Mined ${blockName}` };
-        } else {
-          return { success: false, error: `${blockName} not found` };
-        }
-      },
+    // 常用輔助函數
+    async moveToPosition(x, y, z) {
+      const goal = new goals.GoalBlock(x, y, z);
+      await bot.pathfinder.goto(goal);
+    },
+    
+    async mineBlock(blockName) {
+      const block = bot.findBlock({
+        matching: (block) => block.name === blockName,
+        maxDistance: 32
+      });
       
-      async attackNearest(mobType) {
-        const entity = bot.nearestEntity(e => 
-          e.type === 'mob' && e.name === mobType && 
-          e.position.distanceTo(bot.entity.position) < 16
-        );
-        
-        if (entity) {
-          await bot.attack(entity);
-          return { success: true, message: `Attacked ${mobType}` };
-        } else {
-          return { success: false, error: `${mobType} not found` };
-        }
-      },
+      if (block) {
+        await bot.dig(block);
+        return { success: true, message: `Mined ${blockName}` };
+      } else {
+        return { success: false, error: `${blockName} not found` };
+      }
+    },
+    
+    async attackNearest(mobType) {
+      const entity = bot.nearestEntity(e => 
+        e.type === 'mob' && e.name === mobType && 
+        e.position.distanceTo(bot.entity.position) < 16
+      );
       
-      async collectItem(itemName) {
-        const item = bot.nearestEntity(e =>
-          e.type === 'object' && e.name === itemName &&
-          e.position.distanceTo(bot.entity.position) < 16
-        );
-        
-        if (item) {
-          await bot.pathfinder.goto(new goals.GoalNear(item.position.x, item.position.y, item.position.z, 1));
-          return { success: true, message: `Collected ${itemName}` };
-        } else {
-          return { success: false, error: `${itemName} not found` };
-        }
+      if (entity) {
+        await bot.attack(entity);
+        return { success: true, message: `Attacked ${mobType}` };
+      } else {
+        return { success: false, error: `${mobType} not found` };
       }
-    };
+    },
     
-    // 執行代碼（帶超時）
-    const AsyncFunction = Object.getPrototypeOf(async function(){}).constructor;
-    const fn = new AsyncFunction(...Object.keys(context), code);
+    async collectItem(itemName) {
+      const item = bot.nearestEntity(e =>
+        e.type === 'object' && e.name === itemName &&
+        e.position.distanceTo(bot.entity.position) < 16
+      );
+      
+      if (item) {
+        await bot.pathfinder.goto(new goals.GoalNear(item.position.x, item.position.y, item.position.z, 1));
+        return { success: true, message: `Collected ${itemName}` };
+      } else {
+        return { success: false, error: `${itemName} not found` };
+      }
+    }
+  };
+  return executionContext;
+}
+
+/**
+ * 編譯代碼並按句柄快取（LRU，超過 CODE_CACHE_SIZE 時淘汰最久未用的）
+ * 代碼可以讀取 params 變量取得調用參數
+ */
+function compileCode(code) {
+  const handle = codeHandle(code);
+  let fn = compiledCode.get(handle);
+  if (fn) {
+    compiledCode.delete(handle);
+    compiledCode.set(handle, fn);
+    return { handle, fn };
+  }
+  
+  const context = getContext();
+  fn = new AsyncFunction(...Object.keys(context), 'params', code);
+  compiledCode.set(handle, fn);
+  while (compiledCode.size > CODE_CACHE_SIZE) {
+    compiledCode.delete(compiledCode.keys().next().value);
+  }
+  return { handle, fn };
+}
+
+/**
+ * 執行已編譯的代碼（帶 30 秒超時）
+ */
+async function runCompiled(fn, params) {
+  let timer = null;
+  try {
+    const timeoutPromise = new Promise((_, reject) => {
+      timer = setTimeout(() => reject(new Error('Execution timeout (30s)')), 30000);
+    });
     
-    const executionPromise = fn(...Object.values(context));
+    const executionPromise = fn(...Object.values(getContext()), params || {});
     const result = await Promise.race([executionPromise, timeoutPromise]);
     
     return {
@@ -231,6 +405,25 @@ async function executeCode(code) {
       timestamp: new Date().toISOString()
     };
     
+  } catch (err) {
+    return {
+      success: false,
+      error: err.message,
+      stack: err.stack,
+      timestamp: new Date().toISOString()
+    };
+  } finally {
+    clearTimeout(timer);
+  }
+}
+
+/**
+ * 執行動態生成的代碼（編譯結果按內容雜湊快取，返回句柄供之後 invoke）
+ */
+async function executeCode(code, params) {
+  let compiled;
+  try {
+    compiled = compileCode(code);
   } catch (err) {
     return {
       success: false,
@@ -239,6 +432,9 @@ async function executeCode(code) {
       timestamp: new Date().toISOString()
     };
   }
+  const result = await runCompiled(compiled.fn, params);
+  result.handle = compiled.handle;
+  return result;
 }
 
 console.error(`🚀 Minecraft Bot Controller started`);
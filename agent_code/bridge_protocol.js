@@ -0,0 +1,194 @@
+/**
+ * Bridge Protocol - bot.js 與 fake_bot.js 共用的 stdin/stdout 協議
+ *
+ * - 啟動時為換行分隔的 JSON；ready 信號列出支持的線路格式（formats）
+ * - Python 端可以發送 set_format 切換到長度前綴的 msgpack 幀（4 字節大端長度 + 內容），
+ *   回應 set_format 的是最後一條 JSON 訊息，之後雙向都使用幀
+ * - get_state 帶 delta 時只返回與上一次不同的頂層欄位（changed / removed），
+ *   並以 seq / base 標示版本，Python 端缺少 base 時改要完整狀態
+ * - get_state 帶 incremental 時使用 IncrementalState：方塊、實體、背包按鍵只返回新增 / 變更的項
+ *   與移除的鍵，Python 端的世界模型就地套用；帶 reset 時返回全部項
+ *
+ * msgpack 依賴（@msgpack/msgpack）是可選的，未安裝時只提供 json
+ */
+
+const readline = require('readline');
+
+let msgpack = null;
+try {
+  msgpack = require('@msgpack/msgpack');
+} catch (err) {
+  msgpack = null;
+}
+
+const FORMATS = msgpack ? ['json', 'msgpack'] : ['json'];
+
+class Bridge {
+  /**
+   * @param {function(object): Promise<void>} onCommand 處理一條命令（set_format 由協議層處理）
+   * @param {function(): void} onClose stdin 關閉時調用（可選）
+   */
+  constructor(onCommand, onClose) {
+    this.onCommand = onCommand;
+    this.onClose = onClose;
+    this.format = 'json';
+    this.buffer = Buffer.alloc(0);
+
+    // get_state 差量編碼：上一次送出的狀態（頂層欄位 -> JSON 文本）
+    this.stateSeq = 0;
+    this.lastState = null;
+
+    this.reader = readline.createInterface({ input: process.stdin, terminal: false });
+    this.reader.on('line', (line) => {
+      if (!line.trim()) return;
+      let command;
+      try {
+        command = JSON.parse(line);
+      } catch (err) {
+        this.send({ success: false, error: err.message });
+        return;
+      }
+      this.dispatch(command);
+    });
+    this.reader.on('close', () => {
+      if (this.format === 'json' && this.onClose) this.onClose();
+    });
+  }
+
+  send(message) {
+    if (this.format === 'msgpack') {
+      const body = msgpack.encode(message, { ignoreUndefined: true });
+      const header = Buffer.alloc(4);
+      header.writeUInt32BE(body.length, 0);
+      process.stdout.write(Buffer.concat([header, Buffer.from(body.buffer, body.byteOffset, body.byteLength)]));
+    } else {
+      process.stdout.write(JSON.stringify(message) + '\n');
+    }
+  }
+
+  sendReady() {
+    this.send({ ready: true, formats: FORMATS, state_delta: true, incremental_state: true });
+  }
+
+  /**
+   * 包裝 get_state 回應：命令帶 delta 且有上一次的狀態時只返回變更的頂層欄位
+   */
+  stateReply(state, command) {
+    const fields = {};
+    for (const key of Object.keys(state)) {
+      fields[key] = JSON.stringify(state[key]);
+    }
+    const seq = ++this.stateSeq;
+    const previous = this.lastState;
+    this.lastState = { seq, fields };
+
+    if (!command.delta || !previous) {
+      return Object.assign(state, { id: command.id, seq: seq });
+    }
+
+    const changed = {};
+    for (const key of Object.keys(fields)) {
+      if (fields[key] !== previous.fields[key]) changed[key] = state[key];
+    }
+    const removed = Object.keys(previous.fields).filter(key => !(key in fields));
+    return { id: command.id, seq: seq, base: previous.seq, delta: true, changed: changed, removed: removed };
+  }
+
+  dispatch(command) {
+    if (command.action === 'set_format') {
+      this.setFormat(command);
+      return;
+    }
+    this.onCommand(command);
+  }
+
+  setFormat(command) {
+    if (!FORMATS.includes(command.format)) {
+      this.send({ id: command.id, success: false, error: `Unsupported wire format: ${command.format}` });
+      return;
+    }
+    // 這是最後一條以舊格式送出的訊息
+    this.send({ id: command.id, success: true, wire_format: command.format });
+    if (command.format === this.format) return;
+
+    this.format = command.format;
+    // 二進位幀模式下 stdout 只能有幀，第三方庫的 console.log 改寫到 stderr
+    console.log = console.error;
+    this.reader.close();
+    process.stdin.on('data', (chunk) => this.onData(chunk));
+    process.stdin.on('end', () => {
+      if (this.onClose) this.onClose();
+    });
+    process.stdin.resume();
+    console.error(`📦 Bridge switched to ${this.format} framing`);
+  }
+
+  onData(chunk) {
+    this.buffer = this.buffer.length ? Buffer.concat([this.buffer, chunk]) : chunk;
+    while (this.buffer.length >= 4) {
+      const size = this.buffer.readUInt32BE(0);
+      if (this.buffer.length < 4 + size) break;
+      const body = this.buffer.subarray(4, 4 + size);
+      this.buffer = this.buffer.subarray(4 + size);
+      let command;
+      try {
+        command = msgpack.decode(body);
+      } catch (err) {
+        this.send({ success: false, error: err.message });
+        continue;
+      }
+      this.dispatch(command);
+    }
+  }
+}
+
+/**
+ * 增量觀察：記住每個區段上次送出的項（鍵 -> JSON 文本），只返回變更
+ */
+class IncrementalState {
+  constructor() {
+    this.seq = 0;
+    this.sent = {};  // 區段名 -> Map(鍵 -> JSON 文本)
+  }
+
+  /**
+   * @param {object} command get_state 命令（reset 時重新送出全部項）
+   * @param {object} scalars 每次都完整返回的欄位（位置、生命值等）
+   * @param {object} sections 區段名 -> [[鍵, 項], ...]
+   */
+  reply(command, scalars, sections) {
+    const reset = Boolean(command.reset) || this.seq === 0;
+    const base = reset ? 0 : this.seq;
+    this.seq += 1;
+
+    const message = Object.assign({}, scalars, {
+      id: command.id, incremental: true, seq: this.seq, base: base, reset: reset
+    });
+    for (const [name, items] of Object.entries(sections)) {
+      if (!this.sent[name] || reset) this.sent[name] = new Map();
+      const sent = this.sent[name];
+
+      const set = [];
+      const seen = new Set();
+      for (const [key, item] of items) {
+        seen.add(key);
+        const text = JSON.stringify(item);
+        if (sent.get(key) !== text) {
+          sent.set(key, text);
+          set.push([key, item]);
+        }
+      }
+      const removed = [];
+      for (const key of sent.keys()) {
+        if (!seen.has(key)) {
+          removed.push(key);
+          sent.delete(key);
+        }
+      }
+      message[name] = { set: set, removed: removed };
+    }
+    return message;
+  }
+}
+
+module.exports = { Bridge, IncrementalState, FORMATS };
@@ -0,0 +1,135 @@
+/**
+ * Fake Bot Bridge - 不需要 Minecraft 的 bot.js 替身
+ * 說與 bot.js 相同的 stdin/stdout 協議，用於在沒有伺服器時測試 BotController
+ *
+ * 用法: BOT_BRIDGE_SCRIPT=fake_bot.js python3 main.py
+ *
+ * 環境變量:
+ *   FAKE_STATE_DELAY_MS   get_state 回應延遲（默認 5）
+ *   FAKE_EXEC_DELAY_MS    execute_code 回應延遲（默認 200）
+ *   FAKE_JITTER_MS        隨機附加延遲，用來製造亂序回應（默認 0）
+ *   FAKE_FAIL_RATE        execute_code / invoke 隨機失敗機率 0~1（默認 0）
+ */
+
+const { Bridge, IncrementalState } = require('./bridge_protocol');
+const crypto = require('crypto');
+
+const BOT_USERNAME = process.env.BOT_USERNAME || 'Agent_001';
+const STATE_DELAY_MS = parseInt(process.env.FAKE_STATE_DELAY_MS || '5');
+const EXEC_DELAY_MS = parseInt(process.env.FAKE_EXEC_DELAY_MS || '200');
+const JITTER_MS = parseInt(process.env.FAKE_JITTER_MS || '0');
+const FAIL_RATE = parseFloat(process.env.FAKE_FAIL_RATE || '0');
+
+// 已註冊的代碼句柄（與 bot.js 相同的內容雜湊，不真正編譯）
+const registeredCode = new Set();
+
+function codeHandle(code) {
+  return crypto.createHash('sha256').update(code, 'utf8').digest('hex').substring(0, 16);
+}
+
+// 模擬的世界狀態
+const world = {
+  position: { x: 0, y: 64, z: 0 },
+  health: 20,
+  food: 20,
+  tick: 0
+};
+
+function sleep(ms) {
+  return new Promise(resolve => setTimeout(resolve, ms + Math.random() * JITTER_MS));
+}
+
+function sendMessage(message) {
+  bridge.send(message);
+}
+
+function getCurrentState() {
+  const timeOfDay = ['morning', 'day', 'evening', 'night'][Math.floor(world.tick / 10) % 4];
+  return {
+    position: { ...world.position },
+    health: world.health,
+    food: world.food,
+    inventory: [{ name: 'oak_log', count: 3, slot: 36 }],
+    nearby_entities: [
+      { type: 'mob', name: 'cow', distance: '6.00', position: { x: world.position.x + 6, y: 64, z: 0 } }
+    ],
+    nearby_blocks: [
+      { name: 'grass_block', position: { x: world.position.x, y: 63, z: 0 } },
+      { name: 'oak_log', position: { x: world.position.x + 4, y: 64, z: 4 } }
+    ],
+    time_of_day: timeOfDay,
+    weather: 'clear',
+    biome: 'plains'
+  };
+}
+
+const incremental = new IncrementalState();
+
+function getIncrementalState(command) {
+  const { nearby_blocks, nearby_entities, inventory, ...scalars } = getCurrentState();
+  const positionKey = (p) => `${p.x},${p.y},${p.z}`;
+  return incremental.reply(command, scalars, {
+    nearby_blocks: nearby_blocks.map(block => [positionKey(block.position), block]),
+    nearby_entities: nearby_entities.map((entity, index) => [String(index), {
+      type: entity.type, name: entity.name, position: entity.position
+    }]),
+    inventory: inventory.map(item => [String(item.slot), item])
+  });
+}
+
+async function executeCode(code) {
+  await sleep(EXEC_DELAY_MS);
+  world.tick += 1;
+  world.position.x += 1;
+  world.food = Math.max(0, world.food - (world.tick % 5 === 0 ? 1 : 0));
+
+  if (Math.random() < FAIL_RATE) {
+    return { success: false, error: 'Execution timeout (30s)', timestamp: new Date().toISOString() };
+  }
+  return { success: true, result: null, timestamp: new Date().toISOString() };
+}
+
+async function handleCommand(command) {
+  try {
+    if (command.action === 'get_state') {
+      await sleep(STATE_DELAY_MS);
+      sendMessage(command.incremental ? getIncrementalState(command)
+                                      : bridge.stateReply(getCurrentState(), command));
+
+    } else if (command.action === 'execute_code') {
+      const handle = codeHandle(command.code);
+      registeredCode.add(handle);
+      const result = await executeCode(command.code);
+      result.id = command.id;
+      result.handle = handle;
+      sendMessage(result);
+
+    } else if (command.action === 'register_code') {
+      const handle = codeHandle(command.code);
+      registeredCode.add(handle);
+      sendMessage({ id: command.id, success: true, handle: handle });
+
+    } else if (command.action === 'invoke') {
+      if (!registeredCode.has(command.handle)) {
+        sendMessage({ id: command.id, success: false, error: `Unknown code handle: ${command.handle}`,
+                      unknown_handle: true });
+        return;
+      }
+      const result = await executeCode(null);
+      result.id = command.id;
+      result.handle = command.handle;
+      sendMessage(result);
+
+    } else {
+      sendMessage({ id: command.id, success: false, error: `Unknown action: ${command.action}` });
+    }
+
+  } catch (err) {
+    sendMessage({ id: command?.id, success: false, error: err.message });
+  }
+}
+
+const bridge = new Bridge(handleCommand, () => process.exit(0));
+
+console.error(`🧪 Fake bridge for ${BOT_USERNAME} started`);
+bridge.sendReady();
@@ -7,15 +7,20 @@ import os
 import sys
 import time
 import json
+import asyncio
 import logging
-from datetime import datetime
 from pathlib import Path
 
 from agent.bot_controller import BotController
 from agent.llm_brain import LLMBrain
 from agent.memory_manager import MemoryManager
 from agent.skill_manager import SkillManager
+from agent.evolution_loop import EvolutionLoop
+from agent.fleet import FleetSupervisor
+from agent.decision_batcher import DecisionBatcher
+from agent.reflection_worker import ReflectionQueue
 from utils.logger import setup_logger
+from utils.events import emit_event
 
 # 設置日誌
 logger = setup_logger()
@@ -24,38 +29,80 @@ logger = setup_logger()
 class AIAgent:
     """AI 代理人核心類"""
     
-    def __init__(self):
-        """初始化 AI 代理人"""
-        logger.info("=" * 60)
-        logger.info("🤖 Project Observer - AI Agent Starting...")
-        logger.info("=" * 60)
+    def __init__(self, bot_username: str = None, memory_manager: MemoryManager = None,
+                 llm_brain: LLMBrain = None, skill_manager: SkillManager = None,
+                 reflection_queue: ReflectionQueue = None, viewer_port: int = None):
+        """
+        初始化 AI 代理人
         
+        艦隊模式下由 FleetSupervisor 傳入共享的記憶、LLM、技能模組與反思隊列，
+        每個代理人只擁有自己的 BotController 與迭代計數。
+        """
         # 從環境變量讀取配置
         self.mc_host = os.getenv('MC_HOST', 'mc-server')
         self.mc_port = int(os.getenv('MC_PORT', '25565'))
-        self.bot_username = os.getenv('BOT_USERNAME', 'Agent_001')
+        self.bot_username = bot_username or os.getenv('BOT_USERNAME', 'Agent_001')
         
         # 初始化各個模組
-        logger.info("📚 Initializing Memory Manager...")
-        self.memory_manager = MemoryManager()
+        if memory_manager is None:
+            logger.info("📚 Initializing Memory Manager...")
+            memory_manager = MemoryManager()
+        self.memory_manager = memory_manager
         
-        logger.info("🧠 Initializing LLM Brain...")
-        self.llm_brain = LLMBrain(self.memory_manager)
+        if llm_brain is None:
+            logger.info("🧠 Initializing LLM Brain...")
+            llm_brain = LLMBrain(self.memory_manager)
+        self.llm_brain = llm_brain
         
-        logger.info("🎯 Initializing Skill Manager...")
-        self.skill_manager = SkillManager(self.memory_manager)
+        if skill_manager is None:
+            logger.info("🎯 Initializing Skill Manager...")
+            skill_manager = SkillManager(self.memory_manager)
+        self.skill_manager = skill_manager
         
-        logger.info("🎮 Initializing Bot Controller...")
+        if reflection_queue is None:
+            reflection_queue = ReflectionQueue(self.llm_brain, self.memory_manager)
+        self.reflection_queue = reflection_queue
+        
+        logger.info(f"🎮 Initializing Bot Controller for {self.bot_username}...")
         self.bot_controller = BotController(
             host=self.mc_host,
             port=self.mc_port,
-            username=self.bot_username
+            username=self.bot_username,
+            viewer_port=viewer_port
         )
         
         # 運行狀態
         self.is_running = False
         self.iteration_count = 0
+        self.evolution_loop = None
+        
+    def connect(self):
+        """連接到 Minecraft 伺服器並確認 bot.js 通訊正常"""
+        logger.info(f"🔌 Connecting {self.bot_username} to Minecraft server at {self.mc_host}:{self.mc_port}...")
+        self.bot_controller.connect()
+        
+        # 等待機器人準備就緒
+        time.sleep(3)
+        
+        # 測試通訊
+        logger.info("🧪 Testing bot.js communication...")
+        test_obs = self.bot_controller.get_observation()
+        if test_obs.get('position'):
+            logger.info(f"✅ Bot connected successfully! Position: ({test_obs.get('position', {}).get('x', 0):.1f}, {test_obs.get('position', {}).get('y', 0):.1f}, {test_obs.get('position', {}).get('z', 0):.1f})")
+        else:
+            logger.warning("⚠️ Bot connected but position data incomplete")
         
+        # 預先編譯固定動作的代碼，之後的執行只發送句柄
+        for action in self.llm_brain.ACTION_MAP.values():
+            if action.get('code'):
+                try:
+                    self.bot_controller.register_code(action['code'])
+                except Exception as e:
+                    logger.warning(f"⚠️ Failed to precompile action code: {e}")
+        
+        # 多給一點時間讓 bot.js 穩定
+        time.sleep(3)
+    
     def start(self):
         """啟動 AI 代理人"""
         logger.info("🚀 Starting AI Agent...")
@@ -63,22 +110,7 @@ class AIAgent:
         
         try:
             # 連接到 Minecraft 伺服器
-            logger.info(f"🔌 Connecting to Minecraft server at {self.mc_host}:{self.mc_port}...")
-            self.bot_controller.connect()
-            
-            # 等待機器人準備就緒
-            time.sleep(3)
-            
-            # 測試通訊 - 發送一次測試命令清空 buffer
-            logger.info("🧪 Testing bot.js communication...")
-            test_obs = self.bot_controller.get_observation()
-            if test_obs.get('position'):
-                logger.info(f"✅ Bot connected successfully! Position: ({test_obs.get('position', {}).get('x', 0):.1f}, {test_obs.get('position', {}).get('y', 0):.1f}, {test_obs.get('position', {}).get('z', 0):.1f})")
-            else:
-                logger.warning("⚠️ Bot connected but position data incomplete")
-            
-            # 多給一點時間讓 bot.js 穩定
-            time.sleep(3)
+            self.connect()
             
             # 開始主循環
             self.main_loop()
@@ -100,49 +132,15 @@ class AIAgent:
         3. Act (行動): 生成並執行代碼
         4. Reflect (反思): 根據結果優化
         5. Learn (學習): 將成功的技能存入記憶
+        
+        各階段由 EvolutionLoop 以 asyncio 流水線方式重疊執行：
+        行動期間預取下一輪觀察，反思與技能保存在背景進行，
+        循環節拍由自適應調度器決定。
         """
         logger.info("🔄 Entering main evolution loop...")
         
-        while self.is_running:
-            try:
-                self.iteration_count += 1
-                logger.info(f"\n{'='*60}")
-                logger.info(f"🔄 Iteration #{self.iteration_count}")
-                logger.info(f"{'='*60}\n")
-                
-                # === 1. OBSERVE (觀察) ===
-                logger.info("👁️  [OBSERVE] Gathering environment data...")
-                observation = self.bot_controller.get_observation()
-                self.log_observation(observation)
-                
-                # === 2. THINK (思考) ===
-                logger.info("🧠 [THINK] Consulting LLM for decision...")
-                decision = self.llm_brain.make_decision(observation)
-                self.log_decision(decision)
-                
-                # === 3. ACT (行動) ===
-                logger.info("⚡ [ACT] Executing action...")
-                result = self.execute_action(decision)
-                self.log_result(result)
-                
-                # === 4. REFLECT (反思) ===
-                if not result['success']:
-                    logger.warning("❌ [REFLECT] Action failed, analyzing...")
-                    self.reflect_on_failure(decision, result)
-                else:
-                    logger.info("✅ [REFLECT] Action succeeded!")
-                
-                # === 5. LEARN (學習) ===
-                if result['success'] and decision.get('is_new_skill'):
-                    logger.info("💾 [LEARN] Saving new skill to memory...")
-                    self.skill_manager.save_skill(decision, result)
-                
-                # 適當的循環延遲
-                time.sleep(5)
-                
-            except Exception as e:
-                logger.error(f"❌ Error in main loop: {e}", exc_info=True)
-                time.sleep(10)  # 錯誤後等待更長時間
+        self.evolution_loop = EvolutionLoop(self)
+        asyncio.run(self.evolution_loop.run())
     
     def execute_action(self, decision: dict) -> dict:
         """執行 LLM 決策的行動"""
@@ -177,53 +175,90 @@ class AIAgent:
             logger.error(f"Error executing action: {e}")
             return {'success': False, 'error': str(e)}
     
-    def reflect_on_failure(self, decision: dict, result: dict):
-        """失敗後的反思與改進"""
-        error_context = {
-            'decision': decision,
-            'result': result,
-            'iteration': self.iteration_count,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        # 讓 LLM 分析失敗原因並提出改進方案
-        improvement = self.llm_brain.analyze_failure(error_context)
-        logger.info(f"💡 [IMPROVEMENT] {improvement}")
+    def reflect_on_failure(self, decision: dict, result: dict, iteration: int = None):
+        """
+        失敗後的反思與改進
         
-        # 將失敗案例存入記憶，避免重蹈覆轍
-        self.memory_manager.store_failure(error_context, improvement)
+        交給背景反思隊列處理（LLM 分析 + 寫入失敗記憶），不阻塞主循環；
+        重複的錯誤會被合併，每種錯誤只分析一次。
+        """
+        self.reflection_queue.submit(
+            decision,
+            result,
+            iteration if iteration is not None else self.iteration_count,
+            agent=self.bot_username
+        )
     
     def log_observation(self, obs: dict):
-        """記錄觀察結果"""
-        logger.info(f"  位置: ({obs.get('position', {}).get('x', 0):.1f}, "
-                   f"{obs.get('position', {}).get('y', 0):.1f}, "
-                   f"{obs.get('position', {}).get('z', 0):.1f})")
-        logger.info(f"  生命值: {obs.get('health', 0)}/20")
-        logger.info(f"  飢餓值: {obs.get('food', 0)}/20")
-        logger.info(f"  附近實體: {len(obs.get('nearby_entities', []))} 個")
-        logger.info(f"  附近方塊: {len(obs.get('nearby_blocks', []))} 個")
+        """記錄觀察結果（文本日誌 + observation 事件）"""
+        position = obs.get('position', {})
+        logger.info("  位置: (%.1f, %.1f, %.1f)\n  生命值: %s/20\n  飢餓值: %s/20\n  附近實體: %d 個\n  附近方塊: %d 個",
+                    position.get('x', 0), position.get('y', 0), position.get('z', 0),
+                    obs.get('health', 0), obs.get('food', 0),
+                    len(obs.get('nearby_entities', [])), len(obs.get('nearby_blocks', [])))
+        
+        emit_event(
+            'observation', agent=self.bot_username, iteration=self.iteration_count,
+            position={axis: round(float(position.get(axis, 0)), 2) for axis in ('x', 'y', 'z')},
+            health=obs.get('health', 0),
+            food=obs.get('food', 0),
+            entities=len(obs.get('nearby_entities', [])),
+            blocks=len(obs.get('nearby_blocks', [])),
+            inventory=len(obs.get('inventory', [])),
+            time_of_day=obs.get('time_of_day'),
+            biome=obs.get('biome')
+        )
     
     def log_decision(self, decision: dict):
-        """記錄決策"""
+        """記錄決策（文本日誌 + decision 事件）"""
         # LLM Brain 已經記錄了決策，這裡只記錄詳情
-        logger.info(f"  行動類型: {decision.get('action_type', 'None')}")
+        logger.info("  行動類型: %s", decision.get('action_type', 'None'))
         if decision.get('reasoning'):
-            logger.info(f"  思考過程: {decision.get('reasoning')}")
+            logger.info("  思考過程: %s", decision.get('reasoning'))
+        
+        emit_event(
+            'decision', agent=self.bot_username, iteration=self.iteration_count,
+            goal=decision.get('goal') or '',
+            action_type=decision.get('action_type') or 'None',
+            action=decision.get('action'),
+            reasoning=decision.get('reasoning'),
+            tier=decision.get('tier'),
+            skill_name=decision.get('skill_name'),
+            decision_ms=(decision.get('timing') or {}).get('decision_ms')
+        )
     
-    def log_result(self, result: dict):
-        """記錄執行結果"""
+    def log_result(self, result: dict, decision: dict = None):
+        """記錄執行結果（文本日誌 + action_result 事件）"""
         if result.get('success'):
-            logger.info(f"  結果: ✅ {result.get('message', 'Success')}")
+            logger.info("  結果: ✅ %s", result.get('message', 'Success'))
         else:
-            logger.error(f"  結果: ❌ {result.get('error', 'Unknown error')}")
+            logger.error("  結果: ❌ %s", result.get('error', 'Unknown error'))
+        
+        decision = decision or {}
+        emit_event(
+            'action_result', agent=self.bot_username, iteration=self.iteration_count,
+            success=bool(result.get('success')),
+            action_type=decision.get('action_type'),
+            goal=decision.get('goal'),
+            message=result.get('message'),
+            error=None if result.get('success') else str(result.get('error', 'Unknown error'))
+        )
     
-    def shutdown(self):
-        """關閉 AI 代理人"""
-        logger.info("🛑 Shutting down AI Agent...")
+    def stop(self):
+        """停止主循環並斷開 bot（不結束進程）"""
         self.is_running = False
         
         if self.bot_controller:
             self.bot_controller.disconnect()
+    
+    def shutdown(self):
+        """關閉 AI 代理人"""
+        logger.info("🛑 Shutting down AI Agent...")
+        self.stop()
+        self.reflection_queue.close()
+        self.memory_manager.close()
+        self.skill_manager.close()
+        self.llm_brain.close()
         
         logger.info("👋 AI Agent stopped. Goodbye!")
         sys.exit(0)
@@ -236,10 +271,88 @@ def main():
     Path('/app/logs').mkdir(exist_ok=True)
     Path('/app/memory').mkdir(exist_ok=True)
     
+    logger.info("=" * 60)
+    logger.info("🤖 Project Observer - AI Agent Starting...")
+    logger.info("=" * 60)
+    
+    # 艦隊模式：BOT_USERNAMES 或 FLEET_SIZE > 1 時在同一進程運行多個代理人
+    usernames = fleet_usernames()
+    if len(usernames) > 1:
+        run_fleet(usernames)
+        return
+    
     # 創建並啟動 AI 代理人
-    agent = AIAgent()
+    agent = AIAgent(bot_username=usernames[0])
     agent.start()
 
 
+def fleet_usernames() -> list:
+    """
+    決定要運行的機器人名稱
+    
+    - BOT_USERNAMES=Agent_001,Agent_002 明確指定
+    - FLEET_SIZE=N 以 BOT_USERNAME 為前綴自動編號
+    """
+    explicit = [name.strip() for name in os.getenv('BOT_USERNAMES', '').split(',') if name.strip()]
+    if explicit:
+        return explicit
+    
+    base = os.getenv('BOT_USERNAME', 'Agent_001')
+    size = int(os.getenv('FLEET_SIZE', '1'))
+    if size <= 1:
+        return [base]
+    
+    prefix = base.rstrip('0123456789') or 'Agent_'
+    return [f"{prefix}{i:03d}" for i in range(1, size + 1)]
+
+
+def run_fleet(usernames: list):
+    """以 FleetSupervisor 在一個事件循環中運行多個代理人"""
+    logger.info(f"🚢 Fleet mode: {len(usernames)} bots ({', '.join(usernames)})")
+    
+    logger.info("📚 Initializing shared Memory Manager...")
+    memory_manager = MemoryManager()
+    logger.info("🧠 Initializing shared LLM Brain...")
+    llm_brain = LLMBrain(memory_manager)
+    logger.info("🎯 Initializing shared Skill Manager...")
+    skill_manager = SkillManager(memory_manager)
+    reflection_queue = ReflectionQueue(llm_brain, memory_manager)
+    
+    # 只有第一個 bot 開啟第一視角查看器（避免端口衝突），除非指定了起始端口
+    viewer_base = int(os.getenv('FLEET_VIEWER_BASE_PORT', '0'))
+    
+    def agent_factory(index: int, username: str) -> AIAgent:
+        viewer_port = viewer_base + index if viewer_base else (None if index == 0 else 0)
+        return AIAgent(
+            bot_username=username,
+            memory_manager=memory_manager,
+            llm_brain=llm_brain,
+            skill_manager=skill_manager,
+            reflection_queue=reflection_queue,
+            viewer_port=viewer_port
+        )
+    
+    # 多個 bot 的決策請求在短窗口內合併成一次 LLM 調用（DECISION_BATCH_WINDOW_MS=0 關閉）
+    decision_service = None
+    if float(os.getenv('DECISION_BATCH_WINDOW_MS', '50')) > 0:
+        logger.info("📦 Batching LLM decisions across bots")
+        decision_service = DecisionBatcher(llm_brain)
+    
+    supervisor = FleetSupervisor(usernames, agent_factory, decision_service=decision_service)
+    try:
+        asyncio.run(supervisor.run())
+    except KeyboardInterrupt:
+        logger.info("⚠️  Received interrupt signal, shutting down fleet...")
+    finally:
+        supervisor.stop()
+        reflection_queue.close()
+        memory_manager.close()
+        skill_manager.close()
+        llm_brain.close()
+        if decision_service is not None:
+            logger.info(f"📦 Decision batching stats: {decision_service.get_statistics()}")
+        logger.info("👋 Fleet stopped. Goodbye!")
+
+
 if __name__ == "__main__":
     main()
@@ -9,8 +9,31 @@ import time
 from pathlib import Path
 from datetime import datetime
 
+from utils.events import EventReader, latest_event_file
+
+# 事件類型 -> 字幕
+THOUGHT_EVENTS = ('decision', 'action_result', 'reflection', 'skill_saved', 'observation')
+
+def thought_from_event(event):
+    """將結構化事件轉成字幕"""
+    kind = event.get('type')
+    if kind == 'decision':
+        return {'type': 'decision', 'text': f"💡 決策: {event.get('goal')}"}
+    if kind == 'action_result':
+        if event.get('success'):
+            return {'type': 'action', 'text': f"⚡ 執行: {event.get('goal') or event.get('action_type')} ✅"}
+        return {'type': 'error', 'text': f"⚠️ 錯誤: {(event.get('error') or '')[:80]}"}
+    if kind == 'reflection':
+        return {'type': 'learning', 'text': f"📚 學習: {(event.get('improvement') or '')[:80]}"}
+    if kind == 'skill_saved':
+        return {'type': 'learning', 'text': f"📚 學會技能: {event.get('name')}"}
+    position = event.get('position') or {}
+    return {'type': 'observe',
+            'text': f"👁️ 觀察: ({position.get('x', 0):.0f}, {position.get('y', 0):.0f}, {position.get('z', 0):.0f}) "
+                    f"❤️ {event.get('health')} 🍖 {event.get('food')}"}
+
 def extract_latest_thought():
-    """從日誌中提取最新的 AI 思維"""
+    """從事件流（或舊版的日誌文本）中提取最新的 AI 思維"""
     try:
         log_dir = Path('agent_logs')
         if not log_dir.exists():
@@ -19,6 +42,11 @@ def extract_latest_thought():
                 'text': '⏳ 等待 AI 啟動...'
             }
         
+        if latest_event_file(log_dir) is not None:
+            events = EventReader(log_dir).tail(1, THOUGHT_EVENTS)
+            if events:
+                return thought_from_event(events[-1])
+        
         log_files = sorted(log_dir.glob('*.log'))
         if not log_files:
             return {
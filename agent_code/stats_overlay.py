@@ -6,9 +6,12 @@
 
 import json
 import time
+import sqlite3
 from pathlib import Path
 from datetime import datetime, timedelta
 
+from utils.events import tail_events, latest_event_file
+
 START_TIME = datetime.now()
 
 def get_uptime():
@@ -19,12 +22,16 @@ def get_uptime():
     return f"{hours}h {minutes}m"
 
 def get_current_goal():
-    """從日誌中提取當前目標"""
+    """從事件流（或舊版的日誌文本）中提取當前目標"""
     try:
         log_dir = Path('agent_logs')
         if not log_dir.exists():
             return "等待 AI 啟動..."
         
+        if latest_event_file(log_dir) is not None:
+            decisions = tail_events(log_dir, 1, ('decision',))
+            return str(decisions[-1].get('goal') or "探索中...")[:50] if decisions else "探索中..."
+        
         log_files = sorted(log_dir.glob('*.log'))
         if not log_files:
             return "等待 AI 啟動..."
@@ -42,6 +49,44 @@ def get_current_goal():
     except Exception as e:
         return f"讀取失敗: {str(e)}"
 
+# 技能庫未變更時重用上次的統計
+_db_stats_cache = {'signature': None, 'stats': None}
+
+def calculate_db_stats(skill_db):
+    """直接在 SQLite 技能庫上聚合統計（不讀取技能代碼，不隨技能數量線性增長）"""
+    stat = skill_db.stat()
+    signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    if signature == _db_stats_cache['signature']:
+        return dict(_db_stats_cache['stats'])
+    
+    conn = sqlite3.connect(f"file:{skill_db}?mode=ro", uri=True, timeout=1)
+    try:
+        total_skills, success_count, failure_count = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(success_count), 0), COALESCE(SUM(failure_count), 0) FROM skills"
+        ).fetchone()
+        top_skills = [
+            {'name': name, 'success': success, 'total': total}
+            for name, success, total in conn.execute(
+                "SELECT name, success_count, success_count + failure_count AS total "
+                "FROM skills ORDER BY total DESC LIMIT 3"
+            )
+        ]
+        recent = conn.execute("SELECT name FROM skills ORDER BY created_at DESC LIMIT 1").fetchone()
+    finally:
+        conn.close()
+    
+    total = success_count + failure_count
+    stats = {
+        'total_skills': total_skills,
+        'success_count': success_count,
+        'failure_count': failure_count,
+        'success_rate': (success_count / total * 100) if total > 0 else 0.0,
+        'top_skills': top_skills,
+        'recent_skill': recent[0] if recent else None
+    }
+    _db_stats_cache.update(signature=signature, stats=stats)
+    return dict(stats)
+
 def calculate_stats():
     """計算詳細統計數據"""
     skills_dir = Path('agent_skills')
@@ -58,6 +103,14 @@ def calculate_stats():
     if not skills_dir.exists():
         return stats
     
+    # SQLite 技能庫（新版）：直接聚合
+    skill_db = skills_dir / 'skills.db'
+    if skill_db.exists():
+        try:
+            return calculate_db_stats(skill_db)
+        except Exception:
+            pass
+    
     skills = list(skills_dir.glob('*.json'))
     stats['total_skills'] = len(skills)
     
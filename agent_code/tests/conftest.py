@@ -0,0 +1,36 @@
+"""
+測試共用設定：agent_code 為導入根目錄（與 main.py 相同，例如 from agent.x import Y）
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+AGENT_CODE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(AGENT_CODE))
+
+
+@pytest.fixture
+def memory_env(tmp_path, monkeypatch):
+    """本地記憶後端，所有文件寫到臨時目錄"""
+    monkeypatch.setenv('MEMORY_BACKEND', 'local')
+    monkeypatch.setenv('MEMORY_PATH', str(tmp_path / 'memory'))
+    monkeypatch.setenv('MEMORY_JOURNAL_DIR', str(tmp_path / 'memory' / 'journal'))
+    monkeypatch.setenv('MEMORY_ARCHIVE_DIR', str(tmp_path / 'memory' / 'archive'))
+    monkeypatch.setenv('MEMORY_COMPACT_INTERVAL', '3600')
+    return tmp_path
+
+
+@pytest.fixture
+def observation():
+    """一個典型的觀察（白天、附近有牛與橡木），每個測試各自一份"""
+    return {
+        'position': {'x': 10, 'y': 64, 'z': -3},
+        'health': 18,
+        'food': 15,
+        'time_of_day': 'day',
+        'nearby_entities': [{'name': 'cow', 'position': {'x': 12, 'y': 64, 'z': -3}}],
+        'nearby_blocks': [{'name': 'oak_log', 'position': {'x': 11, 'y': 64, 'z': -2}}],
+        'inventory': [],
+    }
@@ -0,0 +1,140 @@
+"""
+BridgeTransport 對 fake_bot.js（不需要 Minecraft 的 bridge 替身）的端到端測試：
+亂序回應、每個請求獨立的超時、遲到回應的丟棄與 msgpack 幀切換
+"""
+
+import os
+import time
+import asyncio
+import shutil
+import logging
+import subprocess
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import pytest
+
+from agent import bridge_transport
+from agent.bridge_transport import BridgeTransport
+from conftest import AGENT_CODE
+
+FAKE_BOT = str(AGENT_CODE / 'fake_bot.js')
+
+pytestmark = pytest.mark.skipif(shutil.which('node') is None, reason='node is not installed')
+
+
+def node_has_msgpack() -> bool:
+    if shutil.which('node') is None:
+        return False
+    check = subprocess.run(['node', '-e', "require('@msgpack/msgpack')"], cwd=AGENT_CODE,
+                           capture_output=True)
+    return check.returncode == 0
+
+
+@pytest.fixture
+def start_bridge():
+    """啟動 fake_bot.js；測試結束時關閉"""
+    transports = []
+
+    def start(wire_format='json', **delays):
+        env = dict(os.environ, FAKE_STATE_DELAY_MS='5', FAKE_EXEC_DELAY_MS='300')
+        env.update({key: str(value) for key, value in delays.items()})
+        transport = BridgeTransport(['node', FAKE_BOT], env=env, wire_format=wire_format)
+        transports.append(transport)
+        transport.start(ready_timeout=10)
+        return transport
+
+    yield start
+    for transport in transports:
+        transport.close()
+
+
+def test_ready_signal(start_bridge):
+    transport = start_bridge()
+    assert transport.ready_message['ready'] is True
+    assert 'json' in transport.ready_message['formats']
+
+
+def test_out_of_order_replies_reach_their_requests(start_bridge):
+    transport = start_bridge()
+
+    slow = transport.request({'action': 'execute_code', 'code': 'await bot.waitForTicks(1)'})
+    fast = transport.request({'action': 'get_state'})
+
+    state = fast.result(5)
+    assert not slow.done()  # 後發的請求先完成
+    result = slow.result(5)
+
+    assert state['id'] == fast.request_id and 'position' in state
+    assert result['id'] == slow.request_id and result['success'] and result['handle']
+    assert transport.in_flight == 0
+
+
+def test_timeout_applies_to_one_request_only(start_bridge):
+    transport = start_bridge()
+
+    other = transport.request({'action': 'execute_code', 'code': 'other'})
+    with pytest.raises(FutureTimeoutError):
+        transport.call({'action': 'execute_code', 'code': 'slow'}, timeout=0.05)
+
+    assert other.result(5)['success']
+    assert transport.call({'action': 'get_state'}, timeout=5)['position']
+
+
+def test_late_reply_is_dropped(start_bridge, caplog):
+    transport = start_bridge()
+
+    with pytest.raises(FutureTimeoutError):
+        transport.call({'action': 'execute_code', 'code': 'slow'}, timeout=0.05)
+    assert transport.in_flight == 0
+
+    with caplog.at_level(logging.WARNING, logger=bridge_transport.__name__):
+        time.sleep(0.5)  # 等待被放棄的請求的回應到達
+    assert any('stale bridge response' in record.getMessage() for record in caplog.records)
+
+    # 遲到的回應不會被誤交給之後的請求
+    state = transport.call({'action': 'get_state'}, timeout=5)
+    assert 'position' in state and 'handle' not in state
+
+
+def test_async_timeout_releases_request(start_bridge):
+    transport = start_bridge()
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await transport.acall({'action': 'execute_code', 'code': 'slow'}, timeout=0.05)
+        return await transport.acall({'action': 'get_state'}, timeout=5)
+
+    assert 'position' in asyncio.run(scenario())
+    assert transport.in_flight == 0
+
+
+def test_pending_requests_fail_when_bridge_closes(start_bridge):
+    transport = start_bridge()
+
+    pending = transport.request({'action': 'execute_code', 'code': 'slow'})
+    transport.close()
+
+    with pytest.raises(ConnectionError):
+        pending.result(5)
+
+
+@pytest.mark.skipif(bridge_transport.msgpack is None or not node_has_msgpack(),
+                    reason='msgpack is not installed for both python and node')
+def test_msgpack_framing(start_bridge):
+    transport = start_bridge(wire_format='msgpack')
+    assert transport.wire_format == 'msgpack'
+
+    slow = transport.request({'action': 'execute_code', 'code': 'await bot.waitForTicks(1)'})
+    state = transport.call({'action': 'get_state'}, timeout=5)
+    assert state['position']['y'] == 64
+    assert slow.result(5)['success']
+
+    with pytest.raises(FutureTimeoutError):
+        transport.call({'action': 'execute_code', 'code': 'slow'}, timeout=0.05)
+    assert transport.call({'action': 'get_state'}, timeout=5)['position']
+
+
+def test_json_is_kept_when_requested(start_bridge):
+    transport = start_bridge(wire_format='json')
+    assert transport.wire_format == 'json'
+    assert transport.call({'action': 'get_state'}, timeout=5)['position']
@@ -0,0 +1,72 @@
+"""
+DecisionBatcher 關閉時的行為：部分批次與排隊中的請求都要有結果
+"""
+
+import time
+import asyncio
+
+import pytest
+
+from agent.decision_batcher import DecisionBatcher
+
+
+class SlowBrain:
+    """按觀察編號返回決策的 LLM 替身"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batches = []
+
+    def make_decisions_batch(self, observations):
+        self.batches.append(len(observations))
+        time.sleep(self.delay)
+        return [{'action': f"act-{observation['n']}"} for observation in observations]
+
+    def _default_decision(self):
+        return {'action': 'explore'}
+
+
+def test_close_dispatches_partial_batch():
+    brain = SlowBrain()
+    batcher = DecisionBatcher(brain, window_ms=5000, max_batch=16, max_inflight=2)
+
+    async def scenario():
+        pending = [asyncio.create_task(batcher.decide({'n': n})) for n in range(3)]
+        await asyncio.sleep(0.05)  # 請求已被收集，窗口尚未結束
+        await batcher.close()
+        return await asyncio.wait_for(asyncio.gather(*pending), 1)
+
+    decisions = asyncio.run(scenario())
+    assert [decision['action'] for decision in decisions] == ['act-0', 'act-1', 'act-2']
+    assert brain.batches == [3]
+
+
+def test_close_fails_queued_requests():
+    brain = SlowBrain(delay=0.2)
+    batcher = DecisionBatcher(brain, window_ms=0, max_batch=1, max_inflight=1)
+
+    async def scenario():
+        first = asyncio.create_task(batcher.decide({'n': 0}))
+        await asyncio.sleep(0.05)  # 第一個批次在途，佔用唯一的槽位
+        queued = [asyncio.create_task(batcher.decide({'n': n})) for n in range(1, 3)]
+        await asyncio.sleep(0.01)
+        await batcher.close()
+        results = await asyncio.wait_for(asyncio.gather(*queued, return_exceptions=True), 1)
+        return await first, results
+
+    first, results = asyncio.run(scenario())
+    assert first['action'] == 'act-0'
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert brain.batches == [1]
+
+
+def test_close_without_requests():
+    batcher = DecisionBatcher(SlowBrain(), window_ms=10)
+
+    async def scenario():
+        assert (await batcher.decide({'n': 7}))['action'] == 'act-7'
+        await asyncio.wait_for(batcher.close(), 1)
+        # 槽位已歸還，關閉後仍可重新使用
+        return await asyncio.wait_for(batcher.decide({'n': 8}), 1)
+
+    assert asyncio.run(scenario())['action'] == 'act-8'
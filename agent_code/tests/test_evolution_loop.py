@@ -0,0 +1,66 @@
+"""
+EvolutionLoop：主循環出錯後的觀察預取處理
+"""
+
+import asyncio
+
+from agent.evolution_loop import EvolutionLoop, TickScheduler
+
+
+class FakeController:
+    supports_concurrent_requests = True
+
+    def __init__(self):
+        self.observations = 0
+
+    async def aget_observation(self):
+        self.observations += 1
+        return {'n': self.observations - 1}
+
+
+class FakeAgent:
+    """只實現 EvolutionLoop 用到的介面"""
+
+    bot_username = 'Tester'
+
+    def __init__(self, fail_results=()):
+        self.is_running = True
+        self.iteration_count = 0
+        self.bot_controller = FakeController()
+        self.seen = []
+        self.fail_results = set(fail_results)
+        self.llm_brain = self
+        self.skill_manager = self
+
+    def make_decision(self, observation):
+        return {'goal': 'explore', 'action_type': 'wait'}
+
+    def reuse_skill(self, decision):
+        return decision
+
+    def log_observation(self, observation):
+        self.seen.append(observation['n'])
+
+    def log_decision(self, decision):
+        pass
+
+    def execute_action(self, decision):
+        return {'success': False, 'error': 'nothing to do'}
+
+    def log_result(self, result, decision):
+        if self.iteration_count in self.fail_results:
+            raise RuntimeError('log failed')
+
+    def reflect_on_failure(self, decision, result, iteration):
+        if iteration >= 2:
+            self.is_running = False
+
+
+def test_prefetched_observation_survives_loop_error():
+    agent = FakeAgent(fail_results={1})
+    loop = EvolutionLoop(agent, scheduler=TickScheduler(min_interval=0.01, max_interval=0.01))
+
+    asyncio.run(asyncio.wait_for(loop.run(), 5))
+
+    # 第一輪出錯時預取的觀察已完成，下一輪直接使用而不是重新觀察
+    assert agent.seen == [0, 1]
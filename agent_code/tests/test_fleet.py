@@ -0,0 +1,93 @@
+"""
+FleetSupervisor：bridge 進程結束後 bot 會被重新連線
+"""
+
+import shutil
+import asyncio
+
+import pytest
+
+from agent.bot_controller import BotController
+from agent.fleet import FleetSupervisor
+from conftest import AGENT_CODE
+
+pytestmark = pytest.mark.skipif(shutil.which('node') is None, reason='node is not installed')
+
+
+class BridgeAgent:
+    """通過 fake_bot.js 觀察的最小代理人（決策固定為等待）"""
+
+    def __init__(self, username: str):
+        self.bot_username = username
+        self.is_running = False
+        self.iteration_count = 0
+        self.bot_controller = BotController('localhost', 25565, username,
+                                            bridge_script=str(AGENT_CODE / 'fake_bot.js'))
+        self.llm_brain = self
+        self.skill_manager = self
+        self.memory_manager = self
+
+    def connect(self):
+        self.bot_controller.connect()
+
+    def stop(self):
+        self.is_running = False
+        self.bot_controller.disconnect()
+
+    def make_decision(self, observation):
+        return {'goal': 'Wait and observe', 'action_type': 'wait'}
+
+    def reuse_skill(self, decision):
+        return decision
+
+    def execute_action(self, decision):
+        return {'success': True, 'message': 'Waiting and observing'}
+
+    def store_experience(self, observation, decision, result):
+        pass
+
+    def reflect_on_failure(self, decision, result, iteration):
+        pass
+
+    def log_observation(self, observation):
+        pass
+
+    def log_decision(self, decision):
+        pass
+
+    def log_result(self, result, decision):
+        pass
+
+
+async def wait_until(condition, timeout: float = 10):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, 'condition not reached in time'
+        await asyncio.sleep(0.02)
+
+
+def test_bot_reconnects_after_bridge_dies(monkeypatch):
+    monkeypatch.setenv('AGENT_TICK_MIN', '0.01')
+    monkeypatch.setenv('AGENT_TICK_MAX', '0.05')
+    agents = []
+
+    def factory(index, username):
+        agents.append(BridgeAgent(username))
+        return agents[-1]
+
+    async def scenario():
+        supervisor = FleetSupervisor(['Bot_A'], factory, connect_stagger=0, restart_delay=0.1)
+        fleet = asyncio.create_task(supervisor.run())
+        try:
+            await wait_until(lambda: agents and agents[0].iteration_count >= 2)
+            agents[0].bot_controller.transport.process.kill()
+
+            # 循環因 ConnectionError 結束，監督者建立新的代理人並重新連線
+            await wait_until(lambda: len(agents) == 2 and agents[1].iteration_count >= 2)
+            assert not agents[0].bot_controller.is_connected
+            assert agents[1].bot_controller.transport.is_alive
+        finally:
+            supervisor.stop()
+            await asyncio.wait_for(fleet, 10)
+
+    asyncio.run(scenario())
@@ -0,0 +1,108 @@
+"""
+LLMBrain 決策層級：無法解析的回答走默認探索，但不寫入決策快取；批次決策失敗時不逐個重試
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from agent.memory_manager import MemoryManager
+
+
+class FakeCompletions:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        message = SimpleNamespace(content=reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def make_brain(memory_env, monkeypatch):
+    pytest.importorskip('openai')
+    from agent.llm_brain import LLMBrain
+
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('DECISION_CACHE_PATH', '')
+    managers = []
+
+    def make(replies):
+        manager = MemoryManager()
+        managers.append(manager)
+        brain = LLMBrain(manager)
+        brain.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(replies)))
+        return brain
+
+    yield make
+    for manager in managers:
+        manager.close()
+
+
+def test_unparsable_reply_is_not_cached(make_brain, observation):
+    brain = make_brain(['I am not sure', 'hunt'])
+
+    first = brain.make_decision(observation)
+    assert first['action'] == 'explore'
+    assert first['tier'] == 'fallback'
+
+    # 下一次仍然詢問模型，而不是從快取返回默認探索
+    second = brain.make_decision(observation)
+    assert second['action'] == 'hunt'
+    assert second['tier'] == 'llm'
+    assert brain.client.chat.completions.calls == 2
+    assert brain.tier_counts['cache'] == 0
+
+
+def test_parsed_reply_is_cached(make_brain, observation):
+    brain = make_brain(['mine_wood.'])
+
+    assert brain.make_decision(observation)['tier'] == 'llm'
+    cached = brain.make_decision(observation)
+    assert cached['action'] == 'mine_wood'
+    assert cached['tier'] == 'cache'
+    assert brain.client.chat.completions.calls == 1
+
+
+def spread_observations(observation, count):
+    """位置相距很遠的觀察（量化後互不相同，不會互相命中快取）"""
+    return [dict(observation, position={'x': 1000 * n, 'y': 64, 'z': 0}) for n in range(count)]
+
+
+def test_batch_failure_does_not_fan_out(make_brain, observation):
+    brain = make_brain([ConnectionError('LLM unavailable')])
+
+    decisions = brain.make_decisions_batch(spread_observations(observation, 3))
+
+    assert brain.client.chat.completions.calls == 1
+    assert [decision['tier'] for decision in decisions] == ['fallback'] * 3
+    assert brain.tier_counts['fallback'] == 3
+
+
+def test_partial_batch_reply_asks_once_for_missing_items(make_brain, observation):
+    brain = make_brain(['1: hunt\n3: rest', '1: mine_wood'])
+    built = []
+    build = brain.memory_context.build
+    brain.memory_context.build = lambda observation, key: built.append(key) or build(observation, key)
+
+    decisions = brain.make_decisions_batch(spread_observations(observation, 3))
+
+    assert brain.client.chat.completions.calls == 2
+    assert [decision['action'] for decision in decisions] == ['hunt', 'mine_wood', 'rest']
+    assert len(built) == 3  # 補問重用第一次檢索的記憶
+    assert brain.tier_counts['llm'] == 3
+    assert brain.tier_counts['cache'] == 0
+
+
+def test_missing_items_fall_back_after_one_follow_up(make_brain, observation):
+    brain = make_brain(['1: hunt', 'no idea'])
+
+    decisions = brain.make_decisions_batch(spread_observations(observation, 3))
+
+    assert brain.client.chat.completions.calls == 2
+    assert [decision['tier'] for decision in decisions] == ['llm', 'fallback', 'fallback']
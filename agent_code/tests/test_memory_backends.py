@@ -0,0 +1,111 @@
+"""
+本地 NumPy 記憶後端（NumpyFlatCollection）與批次寫入緩衝
+"""
+
+import numpy as np
+import pytest
+
+from agent.memory_backends import NumpyFlatCollection
+from agent.memory_writer import WriteBehindBuffer
+
+
+@pytest.fixture
+def state_index(tmp_path):
+    """與 MemoryManager.state_index 相同的 l2 數值索引"""
+    return NumpyFlatCollection(tmp_path, 'states', metadata={'hnsw:space': 'l2'}, dim=8)
+
+
+def test_document_update_keeps_state_vector(state_index):
+    vector = np.arange(8, dtype=np.float32)
+    state_index.add(ids=['a'], documents=['old'], embeddings=[vector])
+
+    state_index.update(ids=['a'], documents=['new'])
+
+    result = state_index.get(ids=['a'], include=['embeddings'])
+    assert result['documents'] == ['new']
+    np.testing.assert_array_equal(result['embeddings'][0], vector)
+
+
+def test_update_replaces_vector_with_explicit_embeddings(state_index):
+    state_index.add(ids=['a'], documents=['doc'], embeddings=[np.zeros(8)])
+
+    state_index.update(ids=['a'], embeddings=[np.ones(8)])
+
+    query = state_index.query(query_embeddings=[np.ones(8)], n_results=1)
+    assert query['ids'] == [['a']]
+    assert query['distances'][0][0] == pytest.approx(0.0)
+
+
+def test_update_rejects_wrong_dimension(state_index):
+    state_index.add(ids=['a'], documents=['doc'], embeddings=[np.zeros(8)])
+
+    with pytest.raises(ValueError):
+        state_index.update(ids=['a'], embeddings=[np.zeros(256)])
+    np.testing.assert_array_equal(state_index.get(ids=['a'], include=['embeddings'])['embeddings'][0], np.zeros(8))
+
+
+def test_updates_survive_reopen(tmp_path, state_index):
+    state_index.add(ids=['a'], documents=['doc'], embeddings=[np.zeros(8)])
+    state_index.update(ids=['a'], documents=['new'], embeddings=[np.ones(8)])
+
+    reopened = NumpyFlatCollection(tmp_path, 'states', metadata={'hnsw:space': 'l2'}, dim=8)
+    result = reopened.get(ids=['a'], include=['embeddings'])
+    assert result['documents'] == ['new']
+    np.testing.assert_array_equal(result['embeddings'][0], np.ones(8))
+
+
+def test_add_skips_existing_ids_without_partial_writes(tmp_path):
+    collection = NumpyFlatCollection(tmp_path, 'experiences')
+    collection.add(ids=['b'], documents=['existing'])
+
+    collection.add(ids=['a', 'b', 'c', 'c'], documents=['first', 'duplicate', 'third', 'again'])
+
+    assert collection.count() == 3
+    assert collection.get(ids=['b'])['documents'] == ['existing']
+    assert collection.get(ids=['c'])['documents'] == ['third']
+
+    reopened = NumpyFlatCollection(tmp_path, 'experiences')
+    assert sorted(reopened.get()['ids']) == ['a', 'b', 'c']
+
+
+class _FailingCollection:
+    """第一次 add 拋出指定錯誤，之後正常寫入"""
+
+    def __init__(self, error):
+        self.error = error
+        self.added = []
+
+    def add(self, ids, documents, metadatas, **kwargs):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        self.added.extend(ids)
+
+    def get(self, ids=None, **kwargs):
+        return {'ids': [doc_id for doc_id in ids or [] if doc_id in self.added]}
+
+
+def test_writer_rejects_batch_on_non_transient_error(tmp_path):
+    collection = _FailingCollection(ValueError('bad record'))
+    writer = WriteBehindBuffer(collection, 'test', journal_dir=str(tmp_path), max_batch=100, max_age=60)
+    writer.add('a', 'doc', {})
+
+    assert writer.flush() == 0
+    assert writer.pending == 0
+    assert writer.stats['rejected'] == 1
+    assert writer.journal_path.read_text() == ''
+    assert '"a"' in writer.rejected_path.read_text()
+    writer.close()
+    assert collection.added == []
+
+
+def test_writer_requeues_batch_on_transient_error(tmp_path):
+    collection = _FailingCollection(ConnectionError('memory server down'))
+    writer = WriteBehindBuffer(collection, 'test', journal_dir=str(tmp_path), max_batch=100, max_age=60)
+    writer.add('a', 'doc', {})
+
+    assert writer.flush() == 0
+    assert writer.pending == 1
+    assert writer.flush() == 1
+    assert collection.added == ['a']
+    writer.close()
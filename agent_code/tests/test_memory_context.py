@@ -0,0 +1,145 @@
+"""
+記憶上下文：存入的經驗與失敗教訓確實出現在決策提示詞中
+"""
+
+import pytest
+
+from agent.memory_manager import MemoryManager
+from agent.memory_context import MemoryContext
+from agent.decision_cache import quantize_observation
+
+
+@pytest.fixture
+def memory_manager(memory_env):
+    manager = MemoryManager()
+    yield manager
+    manager.close()
+
+
+def test_stored_experience_appears_in_memory_lines(memory_manager, observation):
+    memory_manager.store_experience(
+        observation,
+        {'goal': '收集木頭', 'action': 'mine_wood', 'action_type': 'generate_code'},
+        {'success': True, 'message': 'Collected 3 logs'}
+    )
+    memory_manager.flush()
+    assert memory_manager.get_statistics()['indexed_states'] == 1
+
+    context = MemoryContext(memory_manager, token_budget=200, failure_candidates=0)
+    lines, stats = context.build(observation, quantize_observation(observation))
+
+    assert any('收集木頭' in line and 'mine_wood' in line for line in lines)
+    assert stats['memory_tokens'] > 0
+
+
+def test_failure_lesson_appears_in_memory_lines(memory_manager, observation):
+    memory_manager.store_failure({
+        'decision': {'goal': '狩獵動物', 'action_type': 'generate_code'},
+        'result': {'success': False, 'error': 'Path blocked'},
+        'timestamp': '2024-01-01T00:00:00'
+    }, '先清除路上的方塊')
+    memory_manager.flush()
+
+    context = MemoryContext(memory_manager, token_budget=200)
+    lines, _ = context.build(observation, quantize_observation(observation))
+
+    assert any('狩獵動物' in line and 'Path blocked' in line and '先清除路上的方塊' in line for line in lines)
+
+
+def test_memories_are_included_in_decision_prompt(memory_manager, monkeypatch, observation):
+    pytest.importorskip('openai')
+    from agent.llm_brain import LLMBrain
+
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    memory_manager.store_experience(
+        observation,
+        {'goal': '收集木頭', 'action': 'mine_wood', 'action_type': 'generate_code'},
+        {'success': True, 'message': 'Collected 3 logs'}
+    )
+    memory_manager.flush()
+
+    brain = LLMBrain(memory_manager)
+    lines, _ = brain.memory_context.build(observation, quantize_observation(observation))
+    prompt = brain._build_decision_prompt(observation, lines)
+
+    assert '## 相關經驗' in prompt
+    assert '收集木頭' in prompt
+
+
+class FakeMemory:
+    """固定返回兩個來源的記錄；距離刻意處於不同尺度"""
+
+    def __init__(self, experiences, failures):
+        self.experiences = experiences
+        self.failures = failures
+        self.failure_version = 0
+        self.failure_queries = 0
+
+    def query_similar_records(self, observation, top_k=3):
+        return self.experiences[:top_k]
+
+    def query_failure_records(self, observation, top_k=3):
+        self.failure_queries += 1
+        return self.failures[:top_k]
+
+
+def experience_record(n, distance):
+    return {'document': f"決策: 目標{n}\n行動: generate_code\n結果: 成功 - ok",
+            'metadata': {'action': 'explore'}, 'distance': distance}
+
+
+def failure_record(n, distance):
+    return {'document': f"失敗案例:\n目標: 失敗{n}\n行動: generate_code\n錯誤: boom\n改進建議: 換個方向",
+            'metadata': {}, 'distance': distance}
+
+
+def test_failures_keep_their_budget_share(observation):
+    # 經驗距離（狀態向量）遠小於失敗距離（文本嵌入），合併排序時失敗教訓永遠排不進來
+    memory = FakeMemory([experience_record(n, 0.001) for n in range(6)],
+                        [failure_record(n, 50.0) for n in range(3)])
+    context = MemoryContext(memory, token_budget=60, candidates=6, failure_candidates=3, failure_share=0.4)
+
+    lines, stats = context.build(observation, ('a',))
+
+    assert any('失敗' in line for line in lines)
+    assert any('目標' in line for line in lines)
+    assert stats['memory_tokens'] <= 60
+
+
+def test_unused_failure_share_goes_to_experiences(observation):
+    memory = FakeMemory([experience_record(n, 0.001) for n in range(6)], [])
+    full = MemoryContext(memory, token_budget=60, failure_share=0.0, failure_candidates=3)
+    shared = MemoryContext(memory, token_budget=60, failure_share=0.5, failure_candidates=3)
+
+    assert full.build(observation, ('a',))[0] == shared.build(observation, ('a',))[0]
+
+
+def test_failure_lookup_is_reused_until_failures_change(observation):
+    memory = FakeMemory([], [failure_record(0, 1.0)])
+    context = MemoryContext(memory, token_budget=60, ttl=0)
+
+    for _ in range(3):
+        lines, _ = context.build(observation, ('a',))
+        assert lines
+    assert memory.failure_queries == 1
+
+    memory.failure_version = 1
+    context.build(observation, ('a',))
+    assert memory.failure_queries == 2
+
+
+def test_failure_query_does_not_count_collection(memory_manager, monkeypatch, observation):
+    calls = []
+    count = memory_manager.failure_collection.count
+    monkeypatch.setattr(memory_manager.failure_collection, 'count', lambda: calls.append(1) or count())
+
+    assert memory_manager.query_failure_records(observation) == []
+    memory_manager.store_failure({
+        'decision': {'goal': '狩獵動物', 'action_type': 'generate_code'},
+        'result': {'success': False, 'error': 'Path blocked'},
+        'timestamp': '2024-01-01T00:00:00'
+    }, '先清除路上的方塊')
+    memory_manager.flush()
+
+    assert len(memory_manager.query_failure_records(observation)) == 1
+    assert calls == []
@@ -0,0 +1,48 @@
+"""
+反思隊列：reflection 事件帶有失敗的 bot 名稱（艦隊模式下儀表板據此區分）
+"""
+
+import pytest
+
+from utils import events
+from agent.reflection_worker import ReflectionQueue
+
+
+class FakeBrain:
+    ANALYSIS_FAILED = "無法分析失敗原因"
+
+    def analyze_failure(self, error_context):
+        return '先清除路上的方塊'
+
+
+class FakeMemory:
+    def __init__(self):
+        self.failures = []
+
+    def store_failure(self, error_context, improvement):
+        self.failures.append((error_context, improvement))
+
+
+@pytest.fixture
+def event_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(events, '_writer', None)
+    monkeypatch.setenv('LOG_EVENTS', 'true')
+    events.setup_events(tmp_path, '20240101_000000')
+    yield tmp_path
+    events._writer.close()
+
+
+def test_reflection_event_carries_agent(event_dir):
+    memory = FakeMemory()
+    queue = ReflectionQueue(FakeBrain(), memory, warm_load=False)
+
+    queue.submit({'goal': '狩獵動物', 'action_type': 'generate_code'},
+                 {'success': False, 'error': 'Path blocked'}, iteration=3, agent='Observer_2')
+    queue.close(timeout=5)
+
+    reflections = events.tail_events(event_dir, 10, types=['reflection'])
+    assert len(reflections) == 1
+    assert reflections[0]['agent'] == 'Observer_2'
+    assert reflections[0]['iteration'] == 3
+    assert events.validate_event(reflections[0]) == []
+    assert memory.failures[0][1] == '先清除路上的方塊'
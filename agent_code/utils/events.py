@@ -0,0 +1,282 @@
+"""
+Event Stream - 結構化事件流
+與文本日誌並行寫入的 append-only JSONL：每個觀察、決策、行動結果、反思與技能保存一行，
+儀表板與覆蓋層按類型讀取事件，不必再用正則解析日誌文本
+
+事件格式（每行一個 JSON 物件）:
+    {"v": 1, "ts": "2024-01-01T12:00:00.123", "seq": 42, "type": "decision",
+     "agent": "Agent_001", "iteration": 7, ...類型欄位}
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+
+EVENT_FILE_PATTERN = 'events_*.jsonl'
+
+# 所有事件共有的欄位
+COMMON_FIELDS = {
+    'v': int,
+    'ts': str,
+    'seq': int,
+    'type': str,
+    'agent': str,
+    'iteration': int,
+}
+
+# 事件類型 -> {'required': {欄位: 類型}, 'optional': {欄位: 類型}}
+EVENT_SCHEMA = {
+    'observation': {
+        'required': {'position': dict, 'health': (int, float), 'food': (int, float)},
+        'optional': {'entities': int, 'blocks': int, 'inventory': int, 'time_of_day': str, 'biome': str},
+    },
+    'decision': {
+        'required': {'goal': str, 'action_type': str},
+        'optional': {'action': str, 'reasoning': str, 'tier': str, 'skill_name': str, 'decision_ms': (int, float)},
+    },
+    'action_result': {
+        'required': {'success': bool},
+        'optional': {'action_type': str, 'goal': str, 'message': str, 'error': str},
+    },
+    'reflection': {
+        'required': {'goal': str, 'error': str, 'improvement': str},
+        'optional': {'action_type': str, 'reused': bool, 'occurrences': int},
+    },
+    'skill_saved': {
+        'required': {'name': str},
+        'optional': {'goal': str, 'description': str},
+    },
+}
+
+
+def validate_event(event: Dict[str, Any]) -> List[str]:
+    """
+    按 EVENT_SCHEMA 檢查事件
+
+    Returns:
+        問題描述列表（空列表表示有效）
+    """
+    schema = EVENT_SCHEMA.get(event.get('type'))
+    if schema is None:
+        return [f"unknown event type: {event.get('type')!r}"]
+
+    problems = []
+    for field, expected in schema['required'].items():
+        if field not in event:
+            problems.append(f"missing field: {field}")
+        elif not isinstance(event[field], expected):
+            problems.append(f"field {field} has type {type(event[field]).__name__}")
+    for field, expected in {**COMMON_FIELDS, **schema['optional']}.items():
+        if event.get(field) is not None and not isinstance(event[field], expected):
+            problems.append(f"field {field} has type {type(event[field]).__name__}")
+    return problems
+
+
+# ---- 寫入 ----
+
+class EventWriter:
+    """
+    事件寫入器（線程安全）
+
+    - 每個事件一行；有 line_writer（日誌寫入線程）時交給它批次寫入與 flush，
+      否則寫完即 flush，讀取方可以隨時 tail（只會讀到完整的行）
+    - 不符合 schema 的事件照常寫入，但每種問題只警告一次
+    """
+
+    def __init__(self, path: Path, line_writer=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._line_writer = line_writer
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._warned = set()
+
+    def emit(self, event_type: str, agent: str = None, iteration: int = None, **fields) -> Dict[str, Any]:
+        """寫入一個事件並返回事件字典"""
+        with self._lock:
+            self._seq += 1
+            event = {
+                'v': SCHEMA_VERSION,
+                'ts': datetime.now().isoformat(timespec='milliseconds'),
+                'seq': self._seq,
+                'type': event_type,
+                'agent': agent,
+                'iteration': iteration,
+            }
+            event.update(fields)
+
+            problems = validate_event(event)
+            for problem in problems:
+                if (event_type, problem) not in self._warned:
+                    self._warned.add((event_type, problem))
+                    logger.warning(f"Event {event_type} does not match schema: {problem}")
+
+            line = json.dumps(event, ensure_ascii=False, default=str) + '\n'
+            if self._line_writer is not None:
+                self._line_writer.write_line(self._file, line)
+            elif not self._file.closed:
+                self._file.write(line)
+                self._file.flush()
+            return event
+
+    def close(self):
+        with self._lock:
+            if self._line_writer is not None:
+                # 排在已排隊的事件之後關閉
+                self._line_writer.write_line(self._file, None)
+                self._line_writer = None
+            else:
+                self._file.close()
+
+
+_writer: Optional[EventWriter] = None
+
+
+def setup_events(log_dir: Path, timestamp: str = None, line_writer=None) -> Optional[EventWriter]:
+    """
+    打開本次進程的事件文件（LOG_EVENTS=false 時關閉事件流）
+
+    Args:
+        log_dir: 日誌目錄
+        timestamp: 文件名時間戳（與文本日誌一致）
+        line_writer: 背景寫入線程（utils/logger.py 的 LogWriter），None 時同步寫入
+    """
+    global _writer
+    if os.getenv('LOG_EVENTS', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    timestamp = timestamp or datetime.now().strftime('%Y%m%d_%H%M%S')
+    if _writer is not None:
+        _writer.close()
+    _writer = EventWriter(Path(log_dir) / f'events_{timestamp}.jsonl', line_writer)
+    return _writer
+
+
+def emit_event(event_type: str, **fields) -> Optional[Dict[str, Any]]:
+    """寫入一個事件（事件流未啟用時不做任何事）"""
+    if _writer is None:
+        return None
+    return _writer.emit(event_type, **fields)
+
+
+# ---- 讀取 ----
+
+def latest_event_file(log_dir: Path) -> Optional[Path]:
+    """最新的事件文件（文件名帶時間戳，按名稱排序即按時間排序）"""
+    try:
+        files = sorted(Path(log_dir).glob(EVENT_FILE_PATTERN))
+    except OSError:
+        return None
+    return files[-1] if files else None
+
+
+def parse_event(line: str) -> Optional[Dict[str, Any]]:
+    """解析一行事件；空行或寫到一半的行返回 None"""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        event = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    return event if isinstance(event, dict) else None
+
+
+def _filter(events: Iterable[Dict[str, Any]], types: Optional[Iterable[str]]) -> List[Dict[str, Any]]:
+    if types is None:
+        return list(events)
+    types = set(types)
+    return [event for event in events if event.get('type') in types]
+
+
+class EventReader:
+    """
+    事件文件讀取器
+
+    - tail() 從文件末尾往前讀，成本與要取的事件數成正比
+    - read_new() 記住字節偏移，只解析上次之後追加的完整行；出現更新的事件文件時切換過去
+    """
+
+    def __init__(self, log_dir: Path, types: Optional[Iterable[str]] = None):
+        self.log_dir = Path(log_dir)
+        self.types = set(types) if types is not None else None
+        self.path: Optional[Path] = None
+        self.offset = 0
+
+    def tail(self, count: int, types: Optional[Iterable[str]] = None,
+             block_size: int = 64 * 1024) -> List[Dict[str, Any]]:
+        """最新事件文件中最後 count 個（符合類型的）事件，按時間順序"""
+        path = latest_event_file(self.log_dir)
+        if path is None or count <= 0:
+            return []
+        types = set(types) if types is not None else self.types
+
+        events: List[Dict[str, Any]] = []
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            remainder = b''
+            while position > 0 and len(events) < count:
+                size = min(block_size, position)
+                position -= size
+                f.seek(position)
+                chunk = f.read(size) + remainder
+                lines = chunk.split(b'\n')
+                # 第一段可能是不完整的行，留到下一個塊
+                remainder = lines.pop(0) if position > 0 else b''
+                for line in reversed(lines):
+                    event = parse_event(line.decode('utf-8', errors='replace'))
+                    if event is not None and (types is None or event.get('type') in types):
+                        events.append(event)
+                        if len(events) >= count:
+                            break
+        events.reverse()
+        return events
+
+    def read_new(self) -> List[Dict[str, Any]]:
+        """返回上次調用之後追加的事件"""
+        path = latest_event_file(self.log_dir)
+        if path is None:
+            return []
+        if path != self.path:
+            self.path, self.offset = path, 0
+
+        try:
+            with open(path, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() < self.offset:  # 文件被截斷
+                    self.offset = 0
+                f.seek(self.offset)
+                data = f.read()
+        except OSError:
+            return []
+
+        # 只處理完整的行，寫到一半的行留到下次
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+        events = (parse_event(line) for line in data[:end].decode('utf-8', errors='replace').splitlines())
+        return _filter((event for event in events if event is not None), self.types)
+
+    def follow(self, interval: float = 1.0) -> Iterator[Dict[str, Any]]:
+        """持續產生新事件（從當前文件末尾開始）"""
+        path = latest_event_file(self.log_dir)
+        if path is not None:
+            self.path, self.offset = path, path.stat().st_size
+        while True:
+            for event in self.read_new():
+                yield event
+            time.sleep(interval)
+
+
+def tail_events(log_dir: Path, count: int, types: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """最新事件文件中最後 count 個事件"""
+    return EventReader(log_dir).tail(count, types)
@@ -1,59 +1,235 @@
 """
 Logger Utility - 日誌配置
+文本日誌給人看，結構化事件流（utils/events.py）給儀表板與覆蓋層讀取
+
+主循環只把日誌記錄放進隊列，格式化、寫控制台與寫文件都在背景寫入線程完成：
+每批記錄寫完才 flush 一次，文本日誌按大小（或時間）輪轉
 """
 
-import logging
+import os
 import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
 from pathlib import Path
 from datetime import datetime
+from typing import List, Optional
+
+from utils.events import setup_events
+
+# 寫入線程的停止標記
+_STOP = object()
+
+
+class _BatchFlushMixin:
+    """emit() 不逐條 flush，由寫入線程在每批記錄之後調用 flush_batch()"""
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class BatchStreamHandler(_BatchFlushMixin, logging.StreamHandler):
+    pass
+
+
+class BatchRotatingFileHandler(_BatchFlushMixin, logging.handlers.RotatingFileHandler):
+    pass
+
+
+class BatchTimedRotatingFileHandler(_BatchFlushMixin, logging.handlers.TimedRotatingFileHandler):
+    pass
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    只把記錄放進隊列
+
+    標準 QueueHandler 在調用線程就格式化訊息；這裡保留 msg / args，
+    %-格式化延後到寫入線程（調用方傳入的參數在寫入前不應被修改）
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class LogWriter:
+    """
+    背景日誌寫入線程
+
+    - 隊列中可以是日誌記錄，也可以是 (文件, 行) —— 事件流也經由這裡寫入
+    - 一次取出隊列中所有待寫項（最多 batch_size 條），全部寫完後每個輸出只 flush 一次
+    - stop() 寫完隊列中剩餘的項再返回
+    """
+
+    def __init__(self, handlers: List[logging.Handler], batch_size: int = None):
+        self.handlers = handlers
+        self.batch_size = batch_size or int(os.getenv('LOG_BATCH_SIZE', '256'))
+        self.queue = queue.SimpleQueue()
+
+        # 指標
+        self.stats = {'records': 0, 'lines': 0, 'batches': 0, 'errors': 0}
+
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def write_line(self, file, line: str):
+        """排隊寫入一行（line 為 None 表示寫完之前的行後關閉文件）"""
+        self.queue.put((file, line))
+
+    def stop(self, timeout: float = 5):
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout=timeout)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopping = self._write(batch)
+            self.stats['batches'] += 1
+            if stopping:
+                return
+
+    def _write(self, batch: list) -> bool:
+        files = set()
+        stopping = False
+        for item in batch:
+            if item is _STOP:
+                stopping = True
+            elif isinstance(item, logging.LogRecord):
+                self.stats['records'] += 1
+                for handler in self.handlers:
+                    if item.levelno >= handler.level:
+                        handler.handle(item)
+            else:
+                file, line = item
+                try:
+                    if line is None:
+                        files.discard(file)
+                        file.close()
+                    else:
+                        file.write(line)
+                        files.add(file)
+                        self.stats['lines'] += 1
+                except (OSError, ValueError):
+                    self.stats['errors'] += 1
+
+        for handler in self.handlers:
+            handler.flush_batch()
+        for file in files:
+            try:
+                file.flush()
+            except (OSError, ValueError):
+                self.stats['errors'] += 1
+        return stopping
+
+
+_writer: Optional[LogWriter] = None
+
+
+def _file_handler(log_file: Path) -> logging.Handler:
+    """
+    文本日誌文件 Handler
+
+    環境變量:
+        LOG_ROTATE_WHEN    設置時按時間輪轉（例如 midnight、H），否則按大小輪轉
+        LOG_MAX_BYTES      單個日誌文件上限（默認 10MB）
+        LOG_BACKUP_COUNT   保留的輪轉文件數（默認 5）
+    """
+    backup_count = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+    when = os.getenv('LOG_ROTATE_WHEN')
+    if when:
+        return BatchTimedRotatingFileHandler(log_file, when=when, backupCount=backup_count, encoding='utf-8')
+    return BatchRotatingFileHandler(
+        log_file,
+        maxBytes=int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+        backupCount=backup_count,
+        encoding='utf-8'
+    )
 
 
 def setup_logger(name: str = 'agent', log_level: str = 'INFO') -> logging.Logger:
     """
-    設置日誌記錄器
-    
+    設置日誌記錄器，並打開同一時間戳的事件文件
+
+    環境變量:
+        LOG_TEXT_FILE=false  不寫文本日誌文件（只保留控制台輸出與事件流）
+        LOG_EVENTS=false     不寫事件流
+
     Args:
         name: Logger 名稱
         log_level: 日誌級別
-        
+
     Returns:
         配置好的 Logger
     """
+    global _writer
+
     # 創建日誌目錄
     log_dir = Path('/app/logs')
     log_dir.mkdir(exist_ok=True)
-    
+
     # 生成日誌文件名（帶時間戳）
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     log_file = log_dir / f'agent_{timestamp}.log'
-    
+
     # 配置 Logger
     logger = logging.getLogger(name)
     logger.setLevel(getattr(logging, log_level.upper()))
-    
+
     # 清除現有的 handlers
     logger.handlers.clear()
-    
+    previous = _writer
+
     # 控制台 Handler
-    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler = BatchStreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_formatter = logging.Formatter(
         '%(asctime)s | %(levelname)-8s | %(message)s',
         datefmt='%H:%M:%S'
     )
     console_handler.setFormatter(console_formatter)
-    
-    # 文件 Handler
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)
-    file_formatter = logging.Formatter(
-        '%(asctime)s | %(name)s | %(levelname)-8s | %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    file_handler.setFormatter(file_formatter)
-    
-    # 添加 Handlers
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    
+    handlers = [console_handler]
+
+    # 文件 Handler（可選，按大小或時間輪轉）
+    if os.getenv('LOG_TEXT_FILE', 'true').lower() in ('1', 'true', 'yes'):
+        file_handler = _file_handler(log_file)
+        file_handler.setLevel(logging.DEBUG)
+        file_formatter = logging.Formatter(
+            '%(asctime)s | %(name)s | %(levelname)-8s | %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        file_handler.setFormatter(file_formatter)
+        handlers.append(file_handler)
+
+    # 背景寫入線程；Logger 上只掛隊列 Handler
+    _writer = LogWriter(handlers)
+    logger.addHandler(LazyQueueHandler(_writer.queue))
+
+    # 結構化事件流（同一個寫入線程）
+    setup_events(log_dir, timestamp, line_writer=_writer)
+
+    # 重新設置時寫完上一個寫入線程的隊列（包括舊事件文件的關閉）
+    if previous is not None:
+        previous.stop()
+
     return logger
+
+
+def shutdown_logging():
+    """寫完隊列中剩餘的日誌與事件（進程退出時自動調用）"""
+    if _writer is not None:
+        _writer.stop()
+
+
+atexit.register(shutdown_logging)
@@ -8,11 +8,12 @@ import json
 import os
 from pathlib import Path
 from datetime import datetime
-import time
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
+from data_layer import get_data_layer
+
 # 頁面配置
 st.set_page_config(
     page_title="Project Observer - AI Dashboard",
@@ -49,54 +50,55 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
+# 技能樹分頁最多展開的技能數（技能庫可能有上萬個技能）
+SKILLS_DISPLAY_LIMIT = 100
+
+
 class Dashboard:
-    """儀表板主類"""
+    """儀表板主類（每次重跑只讀取共享數據層的快照）"""
     
     def __init__(self):
         self.logs_dir = Path(os.getenv('LOG_SOURCE', '/app/logs'))
         self.skills_dir = Path('/app/skills')
         self.memory_dir = Path('/app/memory')
+        
+        # 進程內共享，所有會話與分頁讀同一份快照
+        self.data = get_data_layer(self.logs_dir, self.skills_dir, self.memory_dir)
+        self.snapshot = self.data.snapshot()
     
     def get_latest_log_file(self):
         """獲取最新的日誌文件"""
-        try:
-            log_files = sorted(self.logs_dir.glob('agent_*.log'))
-            if log_files:
-                return log_files[-1]
-        except:
-            pass
-        return None
+        return self.snapshot['log_file']
     
     def read_recent_logs(self, num_lines=50):
-        """讀取最近的日誌"""
-        log_file = self.get_latest_log_file()
-        if not log_file or not log_file.exists():
-            return []
-        
-        try:
-            with open(log_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                return lines[-num_lines:]
-        except:
-            return []
+        """讀取最近的日誌（最多 RECENT_LIMIT 行）"""
+        return self.snapshot['logs'][-num_lines:]
     
     def get_skills_list(self):
-        """獲取技能列表"""
-        skills = []
-        
-        try:
-            if self.skills_dir.exists():
-                for skill_file in self.skills_dir.glob('*.json'):
-                    with open(skill_file, 'r', encoding='utf-8') as f:
-                        skill = json.load(f)
-                        skills.append(skill)
-        except:
-            pass
-        
-        return skills
+        """獲取技能列表（技能目錄，不含代碼，按成功次數排序）"""
+        return self.snapshot['skills']
+    
+    def get_skill_code(self, name):
+        """按需讀取技能代碼"""
+        return self.data.get_skill_code(name)
+    
+    def read_recent_events(self, count=100):
+        """讀取最近的結構化事件（代理人未寫事件流時為空列表）"""
+        return self.snapshot['events'][-count:]
+    
+    def has_events(self):
+        return self.snapshot['has_events']
+    
+    def get_agent_state(self):
+        """AI 當前狀態：位置、生命值、飢餓值、目標、思考過程與最近決策"""
+        return self.snapshot['agent_state']
+    
+    def get_progress_stats(self):
+        """迭代次數與行動成敗統計"""
+        return self.snapshot['progress']
     
     def parse_log_entry(self, line):
-        """解析日誌條目"""
+        """解析日誌條目（多行訊息的後續行沒有時間與級別）"""
         try:
             parts = line.split('|')
             if len(parts) >= 3:
@@ -105,6 +107,8 @@ class Dashboard:
                     'level': parts[1].strip(),
                     'message': parts[2].strip()
                 }
+            if line.strip():
+                return {'time': '', 'level': '', 'message': line.strip()}
         except:
             pass
         return None
@@ -125,7 +129,8 @@ def main():
         
         st.subheader("⚙️ 設置")
         auto_refresh = st.checkbox("自動刷新", value=True)
-        refresh_interval = st.slider("刷新間隔 (秒)", 1, 10, 3)
+        refresh_interval = st.slider("檢查更新間隔 (秒)", 1, 10, 3,
+                                     help="只有日誌、事件或技能有變更時才重新渲染頁面")
         log_lines = st.slider("顯示日誌行數", 10, 100, 30)
         
         st.markdown("---")
@@ -172,6 +177,16 @@ def main():
                             {color} <strong>{entry['time']}</strong> | {entry['message']}
                         </div>
                         """, unsafe_allow_html=True)
+            elif dashboard.has_events():
+                # 代理人關閉了文本日誌（LOG_TEXT_FILE=false）時顯示事件流
+                for event in reversed(dashboard.read_recent_events(log_lines)):
+                    icon = '🔴' if event.get('type') == 'action_result' and not event.get('success') else '🟢'
+                    details = {k: v for k, v in event.items() if k not in ('v', 'ts', 'seq', 'type')}
+                    st.markdown(f"""
+                    <div class="log-entry">
+                        {icon} <strong>{event.get('ts', '')[11:19]}</strong> | {event.get('type')} | {json.dumps(details, ensure_ascii=False)[:200]}
+                    </div>
+                    """, unsafe_allow_html=True)
             else:
                 st.info("📭 暫無日誌數據。請確保 AI Agent 正在運行。")
     
@@ -179,41 +194,13 @@ def main():
     with tab2:
         st.subheader("🧠 AI 當前思維狀態")
         
-        # 從日誌中提取最新狀態
-        logs = dashboard.read_recent_logs(100)
-        
-        position = "未知"
-        health = "N/A"
-        food = "N/A"
-        current_goal = "觀察中..."
-        thinking = "等待 AI 思考..."
-        
-        for line in reversed(logs):
-            if "位置:" in line:
-                try:
-                    position = line.split("位置:")[1].strip()
-                except:
-                    pass
-            if "生命值:" in line:
-                try:
-                    health = line.split("生命值:")[1].strip()
-                except:
-                    pass
-            if "飢餓值:" in line:
-                try:
-                    food = line.split("飢餓值:")[1].strip()
-                except:
-                    pass
-            if "💭 LLM Decision:" in line:
-                try:
-                    current_goal = line.split("💭 LLM Decision:")[1].strip()
-                except:
-                    pass
-            if "思考過程:" in line:
-                try:
-                    thinking = line.split("思考過程:")[1].strip()
-                except:
-                    pass
+        # 最新狀態（事件流，或舊版的日誌文本）
+        agent_state = dashboard.get_agent_state()
+        position = agent_state['position']
+        health = agent_state['health']
+        food = agent_state['food']
+        current_goal = agent_state['goal']
+        thinking = agent_state['thinking']
         
         col1, col2 = st.columns(2)
         
@@ -238,12 +225,7 @@ def main():
         
         st.markdown("### 📝 最近決策")
         
-        decisions = []
-        for line in reversed(logs):
-            if "💭 LLM Decision:" in line:
-                decisions.append(line)
-                if len(decisions) >= 5:
-                    break
+        decisions = agent_state['decisions']
         
         if decisions:
             for decision in decisions:
@@ -258,10 +240,12 @@ def main():
         skills = dashboard.get_skills_list()
         
         if skills:
-            # 按成功率排序
-            skills_sorted = sorted(skills, key=lambda x: x.get('success_count', 0), reverse=True)
+            # 數據層已按成功次數排序
+            skills_sorted = skills
+            if len(skills_sorted) > SKILLS_DISPLAY_LIMIT:
+                st.caption(f"共 {len(skills_sorted)} 個技能，顯示最常成功的前 {SKILLS_DISPLAY_LIMIT} 個")
             
-            for skill in skills_sorted:
+            for skill in skills_sorted[:SKILLS_DISPLAY_LIMIT]:
                 success_count = skill.get('success_count', 0)
                 failure_count = skill.get('failure_count', 0)
                 total = success_count + failure_count
@@ -273,12 +257,22 @@ def main():
                     with col1:
                         st.markdown(f"**目標:** {skill.get('goal', 'N/A')}")
                         st.markdown(f"**描述:** {skill.get('description', 'N/A')}")
-                        st.code(skill.get('code', '// No code'), language='javascript')
                     
                     with col2:
                         st.metric("成功次數", success_count)
                         st.metric("失敗次數", failure_count)
                         st.caption(f"創建於: {skill.get('created_at', 'Unknown')}")
+            
+            # 代碼只為選中的一個技能讀取（展開項即使收起也會在每次重跑時執行）
+            st.markdown("### 📜 技能代碼")
+            selected = st.selectbox(
+                "選擇技能",
+                [skill['name'] for skill in skills_sorted[:SKILLS_DISPLAY_LIMIT]],
+                index=None,
+                placeholder="選擇一個技能查看代碼"
+            )
+            if selected:
+                st.code(dashboard.get_skill_code(selected) or '// No code', language='javascript')
         else:
             st.info("🌱 AI 還沒有學會任何技能。耐心等待它的第一次成功！")
     
@@ -286,20 +280,11 @@ def main():
     with tab4:
         st.subheader("📈 學習進度統計")
         
-        # 從日誌計算真實統計
-        logs = dashboard.read_recent_logs(1000)
-        
-        iteration_count = 0
-        success_count = 0
-        failure_count = 0
-        
-        for line in logs:
-            if "Iteration #" in line:
-                iteration_count += 1
-            if "✅ [REFLECT] Action succeeded!" in line:
-                success_count += 1
-            if "❌" in line or "ERROR" in line:
-                failure_count += 1
+        # 從事件流（或日誌）計算真實統計
+        progress = dashboard.get_progress_stats()
+        iteration_count = progress['iterations']
+        success_count = progress['success']
+        failure_count = progress['failure']
         
         total_actions = success_count + failure_count
         success_rate = (success_count / total_actions * 100) if total_actions > 0 else 0
@@ -317,15 +302,7 @@ def main():
         with col3:
             st.metric("成功率", f"{success_rate:.1f}%")
             
-            # 計算記憶條目
-            memory_count = 0
-            try:
-                if dashboard.memory_dir.exists():
-                    memory_files = list(dashboard.memory_dir.glob('*.json'))
-                    memory_count = len(memory_files)
-            except:
-                pass
-            st.metric("記憶條目數", memory_count)
+            st.metric("記憶條目數", dashboard.snapshot['memory_count'])
         
         st.markdown("---")
         
@@ -346,10 +323,25 @@ def main():
         else:
             st.info("🌱 AI 正在學習中，尚未掌握技能...")
     
-    # === 自動刷新 ===
+    # === 自動刷新（只在數據變更時重跑） ===
     if auto_refresh:
-        time.sleep(refresh_interval)
-        st.rerun()
+        watch_for_updates(dashboard, refresh_interval)
+
+
+def watch_for_updates(dashboard, interval):
+    """
+    輕量的片段定時比較數據層版本與本次渲染的版本，不同時才重跑整個頁面
+
+    片段重跑不佔用伺服器線程，也不重建分頁與圖表；數據沒變時幾乎不耗 CPU
+    """
+    rendered = dashboard.snapshot['version']
+    
+    @st.fragment(run_every=interval)
+    def check():
+        if dashboard.data.version != rendered:
+            st.rerun()
+    
+    check()
 
 
 if __name__ == "__main__":
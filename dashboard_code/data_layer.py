@@ -0,0 +1,280 @@
+"""
+Data Layer - 儀表板的進程內共享數據層
+所有瀏覽器會話與分頁讀取同一份快照：背景線程刷新日誌追蹤器、事件流與技能目錄，
+只有來源確實變更時才重建衍生數據（AI 狀態、統計）。觀看者增加不會增加磁盤讀取與解析。
+
+安裝了 watchdog 時由文件變更喚醒刷新線程（代理人閒置時不做任何事），否則按間隔輪詢。
+
+Streamlit 每次重跑都會重新執行 app.py，因此數據層與 skill_catalog / log_tail 一樣放在獨立模組中。
+"""
+
+import os
+import time
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from skill_catalog import get_reader
+from event_stream import EVENT_FILE_PATTERN, parse_event
+from log_tail import get_tail
+
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+# 日誌追蹤緩衝保留的最近條目數（統計最多取 1000 條）
+LOG_TAIL_CAPACITY = 2000
+EVENT_TAIL_CAPACITY = 5000
+
+# 快照中保留給實時日誌分頁的條目數（側邊欄滑桿上限）
+RECENT_LIMIT = 100
+
+# 有文件監聽時的保底輪詢間隔（監聽漏掉事件時，例如某些網絡文件系統）
+WATCH_FALLBACK_SECONDS = 30
+
+# 讀取文件本身產生的事件，不代表內容變更
+_IGNORED_FS_EVENTS = {'opened', 'closed_no_write'}
+
+
+def default_agent_state() -> Dict[str, Any]:
+    return {
+        'position': "未知",
+        'health': "N/A",
+        'food': "N/A",
+        'goal': "觀察中...",
+        'thinking': "等待 AI 思考...",
+        'decisions': []
+    }
+
+
+def agent_state_from_events(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """由 observation / decision 事件還原 AI 當前狀態"""
+    state = default_agent_state()
+    observations = [e for e in events if e.get('type') == 'observation']
+    decisions = [e for e in events if e.get('type') == 'decision']
+    if observations:
+        latest = observations[-1]
+        position = latest.get('position') or {}
+        state['position'] = f"({position.get('x', 0):.1f}, {position.get('y', 0):.1f}, {position.get('z', 0):.1f})"
+        state['health'] = f"{latest.get('health', 0)}/20"
+        state['food'] = f"{latest.get('food', 0)}/20"
+    if decisions:
+        state['goal'] = decisions[-1].get('goal') or state['goal']
+        state['thinking'] = decisions[-1].get('reasoning') or state['thinking']
+        state['decisions'] = [
+            f"{e['ts'][11:19]} | {e.get('agent') or ''} {e.get('goal')} "
+            f"({e.get('action') or e.get('action_type')}, {e.get('tier') or 'llm'})"
+            for e in reversed(decisions[-5:])
+        ]
+    return state
+
+
+def agent_state_from_logs(logs: List[str]) -> Dict[str, Any]:
+    """舊版代理人只有文本日誌時用字串比對還原 AI 當前狀態"""
+    state = default_agent_state()
+    markers = {'position': "位置:", 'health': "生命值:", 'food': "飢餓值:",
+               'goal': "💭 LLM Decision:", 'thinking': "思考過程:"}
+    found = set()
+    # 從最新的行往前找，每個欄位取最新的值
+    for line in reversed(logs):
+        for key, marker in markers.items():
+            if marker in line and key not in found:
+                state[key] = line.split(marker)[1].strip()
+                found.add(key)
+        if "💭 LLM Decision:" in line and len(state['decisions']) < 5:
+            state['decisions'].append(line.strip())
+    return state
+
+
+def progress_from_events(events: List[Dict[str, Any]]) -> Dict[str, int]:
+    """迭代次數與行動成敗統計"""
+    stats = {'iterations': 0, 'success': 0, 'failure': 0}
+    for event in events:
+        if event.get('type') == 'observation':
+            stats['iterations'] += 1
+        elif event.get('type') == 'action_result':
+            stats['success' if event.get('success') else 'failure'] += 1
+    return stats
+
+
+def progress_from_logs(logs: List[str]) -> Dict[str, int]:
+    stats = {'iterations': 0, 'success': 0, 'failure': 0}
+    for line in logs:
+        if "Iteration #" in line:
+            stats['iterations'] += 1
+        if "✅ [REFLECT] Action succeeded!" in line:
+            stats['success'] += 1
+        if "❌" in line or "ERROR" in line:
+            stats['failure'] += 1
+    return stats
+
+
+class _Wakeup:
+    """watchdog 事件處理器：目錄中有文件寫入時喚醒刷新線程"""
+
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def dispatch(self, fs_event):
+        if fs_event.event_type not in _IGNORED_FS_EVENTS:
+            self.event.set()
+
+
+class DashboardData:
+    """
+    共享的儀表板數據
+
+    - snapshot() 返回最新快照（只讀字典，調用方不應修改）；version 在內容變更時遞增
+    - 背景線程在文件變更時刷新（沒有 watchdog 或目錄不存在時每 interval 秒輪詢一次），
+      兩次刷新至少間隔 interval 秒（DASHBOARD_REFRESH_SECONDS，默認 1 秒），連續寫入合併為一次刷新
+    - 來源簽名（日誌偏移、事件偏移、技能目錄版本、記憶文件數）未變時不重建
+    """
+
+    def __init__(self, logs_dir: Path, skills_dir: Path, memory_dir: Path, interval: float = None):
+        self.logs_dir = Path(logs_dir)
+        self.skills_dir = Path(skills_dir)
+        self.memory_dir = Path(memory_dir)
+        self.interval = interval or float(os.getenv('DASHBOARD_REFRESH_SECONDS', '1'))
+
+        self.log_tail = get_tail(self.logs_dir, 'agent_*.log', LOG_TAIL_CAPACITY)
+        self.event_tail = get_tail(self.logs_dir, EVENT_FILE_PATTERN, EVENT_TAIL_CAPACITY, parse_event)
+        self.catalog = get_reader(self.skills_dir)
+
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._signature = None
+        self._version = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._last_refresh = 0.0
+
+        # 指標
+        self.stats = {'refreshes': 0, 'rebuilds': 0, 'errors': 0}
+
+        self.watching = self._start_watcher()
+        self._thread = threading.Thread(target=self._run, name='dashboard-data', daemon=True)
+        self._thread.start()
+
+    @property
+    def version(self) -> int:
+        """快照版本（會話據此判斷是否需要重新渲染）"""
+        return self._version
+
+    def snapshot(self) -> Dict[str, Any]:
+        """最新快照（第一次調用時同步建立）"""
+        if self._snapshot is None:
+            self.refresh()
+        return self._snapshot
+
+    def get_skill_code(self, name: str) -> Optional[str]:
+        """按需讀取技能代碼"""
+        try:
+            return self.catalog.get_code(name)
+        except Exception:
+            return None
+
+    def refresh(self) -> bool:
+        """
+        刷新所有來源
+
+        Returns:
+            快照是否有變更
+        """
+        with self._lock:
+            self.stats['refreshes'] += 1
+            logs = self.log_tail.entries()
+            events = self.event_tail.entries()
+            try:
+                skills = self.catalog.skills()
+            except Exception:
+                skills = []
+            memory_count = self._count_memory_files()
+
+            signature = (self.log_tail.path, self.log_tail.offset, self.event_tail.path, self.event_tail.offset,
+                         self.catalog.version, len(skills), memory_count)
+            if signature == self._signature and self._snapshot is not None:
+                return False
+
+            self._version += 1
+            self._snapshot = self._build(logs, events, skills, memory_count)
+            self._signature = signature
+            self.stats['rebuilds'] += 1
+            return True
+
+    def _build(self, logs: List[str], events: List[Dict[str, Any]], skills: List[Dict[str, Any]],
+               memory_count: int) -> Dict[str, Any]:
+        has_events = self.event_tail.path is not None
+        if has_events:
+            agent_state = agent_state_from_events(events)
+            progress = progress_from_events(
+                [e for e in events if e.get('type') in ('observation', 'action_result')][-1000:])
+        else:
+            agent_state = agent_state_from_logs(logs[-100:])
+            progress = progress_from_logs(logs[-1000:])
+
+        return {
+            'version': self._version,
+            'updated_at': time.time(),
+            'log_file': self.log_tail.path,
+            'logs': logs[-RECENT_LIMIT:],
+            'has_events': has_events,
+            'events': events[-RECENT_LIMIT:],
+            # 按成功次數排序（技能樹分頁直接使用）
+            'skills': sorted(skills, key=lambda skill: skill.get('success_count', 0) or 0, reverse=True),
+            'agent_state': agent_state,
+            'progress': progress,
+            'memory_count': memory_count,
+        }
+
+    def _count_memory_files(self) -> int:
+        try:
+            if self.memory_dir.exists():
+                return sum(1 for _ in self.memory_dir.glob('*.json'))
+        except OSError:
+            pass
+        return 0
+
+    def _start_watcher(self) -> bool:
+        """監聽日誌、技能與記憶目錄；任何一個目錄無法監聽時退回輪詢"""
+        if Observer is None:
+            return False
+        try:
+            observer = Observer()
+            handler = _Wakeup(self._wakeup)
+            for directory in {self.logs_dir, self.skills_dir, self.memory_dir}:
+                observer.schedule(handler, str(directory), recursive=False)
+            observer.start()
+        except Exception:
+            return False
+        self._observer = observer
+        return True
+
+    def _run(self):
+        timeout = WATCH_FALLBACK_SECONDS if self.watching else self.interval
+        while True:
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+
+            # 連續寫入合併為一次刷新
+            delay = self._last_refresh + self.interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._last_refresh = time.monotonic()
+            try:
+                self.refresh()
+            except Exception:
+                # 來源暫時不可讀（例如文件正被輪轉），下次再試
+                self.stats['errors'] += 1
+
+
+_layers: Dict[tuple, DashboardData] = {}
+_layers_lock = threading.Lock()
+
+
+def get_data_layer(logs_dir: Path, skills_dir: Path, memory_dir: Path) -> DashboardData:
+    """同一組目錄在進程內只有一個數據層（所有會話共用）"""
+    key = (str(logs_dir), str(skills_dir), str(memory_dir))
+    with _layers_lock:
+        if key not in _layers:
+            _layers[key] = DashboardData(logs_dir, skills_dir, memory_dir)
+        return _layers[key]
@@ -0,0 +1,34 @@
+"""
+Event Stream - 儀表板的結構化事件讀取
+代理人在日誌目錄寫入 events_*.jsonl（格式見 agent_code/utils/events.py），
+儀表板按類型讀取事件，不再從文本日誌中用字串比對還原狀態。
+儀表板鏡像只包含 dashboard_code，因此讀取部分在此保留一份；
+增量讀取由 log_tail.TailReader 負責，這裡只提供文件定位與逐行解析。
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+EVENT_FILE_PATTERN = 'events_*.jsonl'
+
+
+def latest_event_file(log_dir: Path) -> Optional[Path]:
+    """最新的事件文件（文件名帶時間戳，按名稱排序即按時間排序）"""
+    try:
+        files = sorted(Path(log_dir).glob(EVENT_FILE_PATTERN))
+    except OSError:
+        return None
+    return files[-1] if files else None
+
+
+def parse_event(line: bytes) -> Optional[Dict[str, Any]]:
+    """解析一行事件；空行或寫到一半的行返回 None"""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        event = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return event if isinstance(event, dict) else None
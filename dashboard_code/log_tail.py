@@ -0,0 +1,188 @@
+"""
+Log Tail - 儀表板共用的日誌追蹤引擎
+像 tail -F 一樣記住文件的字節偏移，每次刷新只讀取並解析新追加的完整行，
+解析結果保存在有上限的環形緩衝中。刷新成本與新寫入的日誌量成正比，與文件大小無關。
+
+讀取器放在獨立模組中（同 skill_catalog），Streamlit 重跑腳本時偏移與緩衝都會保留。
+"""
+
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, List, Optional
+
+
+def read_last_lines(f, end: int, count: int, block_size: int = 64 * 1024) -> List[bytes]:
+    """
+    從 end 往前按塊讀取，返回 end 之前最後 count 個非空行（按文件順序）
+
+    Args:
+        f: 以二進位模式打開的文件
+        end: 讀取的結束位置（end 前不完整的行也會返回，由調用方決定是否保留）
+    """
+    lines: List[bytes] = []
+    position = end
+    remainder = b''
+    while position > 0 and len(lines) < count:
+        size = min(block_size, position)
+        position -= size
+        f.seek(position)
+        chunk = (f.read(size) + remainder).split(b'\n')
+        # 第一段可能是不完整的行，留到下一個塊
+        remainder = chunk.pop(0) if position > 0 else b''
+        lines.extend(reversed(chunk))
+    if position == 0 and remainder:
+        lines.append(remainder)
+    lines = [line for line in lines if line.strip()][:count]
+    lines.reverse()
+    return lines
+
+
+class TailReader:
+    """
+    追蹤目錄中最新的日誌文件
+
+    - 第一次打開文件（或換到更新的文件）時從末尾往前讀，只填滿緩衝
+    - 之後從記住的偏移讀到文件末尾；寫到一半的行留到下次
+    - 文件被輪轉（inode 改變）時先讀完舊文件剩餘的行，再從頭讀取新文件；被截斷時從頭讀取
+    - 落後超過 max_catchup 字節時直接跳到末尾重新填充緩衝
+    """
+
+    def __init__(self, log_dir: Path, pattern: str, capacity: int = 2000,
+                 parse: Callable[[bytes], Any] = None, max_catchup: int = 8 * 1024 * 1024):
+        self.log_dir = Path(log_dir)
+        self.pattern = pattern
+        self.capacity = capacity
+        self.parse = parse or (lambda line: line.decode('utf-8', errors='replace').rstrip('\r'))
+        self.max_catchup = max_catchup
+
+        self.path: Optional[Path] = None
+        self.offset = 0
+        self._file = None
+        self._inode = None
+        self._entries: deque = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+        # 指標
+        self.stats = {'refreshes': 0, 'bytes_read': 0, 'entries_parsed': 0, 'reopens': 0}
+
+    def latest_file(self) -> Optional[Path]:
+        """最新的日誌文件（文件名帶時間戳，按名稱排序即按時間排序）"""
+        try:
+            files = sorted(self.log_dir.glob(self.pattern))
+        except OSError:
+            return None
+        return files[-1] if files else None
+
+    def entries(self, count: int = None) -> List[Any]:
+        """刷新後返回最近 count 個已解析的條目（按時間順序）"""
+        with self._lock:
+            self._refresh()
+            entries = list(self._entries)
+        return entries[-count:] if count else entries
+
+    def refresh(self):
+        with self._lock:
+            self._refresh()
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _refresh(self):
+        self.stats['refreshes'] += 1
+        latest = self.latest_file()
+        if latest is None:
+            self._close()
+            self.path = None
+            self._entries.clear()
+            return
+
+        try:
+            if latest != self.path or self._file is None:
+                self._open(latest, backfill=True)
+                return
+
+            self._read_new()
+            stat = os.stat(self.path)
+            if stat.st_ino != self._inode:
+                # 已讀完舊文件，接著從頭讀取輪轉後的新文件
+                self._open(self.path, backfill=False)
+                self._read_new()
+        except OSError:
+            self._close()
+            self.path = None
+
+    def _open(self, path: Path, backfill: bool):
+        self._close()
+        self._file = open(path, 'rb')
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self.path = path
+        self.offset = 0
+        self.stats['reopens'] += 1
+        if backfill:
+            self._entries.clear()
+            self._backfill()
+
+    def _backfill(self):
+        """從文件末尾往前讀取，填滿緩衝"""
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        if not size:
+            return
+        self._file.seek(size - 1)
+        complete = self._file.read(1) == b'\n'
+
+        lines = read_last_lines(self._file, size, self.capacity + 1)
+        # 最後一行寫到一半時留到下次
+        end = size if complete or not lines else size - len(lines.pop())
+        self._add(lines[-self.capacity:])
+        self.stats['bytes_read'] += sum(len(line) + 1 for line in lines)
+        self.offset = end
+
+    def _read_new(self):
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        if size < self.offset:  # 文件被截斷
+            self.offset = 0
+        if size - self.offset > self.max_catchup:
+            self._entries.clear()
+            self._backfill()
+            return
+
+        self._file.seek(self.offset)
+        data = self._file.read(size - self.offset)
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return
+        self.offset += end
+        self.stats['bytes_read'] += end
+        self._add(line for line in data[:end].split(b'\n') if line.strip())
+
+    def _add(self, lines):
+        for line in lines:
+            entry = self.parse(line)
+            if entry is not None:
+                self._entries.append(entry)
+                self.stats['entries_parsed'] += 1
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._inode = None
+
+
+_tails = {}
+_tails_lock = threading.Lock()
+
+
+def get_tail(log_dir: Path, pattern: str, capacity: int = 2000,
+             parse: Callable[[bytes], Any] = None) -> TailReader:
+    """同一目錄與文件模式共用一個追蹤器（跨 Streamlit 重跑與瀏覽器會話保留）"""
+    key = (str(log_dir), pattern)
+    with _tails_lock:
+        if key not in _tails:
+            _tails[key] = TailReader(log_dir, pattern, capacity, parse)
+        return _tails[key]
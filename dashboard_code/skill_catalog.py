@@ -0,0 +1,143 @@
+"""
+Skill Catalog - 儀表板的技能目錄讀取器
+按文件修改時間判斷是否需要重讀，SQLite 技能庫只讀取上次之後變更的技能（revision），
+技能代碼按需讀取並按 (技能名, revision) 快取，所有讀取共用一個只讀連接。
+Streamlit 每次重跑腳本都會重新執行 app.py，但導入的模組只載入一次，因此讀取器放在獨立模組中以保留快取。
+"""
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+CATALOG_COLUMNS = ['name', 'goal', 'description', 'success_count', 'failure_count', 'success_rate',
+                   'created_at', 'last_used']
+
+
+class SkillCatalogReader:
+    """技能目錄（不含代碼），按 mtime 與 revision 增量刷新"""
+
+    def __init__(self, skills_dir: Path):
+        self.skills_dir = Path(skills_dir)
+        self.db_path = self.skills_dir / 'skills.db'
+
+        self._skills: Dict[str, Dict[str, Any]] = {}
+        self._signature = None   # 技能庫文件的 (inode, mtime_ns, size)
+        self._revision = 0
+        self._json_files: Dict[str, tuple] = {}  # 文件名 -> (mtime_ns, 技能名)
+        self._code: Dict[str, tuple] = {}  # 技能名 -> (revision, 代碼)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        # 每次目錄內容有變化時遞增，調用方據此判斷是否需要重建衍生數據
+        self.version = 0
+
+    def skills(self) -> List[Dict[str, Any]]:
+        """返回全部技能目錄項（文件未變更時直接使用快取）"""
+        with self._lock:
+            if self.db_path.exists():
+                self._refresh_db()
+            elif self.skills_dir.exists():
+                self._refresh_json()
+            return list(self._skills.values())
+
+    def get_code(self, name: str) -> Optional[str]:
+        """讀取單個技能的代碼（技能未再變更時使用快取）"""
+        with self._lock:
+            skill = self._skills.get(name, {})
+            if 'code' in skill:
+                return skill['code']
+            if not self.db_path.exists():
+                return None
+
+            # 舊版技能庫沒有 revision 欄位，以文件簽名代替
+            revision = skill.get('revision', self._signature)
+            cached = self._code.get(name)
+            if cached is not None and cached[0] == revision:
+                return cached[1]
+
+            row = self._connection().execute("SELECT code FROM skills WHERE name = ?", (name,)).fetchone()
+            code = row[0] if row else None
+            self._code[name] = (revision, code)
+            return code
+
+    def close(self):
+        with self._lock:
+            self._close_connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        """共用的只讀連接（不會阻塞代理人的寫入）；技能庫文件被替換時重新打開"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=1,
+                                         check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+        return self._conn
+
+    def _close_connection(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _refresh_db(self):
+        stat = self.db_path.stat()
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return
+
+        # 文件被替換時從頭讀取（舊連接仍指向被替換的文件）
+        if self._signature is None or self._signature[0] != stat.st_ino:
+            self._skills, self._revision, self._code = {}, 0, {}
+            self._close_connection()
+
+        conn = self._connection()
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= 2:
+            rows = conn.execute(
+                f"SELECT {', '.join(CATALOG_COLUMNS)}, revision FROM skills WHERE revision > ? ORDER BY revision",
+                (self._revision,)
+            ).fetchall()
+        else:
+            self._skills = {}
+            rows = conn.execute(f"SELECT {', '.join(CATALOG_COLUMNS)} FROM skills").fetchall()
+
+        for row in rows:
+            skill = dict(row)
+            self._skills[skill['name']] = skill
+            self._revision = max(self._revision, skill.get('revision', 0))
+        self._signature = signature
+        self.version += 1
+
+    def _refresh_json(self):
+        """舊版部署：每技能一個 JSON 文件，只重讀 mtime 變更過的文件"""
+        seen = set()
+        for skill_file in self.skills_dir.glob('*.json'):
+            seen.add(skill_file.name)
+            try:
+                mtime = skill_file.stat().st_mtime_ns
+                cached = self._json_files.get(skill_file.name)
+                if cached and cached[0] == mtime:
+                    continue
+                with open(skill_file, 'r', encoding='utf-8') as f:
+                    skill = json.load(f)
+                self._skills[skill['name']] = skill
+                self._json_files[skill_file.name] = (mtime, skill['name'])
+                self.version += 1
+            except Exception:
+                continue
+
+        for file_name in set(self._json_files) - seen:
+            _, name = self._json_files.pop(file_name)
+            self._skills.pop(name, None)
+            self.version += 1
+
+
+_readers: Dict[str, SkillCatalogReader] = {}
+
+
+def get_reader(skills_dir: Path) -> SkillCatalogReader:
+    """同一目錄共用一個讀取器（跨 Streamlit 重跑保留）"""
+    key = str(skills_dir)
+    if key not in _readers:
+        _readers[key] = SkillCatalogReader(skills_dir)
+    return _readers[key]